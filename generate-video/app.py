@@ -1,49 +1,525 @@
-from flask import Flask, request, jsonify
-from video_generator import generate_video
+import warmup
+from flask import Flask, Response, request, jsonify, send_from_directory
+from video_generator import generate_video, resolve_granularity
+from jobs import JobQueue, JobQueueFull
+from profiles import get_profile, use_profile
+from result_cache import get_result_cache, request_key
+from planner import get_planner
+import metrics
+import hls
+import batch
+import ingest
+import scheduler
+import workspace
+import uuid
+import os
+import json
+import codecs
+import itertools
+import time
+import threading
 import traceback
+import re
 
 app = Flask(__name__)
 
-@app.route("/generate", methods=["POST"])
-def generate():
-    data = request.get_json()
-    script = data.get("script", "")
-    title = data.get("title", "Expliacation")
+# Queue of asynchronous renders (configurable number of workers and maximum size),
+# shortest first according to the cost estimated by planner.py (JOB_SJF_WEIGHT=0: arrival order)
+job_queue = JobQueue(
+    workers=int(os.environ.get("JOB_WORKERS", "2")),
+    max_pending=int(os.environ.get("JOB_QUEUE_SIZE", "8")),
+    sjf_weight=float(os.environ.get("JOB_SJF_WEIGHT", "1")),
+)
+# Renders estimated to take longer than this (seconds) are refused; 0 = no limit
+JOB_MAX_RENDER_SECONDS = float(os.environ.get("JOB_MAX_RENDER_SECONDS", "0"))
+# GENERATE_SYNC=1: /generate blocks by default (previous behaviour)
+GENERATE_SYNC_DEFAULT = os.environ.get("GENERATE_SYNC", "0") == "1"
+
+# Retention of produced videos and streams (OUTPUT_RETENTION_HOURS / OUTPUT_MAX_MB); 0 = disabled
+OUTPUT_SWEEP_INTERVAL = float(os.environ.get("OUTPUT_SWEEP_INTERVAL", "600"))
+if OUTPUT_SWEEP_INTERVAL > 0:
+    workspace.start_sweeper(OUTPUT_SWEEP_INTERVAL, extra=(hls.sweep_streams,) + (
+        (get_result_cache().evict,) if get_result_cache() is not None else ()))
+
+# Videos served by /videos/<name> (Range, ETag); USE_X_SENDFILE=1 hands the transfer to the front proxy
+VIDEO_CACHE_SECONDS = int(os.environ.get("VIDEO_CACHE_SECONDS", "3600"))
+VIDEO_NAME = re.compile(r"video_[0-9a-f]+\.mp4")
+app.config["USE_X_SENDFILE"] = os.environ.get("USE_X_SENDFILE", "0") == "1"
+
+# Background warm-up (TTS model, fonts, test encode); /ready returns 200 once it is done
+WARMUP = os.environ.get("WARMUP", "1") == "1"
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def _video_kwargs(data):
+    """Extract the generate_video parameters from the JSON payload."""
     explanations = data.get("explanations", [])
     # If the client didn't specify, default to True when explanations are provided
     show_explanations_text = data.get("explanationsShowText")
     if show_explanations_text is None:
         show_explanations_text = bool(explanations)
-    style = data.get("style", {})
-    explanations_display = data.get("explanationsDisplay", None)
-    if not script:
+    return dict(
+        script_text=data.get("script", ""),
+        title=data.get("title", "Expliacation"),
+        explanations=explanations,
+        show_explanations_text=show_explanations_text,
+        style=data.get("style", {}),
+        explanations_display=data.get("explanationsDisplay", None),
+        renderer=data.get("renderer"),
+        profile=data.get("profile"),
+        granularity=data.get("granularity"),
+    )
+
+
+REQUESTS = metrics.counter("generate_video_requests_total", "Render requests, by mode and outcome.", ("mode", "status"))
+CACHE_ENTRIES = metrics.gauge("generate_video_cache_entries", "Entries stored, by cache.", ("cache",))
+CACHE_BYTES = metrics.gauge("generate_video_cache_bytes", "Bytes stored, by cache.", ("cache",))
+WORKSPACES = metrics.gauge("generate_video_workspaces_active", "Job workspaces currently open.")
+WORKSPACE_BYTES = metrics.gauge("generate_video_workspace_bytes", "Bytes written in the open job workspaces.")
+JOBS = metrics.gauge("generate_video_jobs", "Jobs known to the queue, by status.", ("status",))
+PLANNER_RUNS = metrics.gauge("generate_video_planner_runs", "Measured runs the cost models are fitted on.")
+
+
+def _publish_stats():
+    """Snapshot of the caches, workspaces, jobs and planner into the Prometheus gauges."""
+    from tts_engine import audio_cache_stats
+    from segment_cache import segment_cache_stats
+    result_cache = get_result_cache()
+    caches = {
+        "audio": audio_cache_stats(),
+        "segments": segment_cache_stats(),
+        "results": result_cache.stats() if result_cache is not None else {"enabled": False},
+    }
+    for name, stats in caches.items():
+        CACHE_ENTRIES.set(stats.get("entries", 0), cache=name)
+        CACHE_BYTES.set(stats.get("bytes", 0), cache=name)
+    ws = workspace.workspace_stats()
+    WORKSPACES.set(ws["active"])
+    WORKSPACE_BYTES.set(ws["bytes"])
+    queue = job_queue.stats()
+    for status in ("queued", "running", "done", "failed"):
+        JOBS.set(queue["jobs"].get(status, 0), status=status)
+    PLANNER_RUNS.set(get_planner().stats()["runs"])
+
+
+def _over_budget(estimate, mode):
+    """413 response when the estimated render exceeds JOB_MAX_RENDER_SECONDS, else None."""
+    if not JOB_MAX_RENDER_SECONDS or estimate["renderSeconds"] <= JOB_MAX_RENDER_SECONDS:
+        return None
+    REQUESTS.inc(mode=mode, status="rejected")
+    return jsonify({"error": "Estimated render time exceeds the budget",
+                    "estimate": estimate, "maxRenderSeconds": JOB_MAX_RENDER_SECONDS}), 413
+
+
+def _run_generate(progress=None, **kwargs):
+    t0 = time.perf_counter()
+    output_path = generate_video(progress=progress, **kwargs)
+    # Render actually run (not a cached video): calibrates the cost estimator
+    try:
+        get_planner().observe(kwargs, time.perf_counter() - t0, output_path)
+    except Exception as e:
+        print(f"[WARN] Planner observation failed: {e}", flush=True)
+    return output_path
+
+
+def _run_traced(progress=None, mode="sync", **kwargs):
+    """
+    Measured render: returns {"videoUrl", "videoPath", "timings"} (per-stage detail of this request).
+    A request identical to a finished or running render reuses its video (see result_cache.py).
+    """
+    cache = get_result_cache()
+    with metrics.collect() as trace:
+        try:
+            with metrics.span("generate_video"):
+                if cache is None:
+                    output_path, how = _run_generate(progress=progress, **kwargs), None
+                else:
+                    output_path, how = cache.get_or_render(
+                        request_key(**kwargs), lambda: _run_generate(progress=progress, **kwargs))
+                    if how != "miss" and progress:
+                        progress("cache", 1, 1)
+        except Exception:
+            REQUESTS.inc(mode=mode, status="error")
+            raise
+    REQUESTS.inc(mode=mode, status="ok")
+    warmup.mark_render_ok()
+    result = {**_video_fields(output_path), "timings": trace.summary(), "encode": trace.info.get("encode")}
+    if how is not None:
+        result["cache"] = how
+    if trace.info.get("segments"):
+        result["segments"] = trace.info["segments"]
+    return result
+
+
+# Pending or running asynchronous jobs, by request key: a duplicate gets the same jobId
+_pending_jobs = {}
+_pending_lock = threading.Lock()
+
+
+def _submit_render(kwargs, cost=None):
+    """Queue the render; returns (job_id, False), or (existing job_id, True) for a duplicate."""
+    if get_result_cache() is None:
+        return job_queue.submit(_run_traced, cost=cost, mode="async", **kwargs), False
+    key = request_key(**kwargs)
+    with _pending_lock:
+        for k, job_id in list(_pending_jobs.items()):
+            job = job_queue.get(job_id)
+            if job is None or job["status"] not in ("queued", "running"):
+                del _pending_jobs[k]
+        if key in _pending_jobs:
+            return _pending_jobs[key], True
+        job_id = _pending_jobs[key] = job_queue.submit(_run_traced, cost=cost, mode="async", **kwargs)
+        return job_id, False
+
+
+def _run_stream(progress=None, stream_id=None, **kwargs):
+    """HLS streaming render: chunks are published as they are encoded, the full video at the end."""
+    kwargs.pop("renderer", None)  # streaming always uses the ffmpeg renderer
+    output_path = os.path.join(os.path.abspath(workspace.output_dir()), f"video_{stream_id}.mp4")
+    with metrics.collect() as trace, workspace.job_workspace(stream_id):
+        try:
+            with metrics.span("generate_video"):
+                hls.render_hls(stream_dir=os.path.join(hls.STREAM_DIR, stream_id), progress=progress,
+                               output_path=output_path, **kwargs)
+        except Exception:
+            REQUESTS.inc(mode="stream", status="error")
+            raise
+    REQUESTS.inc(mode="stream", status="ok")
+    warmup.mark_render_ok()
+    return {**_video_fields(output_path), "playlistUrl": _playlist_url(stream_id), "timings": trace.summary(),
+            "encode": trace.info.get("encode")}
+
+
+def _run_batch(progress=None, scripts=(), renderer=None, profile=None):
+    """Batch of scripts: shared TTS, slides and segments are produced once (see batch.py)."""
+    with metrics.collect() as trace:
+        try:
+            with metrics.span("generate_batch"):
+                result = batch.render_batch(scripts, renderer=renderer, profile=profile, progress=progress)
+        except Exception:
+            REQUESTS.inc(mode="batch", status="error")
+            raise
+    REQUESTS.inc(mode="batch", status="ok" if not result["stats"]["failed"] else "partial")
+    if result["stats"]["failed"] < len(result["results"]):
+        warmup.mark_render_ok()
+    for item in result["results"]:
+        if "videoUrl" in item:
+            item.update(_video_fields(item["videoUrl"]))
+    result["timings"] = trace.summary()
+    return result
+
+
+def _playlist_url(stream_id):
+    return f"/streams/{stream_id}/{hls.PLAYLIST_NAME}"
+
+
+def _video_fields(output_path):
+    """Download URL served by this service (videoUrl) and local path of the file (videoPath)."""
+    return {"videoUrl": f"/videos/{os.path.basename(output_path)}", "videoPath": output_path}
+
+
+@app.route("/generate", methods=["POST"])
+def generate():
+    data = request.get_json()
+    kwargs = _video_kwargs(data)
+    if not kwargs["script_text"]:
         return jsonify({"error": "script field is required"}), 400
     try:
+        kwargs["profile"] = get_profile(kwargs["profile"]).name
+        kwargs["granularity"] = resolve_granularity(kwargs["granularity"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    sync = data.get("sync", request.args.get("sync"))
+    sync = GENERATE_SYNC_DEFAULT if sync is None else _flag(sync)
+    stream = _flag(data.get("stream", request.args.get("stream", False)))
+    estimate = get_planner().estimate(**dict(kwargs, renderer="ffmpeg" if stream else kwargs["renderer"]))
+    rejected = _over_budget(estimate, "stream" if stream else "sync" if sync else "async")
+    if rejected:
+        return rejected
+    if stream:
+        # HLS stream: always asynchronous, the playlist is readable from the first chunk
+        from ffmpeg_renderer import ffmpeg_available
+        if not ffmpeg_available():
+            return jsonify({"error": "Streaming requires ffmpeg"}), 501
+        stream_id = uuid.uuid4().hex
+        try:
+            job_id = job_queue.submit(_run_stream, cost=estimate["renderSeconds"], stream_id=stream_id, **kwargs)
+        except JobQueueFull as full:
+            resp = jsonify({"error": "Too many pending jobs, retry later", "retryAfter": full.retry_after})
+            resp.headers["Retry-After"] = str(full.retry_after)
+            return resp, 429
+        return jsonify({"jobId": job_id, "status": "queued", "statusUrl": f"/jobs/{job_id}",
+                        "playlistUrl": _playlist_url(stream_id), "estimatedSeconds": estimate["renderSeconds"]}), 202
+
+    if not sync:
         try:
-            output_path = generate_video(
-                script,
-                title=title,
-                explanations=explanations,
-                show_explanations_text=show_explanations_text,
-                style=style,
-                explanations_display=explanations_display,
-            )
-        except TypeError as te:
-            # Backward compatibility: older signature without explanations_display
-            print("[WARN] generate_video doesn't accept 'explanations_display'. Retrying without it...", flush=True)
-            output_path = generate_video(
-                script,
-                title=title,
-                explanations=explanations,
-                show_explanations_text=show_explanations_text,
-                style=style,
-            )
-        return jsonify({"videoUrl": output_path, "message": "Video generated successfully"})
+            job_id, duplicate = _submit_render(kwargs, cost=estimate["renderSeconds"])
+        except JobQueueFull as full:
+            resp = jsonify({"error": "Too many pending jobs, retry later", "retryAfter": full.retry_after})
+            resp.headers["Retry-After"] = str(full.retry_after)
+            return resp, 429
+        body = {"jobId": job_id, "status": "queued", "statusUrl": f"/jobs/{job_id}",
+                "estimatedSeconds": estimate["renderSeconds"]}
+        if duplicate:
+            body["status"] = (job_queue.get(job_id) or body)["status"]
+            body["deduplicated"] = True
+        return jsonify(body), 202
+
+    with_timings = _flag(data.get("timings", request.args.get("timings", False)))
+    try:
+        result = _run_traced(**kwargs)
+        body = {"videoUrl": result["videoUrl"], "videoPath": result["videoPath"], "message": "Video generated successfully"}
+        for key in ("cache", "segments"):
+            if key in result:
+                body[key] = result[key]
+        if with_timings:
+            body["timings"] = result["timings"]
+            body["encode"] = result["encode"]
+        return jsonify(body)
     except Exception as e:
         # Print full traceback to console for debugging
         print(traceback.format_exc(), flush=True)
         return jsonify({"error": str(e)}), 500
 
+
+@app.route("/batch", methods=["POST"])
+def generate_batch():
+    data = request.get_json()
+    items = data.get("scripts") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "scripts field is required (non-empty list)"}), 400
+    if len(items) > batch.BATCH_MAX_SCRIPTS:
+        return jsonify({"error": f"Too many scripts (max {batch.BATCH_MAX_SCRIPTS})"}), 400
+    if not all(isinstance(item, dict) for item in items):
+        return jsonify({"error": "each script must be an object"}), 400
+    # Each script takes the /generate fields; renderer and profile apply to the whole batch
+    scripts = [{k: v for k, v in _video_kwargs(item).items() if k not in ("renderer", "profile")} for item in items]
+    try:
+        profile = get_profile(data.get("profile")).name
+        for script in scripts:
+            script["granularity"] = resolve_granularity(script["granularity"] or data.get("granularity"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    kwargs = dict(scripts=scripts, renderer=data.get("renderer"), profile=profile)
+    # Upper bound: sharing work across the batch can only reduce it
+    estimates = [get_planner().estimate(renderer=kwargs["renderer"], profile=profile, **script) for script in scripts]
+    estimate = {"renderSeconds": round(sum(e["renderSeconds"] for e in estimates), 2),
+                "segments": sum(e["segments"] for e in estimates), "scripts": len(estimates)}
+
+    sync = data.get("sync", request.args.get("sync"))
+    sync = GENERATE_SYNC_DEFAULT if sync is None else _flag(sync)
+    rejected = _over_budget(estimate, "batch")
+    if rejected:
+        return rejected
+    if not sync:
+        try:
+            job_id = job_queue.submit(_run_batch, cost=estimate["renderSeconds"], **kwargs)
+        except JobQueueFull as full:
+            resp = jsonify({"error": "Too many pending jobs, retry later", "retryAfter": full.retry_after})
+            resp.headers["Retry-After"] = str(full.retry_after)
+            return resp, 429
+        return jsonify({"jobId": job_id, "status": "queued", "statusUrl": f"/jobs/{job_id}",
+                        "estimatedSeconds": estimate["renderSeconds"]}), 202
+
+    try:
+        return jsonify(_run_batch(**kwargs))
+    except Exception as e:
+        print(traceback.format_exc(), flush=True)
+        return jsonify({"error": str(e)}), 500
+
+
+INGEST_READ_SIZE = 4096
+
+
+def _stream_chunks():
+    """Request body decoded as it arrives (chunked transfer supported)."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        data = request.stream.read(INGEST_READ_SIZE)
+        if not data:
+            break
+        text = decoder.decode(data)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _ndjson_lines(chunks):
+    buf = ""
+    for chunk in chunks:
+        buf += chunk
+        *lines, buf = buf.split("\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if buf.strip():
+        yield json.loads(buf)
+
+
+def _ingest_options(data):
+    kwargs = _video_kwargs(data)
+    return dict(title=kwargs["title"], show_explanations_text=data.get("explanationsShowText"),
+                style=kwargs["style"], renderer=kwargs["renderer"]), get_profile(kwargs["profile"]).name
+
+
+@app.route("/ingest", methods=["POST"])
+def ingest_script():
+    """
+    Streamed script: rendering starts as soon as the first sentence is complete.
+    - application/x-ndjson: one options line (/generate fields, without script), then
+      {"text": chunk} and {"explanation": text, "index": n?, "display": bool?} lines;
+    - text/plain: the raw script, options as URL parameters (title, renderer, profile).
+    Response when the stream closes: videoUrl, sentences and timings (including tailSeconds).
+    """
+    ndjson = request.mimetype in ("application/x-ndjson", "application/jsonl")
+    session = None
+    with metrics.collect() as trace, workspace.job_workspace():
+        try:
+            if ndjson:
+                lines = _ndjson_lines(_stream_chunks())
+                first = next(lines, None) or {}
+                options, profile = _ingest_options(first)
+                messages = itertools.chain([first], lines)  # the options line may already carry text
+            else:
+                options, profile = _ingest_options(request.args.to_dict())
+                messages = ({"text": chunk} for chunk in _stream_chunks())
+        except ValueError as e:  # invalid JSON or unknown profile
+            return jsonify({"error": str(e)}), 400
+        try:
+            with use_profile(profile), metrics.span("generate_video"):
+                session = ingest.StreamingRender(**options)
+                for message in messages:
+                    if "text" in message:
+                        session.feed(message["text"] or "")
+                    if "explanation" in message:
+                        session.add_explanation(message["explanation"], message.get("index"), message.get("display"))
+                output_path = session.finish()
+        except Exception as e:
+            if session is not None:
+                session.abort()
+            REQUESTS.inc(mode="ingest", status="error")
+            if isinstance(e, ValueError):  # invalid stream (JSON, unknown sentence, empty script)
+                return jsonify({"error": str(e)}), 400
+            print(traceback.format_exc(), flush=True)
+            return jsonify({"error": str(e)}), 500
+    REQUESTS.inc(mode="ingest", status="ok")
+    warmup.mark_render_ok()
+    return jsonify({**_video_fields(output_path), "message": "Video generated successfully",
+                    "sentences": len(session.plan), "ingest": session.timings(),
+                    "timings": trace.summary(), "encode": trace.info.get("encode")})
+
+
+@app.route("/plan", methods=["POST"])
+def plan():
+    """
+    Dry-run estimate of a render (same payload as /generate, no TTS or encoding):
+    segments, audio duration, render time, expected queue wait and admission.
+    """
+    data = request.get_json()
+    kwargs = _video_kwargs(data)
+    if not kwargs["script_text"]:
+        return jsonify({"error": "script field is required"}), 400
+    if _flag(data.get("stream", False)):
+        kwargs["renderer"] = "ffmpeg"
+    try:
+        estimate = get_planner().estimate(**kwargs)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    estimate["queue"] = job_queue.wait_estimate(estimate["renderSeconds"])
+    estimate["maxRenderSeconds"] = JOB_MAX_RENDER_SECONDS or None
+    estimate["accepted"] = not JOB_MAX_RENDER_SECONDS or estimate["renderSeconds"] <= JOB_MAX_RENDER_SECONDS
+    return jsonify(estimate)
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+    body = {
+        "jobId": job["id"],
+        "status": job["status"],
+        "stage": job.get("stage"),
+        "stages": job["stages"],
+        "createdAt": job["created_at"],
+        "startedAt": job["started_at"],
+        "finishedAt": job["finished_at"],
+        "estimatedSeconds": job["estimated_seconds"],
+    }
+    if "queue_position" in job:
+        body["queuePosition"] = job["queue_position"]
+    if job["status"] == "done":
+        # Single render (videoUrl, playlistUrl) or batch (results, stats)
+        for key in ("videoUrl", "videoPath", "playlistUrl", "results", "stats", "timings", "encode", "cache", "segments"):
+            if key in job["result"]:
+                body[key] = job["result"][key]
+        body["message"] = "Video generated successfully"
+    elif job["status"] == "failed":
+        body["error"] = job["error"]
+    return jsonify(body)
+
+
+@app.route("/streams/<stream_id>/<path:filename>", methods=["GET"])
+def stream_file(stream_id, filename):
+    if not all(c in "0123456789abcdef" for c in stream_id):
+        return jsonify({"error": "unknown stream"}), 404
+    if filename.endswith(".m3u8"):
+        resp = send_from_directory(os.path.join(hls.STREAM_DIR, stream_id), filename,
+                                   mimetype="application/vnd.apple.mpegurl", max_age=0)
+        resp.headers["Cache-Control"] = "no-cache"  # the playlist grows during the render
+        return resp
+    return send_from_directory(os.path.join(hls.STREAM_DIR, stream_id), filename, mimetype="video/mp2t")
+
+
+@app.route("/videos/<name>", methods=["GET"])
+def video_file(name):
+    """
+    Produced video, served directly: Range requests (seeking during playback),
+    ETag / If-None-Match / If-Modified-Since, sent through the WSGI server's file_wrapper
+    (sendfile with gunicorn) or by the front proxy with USE_X_SENDFILE=1.
+    """
+    if not VIDEO_NAME.fullmatch(name):
+        return jsonify({"error": "unknown video"}), 404
+    # A video name is never reused: the content behind a URL never changes
+    resp = send_from_directory(os.path.abspath(workspace.output_dir()), name, mimetype="video/mp4",
+                               conditional=True, etag=True, max_age=VIDEO_CACHE_SECONDS)
+    resp.headers["Accept-Ranges"] = "bytes"  # advertised from the first response, not only on 206
+    return resp
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    _publish_stats()
+    return Response(metrics.render_prometheus(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/scheduler", methods=["GET"])
+def scheduler_status():
+    """Node CPU budget: cores in use and waiting stages, per stage (see scheduler.py)."""
+    return jsonify(scheduler.get_scheduler().snapshot())
+
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Readiness: 200 once the warm-up is done, 503 before (or if it failed)."""
+    body = warmup.readiness()
+    body["ready"] = body["status"] == "ready" or not WARMUP
+    return jsonify(body), 200 if body["ready"] else 503
+
+
+warmup.mark_imported()
+if WARMUP:
+    warmup.start_warm_up()
+
+
 if __name__ == "__main__":
     # Port 5000 par défaut
     app.run(host="0.0.0.0", port=8000, debug=True)
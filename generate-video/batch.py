@@ -0,0 +1,257 @@
+"""
+Rendu par lots : plusieurs scripts (par exemple tout un chapitre de cours) planifiés ensemble.
+
+- les phrases et explications identiques après normalisation ne sont synthétisées qu'une fois
+  pour tout le lot, et les slides identiques ne sont rendues qu'une fois ;
+- avec le moteur ffmpeg, un segment identique (phrase, explication, style, profil) n'est encodé
+  qu'une fois, puis repris par chaque vidéo qui l'utilise (via le cache de segments s'il est actif) ;
+- tout le travail passe par un seul pool de workers dans ce processus : les modèles TTS du
+  registre y sont chargés une seule fois ;
+- chaque script réussit ou échoue indépendamment : le résultat donne une entrée par script.
+"""
+import os
+import uuid
+import shutil
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from metrics import span
+from profiles import get_profile, use_profile
+from workspace import job_workspace, temp_dir, output_dir as default_output_dir
+from tts_engine import math_to_words, synthesize_many, TTS_BATCH_SIZE
+from video_generator import (
+    VIDEO_RENDERER,
+    explanation_for,
+    should_show_explanation,
+    split_to_units,
+    render_slide,
+    render_video,
+    _new_wav_path,
+    _audio_duration,
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "4"))
+BATCH_MAX_SCRIPTS = int(os.environ.get("BATCH_MAX_SCRIPTS", "50"))
+
+
+def normalize_text(text: str) -> str:
+    """Forme canonique d'une phrase pour la déduplication (espaces multiples, bords)."""
+    return " ".join(text.split())
+
+
+class BatchPlan:
+    """
+    Unités de travail uniques d'un lot et, pour chaque script, la liste de ses segments
+    exprimée en références vers ces unités.
+    """
+
+    def __init__(self, scripts):
+        self.audio = {}     # texte prononcé (math_to_words) -> texte source
+        self.slides = {}    # (texte, titre) -> None
+        self.scripts = []   # par script : {"kwargs", "segments": [...], "error"}
+        self.sentence_count = 0
+        for kwargs in scripts:
+            entry = {"kwargs": kwargs, "segments": [], "error": None}
+            self.scripts.append(entry)
+            try:
+                self._plan_script(entry)
+            except Exception as e:
+                entry["error"] = str(e)
+
+    def _audio_ref(self, text):
+        text = normalize_text(text)
+        key = math_to_words(text)
+        self.audio.setdefault(key, text)
+        return key
+
+    def _plan_script(self, entry):
+        kwargs = entry["kwargs"]
+        sentences = split_to_units(kwargs.get("script_text") or "", kwargs.get("granularity"))
+        if not sentences:
+            raise ValueError("Aucune diapositive trouvée.")
+        explanations = kwargs.get("explanations") or []
+        explanations_display = kwargs.get("explanations_display") or []
+        show_global = kwargs.get("show_explanations_text", False)
+        for idx, s in enumerate(sentences):
+            exp_text, exp_show = explanation_for(idx, explanations, explanations_display)
+            exp_text = normalize_text(exp_text) if exp_text else None
+            text = normalize_text(s)
+            slide = (text, kwargs.get("title") if idx == 0 else None)
+            self.slides[slide] = None
+            entry["segments"].append({
+                "slide": slide,
+                "s_audio": self._audio_ref(text),
+                "e_audio": self._audio_ref(exp_text) if exp_text else None,
+                "exp_text": exp_text,
+                "show": should_show_explanation(exp_text, exp_show, show_global),
+            })
+        self.sentence_count += len(sentences)
+
+    def stats(self):
+        audio_refs = sum(1 for e in self.scripts for seg in e["segments"]
+                         for ref in (seg["s_audio"], seg["e_audio"]) if ref)
+        return {
+            "scripts": len(self.scripts),
+            "sentences": self.sentence_count,
+            "audio": {"requested": audio_refs, "unique": len(self.audio)},
+            "slides": {"requested": self.sentence_count, "unique": len(self.slides)},
+        }
+
+
+class _Progress:
+    """Compteurs par étape, remontés via `progress(stage, done, total)`."""
+
+    def __init__(self, progress, totals):
+        self.progress = progress
+        self.totals = totals
+        self.done = dict.fromkeys(totals, 0)
+        self._lock = threading.Lock()
+        if progress:
+            for stage, total in totals.items():
+                progress(stage, 0, total)
+
+    def tick(self, stage):
+        with self._lock:
+            self.done[stage] += 1
+            done = self.done[stage]
+        if self.progress:
+            self.progress(stage, done, self.totals[stage])
+
+
+def render_batch(scripts, output_dir=None, renderer=None, profile=None, workers=None, progress=None):
+    """
+    Rend une liste de scripts (chacun un dict d'arguments de generate_video : script_text, title,
+    explanations, explanations_display, show_explanations_text, style, granularity) en mutualisant le travail.
+    Renvoie {"results": [{"index", "status", "videoUrl" | "error"}...], "stats": {...}}.
+    `progress` reçoit les étapes "audio", "slides", ("segments" avec ffmpeg) puis "encode" (une unité par script).
+    """
+    with job_workspace(), use_profile(profile):
+        return _render_batch(scripts, output_dir, renderer, workers, progress)
+
+
+def _render_batch(scripts, output_dir, renderer, workers, progress):
+    renderer = (renderer or VIDEO_RENDERER).lower()
+    if renderer not in ("moviepy", "ffmpeg"):
+        raise ValueError(f"Moteur de rendu inconnu : {renderer}")
+    if renderer == "ffmpeg":
+        from ffmpeg_renderer import ffmpeg_available
+        if not ffmpeg_available():
+            logger.warning("ffmpeg introuvable, lot rendu avec moviepy")
+            renderer = "moviepy"
+    output_dir = output_dir or default_output_dir()
+    profile = get_profile()
+
+    with span("batch_plan"):
+        plan = BatchPlan(scripts)
+    ok_scripts = [e for e in plan.scripts if e["error"] is None]
+
+    segment_keys = {}
+    if renderer == "ffmpeg":
+        from segment_cache import segment_key
+        for e in ok_scripts:
+            style = e["kwargs"].get("style") or {}
+            for seg in e["segments"]:
+                seg["key"] = segment_key(seg["slide"][0], seg["slide"][1], seg["exp_text"], seg["show"], style, profile)
+                segment_keys.setdefault(seg["key"], (seg, style))
+
+    totals = {"audio": len(plan.audio), "slides": len(plan.slides)}
+    if segment_keys:
+        totals["segments"] = len(segment_keys)
+    totals["encode"] = len(ok_scripts)
+    ticks = _Progress(progress, totals)
+    work_dir = temp_dir(prefix="batch_")
+
+    def _audio(chunk):
+        """Un appel TTS groupé pour un paquet de textes uniques : {clé: (wav, durée)}."""
+        paths = [_new_wav_path() for _ in chunk]
+        out = {}
+        for (key, _), (path, dur) in zip(chunk, synthesize_many([text for _, text in chunk], paths)):
+            out[key] = (path, dur if dur is not None else _audio_duration(path))
+            ticks.tick("audio")
+        return out
+
+    def _slide(text, title):
+        img = render_slide(text, None, title, profile)
+        ticks.tick("slides")
+        return img
+
+    def _segment_tuple(seg):
+        s_path, s_dur = audio[seg["s_audio"]].result()[seg["s_audio"]]
+        e_path, e_dur = audio[seg["e_audio"]].result()[seg["e_audio"]] if seg["e_audio"] else (None, 0.0)
+        # Le flag d'affichage est déjà résolu : il devient le flag par segment
+        return (slides[seg["slide"]].result(), s_path, s_dur, e_path, e_dur, seg["exp_text"], seg["show"])
+
+    def _encode_segment(key, seg, style):
+        import ffmpeg_renderer
+        from segment_cache import get_segment_cache
+        cache = get_segment_cache()
+        part = os.path.join(work_dir, f"seg_{uuid.uuid4().hex}.mp4")
+        if cache is None or not cache.fetch(key, part, link=True):
+            encoded = ffmpeg_renderer.encode_segments([(f"new_{uuid.uuid4().hex}", _segment_tuple(seg))],
+                                                      work_dir, False, style, workers=1)[0]
+            if cache is not None:
+                cache.put(key, encoded)
+            os.replace(encoded, part)
+        ticks.tick("segments")
+        return part
+
+    def _render_script(entry):
+        kwargs = entry["kwargs"]
+        output_path = os.path.join(output_dir, f"video_{uuid.uuid4().hex}.mp4")
+        try:
+            if renderer == "ffmpeg":
+                import ffmpeg_renderer
+                parts = [segments[seg["key"]].result() for seg in entry["segments"]]
+                with span("concat_batch"):
+                    ffmpeg_renderer.concat_segments(parts, output_path)
+            else:
+                tuples = [_segment_tuple(seg) for seg in entry["segments"]]
+                render_video(tuples, output_path, style=kwargs.get("style") or {}, renderer="moviepy")
+        except BaseException:
+            try: os.remove(output_path)
+            except OSError: pass
+            raise
+        finally:
+            ticks.tick("encode")
+        return os.path.abspath(output_path)
+
+    # Un seul pool, soumis dans l'ordre des dépendances : une tâche qui attend d'autres futures
+    # n'est démarrée qu'après elles (file FIFO), elle ne peut donc pas bloquer le pool.
+    pool = ThreadPoolExecutor(max_workers=max(1, int(workers or BATCH_WORKERS)), thread_name_prefix="batch")
+    bind = metrics.bind_context
+    results = []
+    try:
+        with span("batch_render"):
+            units = list(plan.audio.items())
+            audio = {}
+            for start in range(0, len(units), max(1, TTS_BATCH_SIZE)):
+                chunk = units[start:start + max(1, TTS_BATCH_SIZE)]
+                future = pool.submit(bind(_audio), chunk)
+                audio.update((key, future) for key, _ in chunk)
+            slides = {slide: pool.submit(bind(_slide), *slide) for slide in plan.slides}
+            segments = {key: pool.submit(bind(_encode_segment), key, seg, style)
+                        for key, (seg, style) in segment_keys.items()}
+            renders = {id(e): pool.submit(bind(_render_script), e) for e in ok_scripts}
+
+            for index, entry in enumerate(plan.scripts):
+                if entry["error"] is not None:
+                    results.append({"index": index, "status": "failed", "error": entry["error"]})
+                    continue
+                try:
+                    results.append({"index": index, "status": "done", "videoUrl": renders[id(entry)].result()})
+                except Exception as e:
+                    logger.warning("Batch script %d failed: %s", index, e)
+                    results.append({"index": index, "status": "failed", "error": str(e)})
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    stats = plan.stats()
+    if segment_keys:
+        stats["segments"] = {"requested": sum(len(e["segments"]) for e in ok_scripts), "unique": len(segment_keys)}
+    stats["failed"] = sum(1 for r in results if r["status"] == "failed")
+    return {"results": results, "stats": stats}
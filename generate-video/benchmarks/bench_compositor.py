@@ -0,0 +1,125 @@
+"""
+Micro-benchmark du compositeur uint8 contre l'ancienne chaîne moviepy
+(ImageClip → fadein/fadeout → resize(zoom) → CompositeVideoClip → astype('uint8')).
+
+Mesure, pour un segment avec trois panneaux d'explication :
+- le temps moyen par image,
+- les allocations par image (tracemalloc suit les tableaux NumPy),
+- l'écart de pixels entre les deux rendus.
+
+    python benchmarks/bench_compositor.py [--frames 120]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import moviepy.editor as mpy  # noqa: E402
+from video_generator import (  # noqa: E402
+    VIDEO_SIZE,
+    explanation_windows,
+    render_explanation_panel,
+    render_text_slide,
+    segment_compositor,
+)
+
+# moviepy 1.0.3 redimensionne avec Image.ANTIALIAS, retiré de Pillow 10 : nécessaire
+# uniquement pour reconstruire l'ancienne chaîne de référence.
+if not hasattr(Image, "ANTIALIAS"):
+    Image.ANTIALIAS = Image.LANCZOS
+
+SENTENCE = "We subtract 3 from both sides to isolate x."
+EXPLANATION = "Both sides stay balanced. The constant moves to the right. Now x is alone."
+S_DUR, E_DUR = 2.0, 4.5
+STYLE = {"overlay_opacity": 0.35, "zoom_strength": 0.03}
+
+
+def legacy_clip(img_path, tmp_dir):
+    """Reconstruction fidèle de l'ancien assemble_synced_video pour un segment."""
+    total_dur = S_DUR + E_DUR
+    clip = mpy.ImageClip(img_path).set_duration(total_dur)
+    clip = clip.fx(mpy.vfx.fadein, 0.3).fx(mpy.vfx.fadeout, 0.3)
+    subclips = []
+    for i, (sub, _, per_dur) in enumerate(explanation_windows(EXPLANATION, E_DUR)):
+        png = os.path.join(tmp_dir, f"legacy_exp_{i}.png")
+        render_explanation_panel(sub, png, STYLE["overlay_opacity"])
+        sub_clip = mpy.ImageClip(png).set_duration(per_dur).set_position(("center", "center"))
+
+        def sub_zoom(t, _pd=per_dur):
+            return 1.0 + STYLE["zoom_strength"] * (t / max(_pd, 1e-6))
+        sub_clip = sub_clip.resize(lambda t, _z=sub_zoom: _z(t))
+        sub_clip = sub_clip.fx(mpy.vfx.fadein, 0.15).fx(mpy.vfx.fadeout, 0.15)
+        subclips.append(sub_clip)
+    exp_seq = mpy.concatenate_videoclips(subclips, method="compose")
+    exp_seq = exp_seq.set_start(S_DUR).set_duration(E_DUR).fl_image(lambda pic: pic.astype('uint8'))
+    clip = mpy.CompositeVideoClip([clip, exp_seq], size=VIDEO_SIZE).set_duration(total_dur)
+    return clip.fl_image(lambda pic: pic.astype('uint8'))
+
+
+def measure(get_frame, times):
+    get_frame(times[0])  # échauffement (tampons, caches)
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start_cur, _ = tracemalloc.get_traced_memory()
+    t0 = time.perf_counter()
+    allocated = 0
+    for t in times:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        get_frame(t)
+        _, peak = tracemalloc.get_traced_memory()
+        allocated += max(peak - before, 0)
+    elapsed = time.perf_counter() - t0
+    tracemalloc.stop()
+    return elapsed / len(times), allocated / len(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=120)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        img_path = os.path.join(tmp_dir, "slide.png")
+        render_text_slide(SENTENCE, img_path, title="Bench")
+        total = S_DUR + E_DUR
+        times = list(np.linspace(0, total - 1e-3, args.frames))
+
+        legacy = legacy_clip(img_path, tmp_dir)
+        comp = segment_compositor(img_path, S_DUR, E_DUR, EXPLANATION, True, True, STYLE)
+
+        # Statistiques cumulées image par image : aucune image de différence n'est conservée
+        hist = np.zeros(256, dtype=np.int64)
+        diff_sum, diff_max, over_16, samples = 0, 0, 0, 0
+        for t in times:
+            d = np.abs(legacy.get_frame(t).astype(np.int16) - comp.make_frame(t).astype(np.int16)).astype(np.uint8)
+            hist += np.bincount(d.ravel(), minlength=256)
+            diff_sum += int(d.sum(dtype=np.int64))
+            diff_max = max(diff_max, int(d.max()))
+            over_16 += int(np.count_nonzero(d > 16))
+            samples += d.size
+            del d
+        legacy_t, legacy_alloc = measure(legacy.get_frame, times)
+        comp_t, comp_alloc = measure(comp.make_frame, times)
+
+    print(f"frames: {len(times)} ({VIDEO_SIZE[0]}x{VIDEO_SIZE[1]})")
+    print(f"moviepy float64 : {legacy_t * 1000:8.2f} ms/frame  {legacy_alloc / 1e6:8.2f} MB alloc/frame")
+    print(f"uint8 compositor: {comp_t * 1000:8.2f} ms/frame  {comp_alloc / 1e6:8.2f} MB alloc/frame")
+    print(f"speed-up        : {legacy_t / comp_t:8.1f}x")
+    p99 = int(np.searchsorted(np.cumsum(hist), 0.99 * samples))
+    print(f"pixel diff      : mean {diff_sum / samples:.3f}, "
+          f"p99 {p99}, "
+          f"max {diff_max}, "
+          f"> 16 levels on {100 * over_16 / samples:.3f}% of samples "
+          f"(bords du texte zoomé : plus proche voisin vs Lanczos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Jobs concurrents sous le budget CPU (scheduler.py) : débit et latence de N rendus lancés en
+même temps, avec et sans ordonnanceur (CPU_SCHEDULER=0), chacun dans un processus neuf.
+TTS factice (benchmarks/stub_tts.py) ; l'encodage x264 est la charge CPU réelle.
+
+    python benchmarks/bench_cpu_budget.py [--jobs 1 2 4 8] [--sentences 6] [--renderer ffmpeg]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+CHILD = r"""
+import os, sys, time, json, threading
+sys.path.insert(0, {here!r}); sys.path.insert(0, {root!r})
+import stub_tts; stub_tts.install()
+from video_generator import generate_video
+import scheduler
+script = " ".join(f"Job sentence number {{i}} about the topic." for i in range({sentences}))
+latencies = []
+def job(k):
+    t0 = time.perf_counter()
+    generate_video(script + f" Job {{k}}.", title="Bench", renderer={renderer!r}, profile="standard")
+    latencies.append(time.perf_counter() - t0)
+t0 = time.perf_counter()
+threads = [threading.Thread(target=job, args=(k,)) for k in range({jobs})]
+[t.start() for t in threads]; [t.join() for t in threads]
+wall = time.perf_counter() - t0
+print(json.dumps({{"wall": wall, "latencies": sorted(latencies), "scheduler": scheduler.get_scheduler().snapshot()}}))
+"""
+
+
+def run(jobs, sentences, renderer, enabled):
+    output_dir = os.environ.get("OUTPUT_DIR", "/tmp/bench_cpu_budget")
+    os.makedirs(output_dir, exist_ok=True)
+    env = dict(os.environ, CPU_SCHEDULER="1" if enabled else "0", TTS_CACHE="0", SEGMENT_CACHE="0",
+               RESULT_CACHE="0", OUTPUT_DIR=output_dir)
+    code = CHILD.format(here=HERE, root=ROOT, jobs=jobs, sentences=sentences, renderer=renderer)
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True,
+                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--sentences", type=int, default=6)
+    ap.add_argument("--renderer", default="ffmpeg")
+    args = ap.parse_args()
+    print(f"{'jobs':>4} {'scheduler':>9} {'wall s':>8} {'jobs/min':>8} {'p50 s':>7} {'max s':>7} {'waits':>6}")
+    for jobs in args.jobs:
+        for enabled in (False, True):
+            r = run(jobs, args.sentences, args.renderer, enabled)
+            lat = r["latencies"]
+            waits = sum(r["scheduler"]["waited"].values())
+            print(f"{jobs:>4} {'on' if enabled else 'off':>9} {r['wall']:>8.2f} {60 * jobs / r['wall']:>8.1f} "
+                  f"{lat[len(lat) // 2]:>7.2f} {lat[-1]:>7.2f} {waits:>6}")
+    print(f"budget: {r['scheduler']['budget']} cores")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Micro-benchmark du normaliseur math_to_words compilé contre l'ancienne implémentation
+(dictionnaire reconstruit et trié à chaque appel, puis un str.replace par symbole).
+
+    python benchmarks/bench_normalizer.py [--sentences 2000] [--repeat 5]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_engine import EN_SYMBOLS, math_to_words, normalize_many  # noqa: E402
+from video_generator import split_to_sentences  # noqa: E402
+
+FRAGMENTS = [
+    "Let's simplify", "We compute gcd(84, 36) = 12", "so x^2 + 2x - 3 = 0",
+    "the angle is 45 deg", "a ≡ b mod n", "for all x ∈ ℝ, x² ≥ 0",
+    "the model degrades when the modulus grows", "√(a² + b²) ≈ 5",
+    "∑ i from 1 to n = n(n+1)/2", "This is the final answer",
+]
+
+
+def legacy_math_to_words(text):
+    """Copie de l'ancienne implémentation (référence de comparaison)."""
+    replacements = dict(EN_SYMBOLS)  # l'ancien code reconstruisait le dict littéral à chaque appel
+    for symbol, word in sorted(replacements.items(), key=lambda kv: -len(kv[0])):
+        text = text.replace(symbol, word)
+    return ' '.join(text.split())
+
+
+def make_script(n_sentences, seed=0):
+    rng = random.Random(seed)
+    return ". ".join(" and ".join(rng.sample(FRAGMENTS, 2)) for _ in range(n_sentences)) + "."
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sentences", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    sentences = split_to_sentences(make_script(args.sentences))
+    chars = sum(len(s) for s in sentences)
+
+    legacy = best_of(lambda: [legacy_math_to_words(s) for s in sentences], args.repeat)
+    compiled = best_of(lambda: [math_to_words(s) for s in sentences], args.repeat)
+    batch = best_of(lambda: normalize_many(sentences), args.repeat)
+
+    changed = sum(legacy_math_to_words(s) != math_to_words(s) for s in sentences)
+    print(f"{len(sentences)} sentences, {chars} chars")
+    print(f"legacy str.replace : {legacy * 1000:8.2f} ms  ({legacy / len(sentences) * 1e6:6.1f} us/sentence)")
+    print(f"compiled regex     : {compiled * 1000:8.2f} ms  ({compiled / len(sentences) * 1e6:6.1f} us/sentence)")
+    print(f"normalize_many     : {batch * 1000:8.2f} ms  ({batch / len(sentences) * 1e6:6.1f} us/sentence)")
+    print(f"speed-up           : {legacy / batch:8.1f}x")
+    print(f"outputs that differ: {changed} (mots contenant 'mod'/'deg'/'gcd' désormais préservés)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Benchmark hors ligne, étape par étape, du pipeline vidéo avec un TTS factice déterministe
+(benchmarks/stub_tts.py) : aucun modèle Coqui/pyttsx3 n'est nécessaire.
+
+Étapes mesurées : split_to_sentences, render_text_slide, create_sentence_segments,
+assemble_synced_video et generate_video complet, sur des scripts courts, moyens et
+« livre », avec et sans panneaux d'explication. Chaque mesure tourne dans un processus
+neuf pour que le pic de RSS soit celui de l'étape ; on relève temps réel, temps CPU
+(processus + enfants ffmpeg) et pic de RSS.
+
+    python benchmarks/bench_pipeline.py --output results.json
+    python benchmarks/bench_pipeline.py --baseline results.json --threshold 0.25   # code 1 si régression
+    python benchmarks/bench_pipeline.py --sizes book --stages generate_video --overlays on
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import platform
+import tempfile
+import argparse
+import subprocess
+
+try:
+    import resource
+except ImportError:  # Windows : pas de getrusage
+    resource = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+STAGES = ["split_to_sentences", "render_text_slide", "create_sentence_segments",
+          "assemble_synced_video", "generate_video"]
+SIZES = {"small": 5, "medium": 40, "book": 400}
+# Les étapes sans audio ni panneau ne dépendent pas des explications
+OVERLAY_STAGES = {"create_sentence_segments", "assemble_synced_video", "generate_video"}
+
+WORDS = ("the derivative of x squared is two x so the slope grows linearly and we can "
+         "integrate both sides to recover the area under the curve between a and b").split()
+
+
+def make_script(n_sentences, seed=0):
+    rng = random.Random(seed)
+    sentences = []
+    for _ in range(n_sentences):
+        words = rng.sample(WORDS, rng.randint(6, 14))
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def make_explanations(n_sentences, seed=1):
+    rng = random.Random(seed)
+    return [". ".join(" ".join(rng.sample(WORDS, 5)).capitalize() for _ in range(2)) + "."
+            if i % 2 == 0 else "" for i in range(n_sentences)]
+
+
+# ----------------------------------------------------------------------------------------
+# Mesure d'une étape (processus fils)
+# ----------------------------------------------------------------------------------------
+def _usage():
+    if resource is None:
+        return time.process_time(), 0.0, None
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss : kilo-octets sous Linux, octets sous macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return own.ru_utime + own.ru_stime, children.ru_utime + children.ru_stime, own.ru_maxrss * scale
+
+
+def run_one(stage, size, overlays, renderer):
+    import stub_tts
+    stub_tts.install()
+    import video_generator as vg
+
+    n = SIZES[size]
+    script = make_script(n)
+    explanations = make_explanations(n) if overlays else []
+    work_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    segments = []
+    try:
+        # Préparation hors chronomètre
+        sentences = vg.split_to_sentences(script)
+        if stage == "assemble_synced_video":
+            segments = vg.create_sentence_segments(script, title="Bench", tmp_dir=work_dir,
+                                                   explanations=explanations, in_memory=True)
+
+        cpu0, child0, _ = _usage()
+        t0 = time.perf_counter()
+        if stage == "split_to_sentences":
+            vg.split_to_sentences(script)
+        elif stage == "render_text_slide":
+            for idx, s in enumerate(sentences):
+                vg.render_text_slide(s, os.path.join(work_dir, f"slide_{idx:04d}.png"),
+                                     title="Bench" if idx == 0 else None)
+        elif stage == "create_sentence_segments":
+            segments = vg.create_sentence_segments(script, title="Bench", tmp_dir=work_dir,
+                                                   explanations=explanations)
+        elif stage == "assemble_synced_video":
+            vg.assemble_synced_video(segments, os.path.join(work_dir, "out.mp4"),
+                                     show_explanations_text=overlays)
+        elif stage == "generate_video":
+            vg.generate_video(script, title="Bench", output_dir=work_dir, explanations=explanations,
+                              show_explanations_text=overlays, renderer=renderer)
+        else:
+            raise ValueError(f"Unknown stage: {stage}")
+        wall = time.perf_counter() - t0
+        cpu1, child1, peak = _usage()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "stage": stage, "size": size, "overlays": bool(overlays), "sentences": len(sentences),
+        "wall_s": round(wall, 4), "cpu_s": round(cpu1 - cpu0, 4),
+        "children_cpu_s": round(child1 - child0, 4),
+        "peak_rss_mb": round(peak / (1024 * 1024), 1) if peak else None,
+    }
+
+
+def measure(stage, size, overlays, renderer, repeat):
+    """Lance `repeat` processus neufs et garde la meilleure mesure de temps (pic RSS maximal)."""
+    env = dict(os.environ, TTS_CACHE="0", SEGMENT_CACHE="0", TTS_PRELOAD="0")
+    runs = []
+    for _ in range(repeat):
+        cmd = [sys.executable, os.path.abspath(__file__), "--run-one", stage, size,
+               "on" if overlays else "off", renderer]
+        proc = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{stage}/{size} failed:\n{proc.stderr.decode('utf-8', 'replace')[-2000:]}")
+        runs.append(json.loads(proc.stdout.decode("utf-8").strip().splitlines()[-1]))
+    best = min(runs, key=lambda r: r["wall_s"])
+    rss = [r["peak_rss_mb"] for r in runs if r["peak_rss_mb"] is not None]
+    best["peak_rss_mb"] = max(rss) if rss else None
+    return best
+
+
+# ----------------------------------------------------------------------------------------
+# Comparaison avec une référence
+# ----------------------------------------------------------------------------------------
+def _key(r):
+    return r["stage"], r["size"], r["overlays"]
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Liste des régressions (temps réel ou pic RSS) au-delà de `threshold` (fraction)."""
+    base = {_key(r): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        ref = base.get(_key(r))
+        if ref is None:
+            continue
+        for metric, floor in (("wall_s", min_delta), ("peak_rss_mb", 5.0)):
+            old, new = ref.get(metric), r.get(metric)
+            if not old or new is None:
+                continue
+            if new > old * (1 + threshold) and new - old > floor:
+                regressions.append({"stage": r["stage"], "size": r["size"], "overlays": r["overlays"],
+                                    "metric": metric, "baseline": old, "current": new,
+                                    "ratio": round(new / old, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--sizes", default="small,medium", help="small, medium, book")
+    parser.add_argument("--overlays", choices=["on", "off", "both"], default="both")
+    parser.add_argument("--renderer", default="moviepy", help="moteur de generate_video (moviepy/ffmpeg)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", help="fichier JSON des résultats")
+    parser.add_argument("--baseline", help="résultats de référence (JSON produit par --output)")
+    parser.add_argument("--threshold", type=float, default=0.25, help="régression tolérée (0.25 = +25%%)")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="écart minimal en secondes")
+    parser.add_argument("--run-one", nargs=4, metavar=("STAGE", "SIZE", "OVERLAYS", "RENDERER"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        stage, size, overlays, renderer = args.run_one
+        print(json.dumps(run_one(stage, size, overlays == "on", renderer)))
+        return 0
+
+    stages = [s for s in args.stages.split(",") if s]
+    sizes = [s for s in args.sizes.split(",") if s]
+    for name in stages:
+        if name not in STAGES:
+            parser.error(f"unknown stage {name!r}")
+    for name in sizes:
+        if name not in SIZES:
+            parser.error(f"unknown size {name!r}")
+    overlay_modes = {"on": [True], "off": [False], "both": [False, True]}[args.overlays]
+
+    results = []
+    print(f"{'stage':<26}{'size':<8}{'overlays':<10}{'wall s':>9}{'cpu s':>9}{'ffmpeg s':>10}{'rss MB':>9}")
+    for stage in stages:
+        for size in sizes:
+            for overlays in (overlay_modes if stage in OVERLAY_STAGES else [False]):
+                r = measure(stage, size, overlays, args.renderer, args.repeat)
+                results.append(r)
+                print(f"{stage:<26}{size:<8}{str(overlays):<10}{r['wall_s']:>9.3f}{r['cpu_s']:>9.3f}"
+                      f"{r['children_cpu_s']:>10.3f}{(r['peak_rss_mb'] or 0):>9.1f}")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "renderer": args.renderer,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta)
+        report["regressions"] = regressions
+        for reg in regressions:
+            print(f"REGRESSION {reg['stage']}/{reg['size']}/overlays={reg['overlays']}: "
+                  f"{reg['metric']} {reg['baseline']} -> {reg['current']} (x{reg['ratio']})")
+        if regressions:
+            status = 1
+        else:
+            print(f"No regression beyond {args.threshold:.0%} against {args.baseline}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Démarrage du service : temps d'import de app.py (processus neuf, `-X importtime`),
+puis temps jusqu'à /ready et jusqu'au premier rendu réussi, mesurés depuis le
+démarrage du processus (voir warmup.py). TTS factice (benchmarks/stub_tts.py) par défaut.
+
+    python benchmarks/bench_startup.py [--renderer ffmpeg] [--top 10] [--repeat 3]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+CHILD = r"""
+import os, sys, time, json
+sys.path.insert(0, {here!r}); sys.path.insert(0, {root!r})
+import stub_tts; stub_tts.install()
+import app, warmup
+client = app.app.test_client()
+while client.get("/ready").status_code != 200:
+    if warmup.readiness()["status"] == "failed":
+        raise SystemExit(warmup.readiness()["error"])
+    time.sleep(0.01)
+state = warmup.readiness()
+print(json.dumps(state))
+"""
+
+
+def import_profile(top):
+    """Temps cumulé d'import de app et des modules les plus coûteux (µs)."""
+    env = dict(os.environ, WARMUP="0", OUTPUT_SWEEP_INTERVAL="0")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=ROOT, env=env,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            rows.append((int(cumulative), name.rstrip()))
+        except ValueError:
+            continue
+    total = next((c for c, n in rows if n.strip() == "app"), None)
+    heavy = sorted(((c, n.strip()) for c, n in rows if n.startswith("   ") and not n.startswith("     ")),
+                   reverse=True)[:top]
+    return total, heavy
+
+
+def startup(renderer):
+    env = dict(os.environ, WARMUP="1", OUTPUT_SWEEP_INTERVAL="0", TTS_CACHE="0", VIDEO_RENDERER=renderer)
+    proc = subprocess.run([sys.executable, "-c", CHILD.format(here=HERE, root=ROOT)], cwd=ROOT, env=env,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renderer", default="moviepy")
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    total, heavy = import_profile(args.top)
+    print(f"import app : {total / 1000:8.1f} ms")
+    for cumulative, name in heavy:
+        print(f"  {name:<24} {cumulative / 1000:8.1f} ms")
+
+    runs = [startup(args.renderer) for _ in range(args.repeat)]
+    best = min(runs, key=lambda r: r["first_render_seconds"])
+    print(f"depuis le démarrage du processus ({args.renderer}, meilleur de {args.repeat}) :")
+    print(f"  import terminé      : {best['import_seconds']:7.2f} s")
+    print(f"  prêt (/ready)       : {best['ready_seconds']:7.2f} s"
+          f"  (préchargement {best['warmup_seconds']:.2f} s : "
+          + ", ".join(f"{k} {v:.2f} s" for k, v in best["steps"].items()) + ")")
+    print(f"  premier rendu réussi: {best['first_render_seconds']:7.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Débit du TTS groupé (tts_engine.synthesize_many) contre le chemin phrase par phrase
+(synthesize_audio_cached), sur les phrases et explications d'un script.
+
+Par défaut le backend est le stub (benchmarks/stub_tts.py) avec un coût fixe simulé par
+appel (`--call-overhead`) ; `--backend coqui` ou `--backend pyttsx3` mesure un vrai modèle,
+chargé avant le chronomètre. Le cache audio est désactivé pendant la mesure.
+
+Le stub groupé ne paie son coût fixe qu'une fois par groupe, par construction : ses chiffres
+vérifient la mécanique des lots, pas le gain d'un vrai backend (à mesurer avec --backend).
+Coqui n'a pas d'appel groupé et passe par le chemin phrase par phrase.
+
+    python benchmarks/bench_tts_batch.py [--sentences 40] [--batch-sizes 1,4,8,16]
+    python benchmarks/bench_tts_batch.py --backend coqui --sentences 20 --batch-sizes 8
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+os.environ["TTS_CACHE"] = "0"
+
+import tts_engine  # noqa: E402
+from bench_pipeline import make_script, make_explanations  # noqa: E402
+from video_generator import split_to_sentences  # noqa: E402
+from wav_audio import wav_duration  # noqa: E402
+
+
+def texts_for(n_sentences):
+    sentences = split_to_sentences(make_script(n_sentences))
+    return sentences + [e for e in make_explanations(len(sentences)) if e]
+
+
+def run(texts, work_dir, batch_size):
+    """Durée de synthèse de tous les textes ; batch_size None = une phrase par appel."""
+    paths = [os.path.join(work_dir, f"{batch_size}_{i:04d}.wav") for i in range(len(texts))]
+    t0 = time.perf_counter()
+    if batch_size is None:
+        for text, path in zip(texts, paths):
+            tts_engine.synthesize_audio_cached(text, path)
+    else:
+        tts_engine.synthesize_many(texts, paths, batch_size=batch_size)
+    wall = time.perf_counter() - t0
+    audio = sum(wav_duration(p) for p in paths)
+    return wall, audio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sentences", type=int, default=40)
+    parser.add_argument("--batch-sizes", default="1,4,8,16")
+    parser.add_argument("--backend", default="stub")
+    parser.add_argument("--call-overhead", type=float, default=0.05,
+                        help="coût fixe simulé par appel du stub, en secondes")
+    args = parser.parse_args()
+
+    if args.backend == "stub":
+        import stub_tts
+        stub_tts.install(call_overhead=args.call_overhead, batch=True)
+    else:
+        os.environ["TTS_BACKEND"] = args.backend
+        tts_engine.get_model(args.backend)
+
+    texts = texts_for(args.sentences)
+    work_dir = tempfile.mkdtemp(prefix="bench_tts_batch_")
+    try:
+        run(texts[:2], work_dir, 2)  # échauffement (modèle, normaliseur)
+        print(f"backend {args.backend}, {len(texts)} textes (phrases + explications)")
+        base_wall, base_audio = run(texts, work_dir, None)
+        print(f"phrase par phrase : {base_wall:8.2f} s  {len(texts) / base_wall:7.1f} textes/s"
+              f"  {base_audio / base_wall:7.1f} s audio/s")
+        for size in [int(s) for s in args.batch_sizes.split(",") if s]:
+            wall, audio = run(texts, work_dir, size)
+            drift = abs(audio - base_audio)
+            print(f"groupes de {size:<6} : {wall:8.2f} s  {len(texts) / wall:7.1f} textes/s"
+                  f"  {audio / wall:7.1f} s audio/s  x{base_wall / wall:5.2f}  (écart de durée {drift:.3f} s)")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Backend TTS déterministe pour les benchmarks : écrit un WAV de silence ou de tonalité
+dont la durée est proportionnelle à la longueur du texte. Aucun modèle à charger,
+donc les mesures ne reflètent que le pipeline vidéo. `call_overhead` simule le coût fixe
+d'un appel au modèle (payé une fois par appel groupé avec `batch=True`).
+
+    import stub_tts; stub_tts.install()        # puis TTS_BACKEND=stub (fait par install)
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tts_engine  # noqa: E402
+from wav_audio import write_wav  # noqa: E402
+
+STUB_RATE = 22050
+STUB_BASE_SECONDS = 0.3
+STUB_SECONDS_PER_CHAR = 0.03
+
+
+def stub_duration(text, base=STUB_BASE_SECONDS, per_char=STUB_SECONDS_PER_CHAR):
+    return base + per_char * len(text)
+
+
+def make_stub_synthesize(tone=True, base=STUB_BASE_SECONDS, per_char=STUB_SECONDS_PER_CHAR, rate=STUB_RATE,
+                         call_overhead=0.0):
+    """Fonction `synthesize(model, text, output_path, **voice)` au format de register_backend."""
+    def synthesize(model, text, output_path, _overhead=True, **voice):
+        if call_overhead and _overhead:
+            time.sleep(call_overhead)
+        n = int(rate * stub_duration(text, base, per_char))
+        if tone:
+            # Fréquence dérivée du texte : même phrase → même fichier, d'un run à l'autre
+            freq = 220.0 + (sum(map(ord, text)) % 440)
+            samples = 0.1 * np.sin(2 * np.pi * freq * np.arange(n) / rate)
+        else:
+            samples = np.zeros(n, dtype=np.float32)
+        return write_wav(output_path, samples, rate)
+    return synthesize
+
+
+def make_stub_synthesize_many(synthesize, call_overhead=0.0):
+    """Version groupée (`synthesize_many`) : un seul coût fixe pour tout le groupe."""
+    def synthesize_many(model, texts, output_paths, **voice):
+        if call_overhead:
+            time.sleep(call_overhead)
+        for text, path in zip(texts, output_paths):
+            synthesize(model, text, path, _overhead=False, **voice)
+        return output_paths
+    return synthesize_many
+
+
+def install(name="stub", tone=True, base=STUB_BASE_SECONDS, per_char=STUB_SECONDS_PER_CHAR,
+            call_overhead=0.0, batch=False):
+    """Enregistre le backend et le sélectionne pour tout le processus (TTS_BACKEND)."""
+    synthesize = make_stub_synthesize(tone, base, per_char, call_overhead=call_overhead)
+    many = make_stub_synthesize_many(synthesize, call_overhead) if batch else None
+    tts_engine.register_backend(name, synthesize, default_model="stub", synthesize_many=many)
+    os.environ["TTS_BACKEND"] = name
+    return name
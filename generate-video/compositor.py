@@ -0,0 +1,157 @@
+"""
+Compositeur uint8 / virgule fixe pour les segments "slide + panneaux d'explication".
+
+Remplace, pour chaque segment, la chaîne moviepy ImageClip → fadein/fadeout → resize(zoom)
+→ CompositeVideoClip → astype('uint8') qui promeut chaque image en float64. Ici :
+- la slide et les panneaux sont convertis UNE fois (panneaux recadrés sur leur rectangle,
+  RGB prémultiplié par l'alpha en entiers 0..256) ;
+- les fondus sont des multiplications entières (facteur 0..256 puis >> 8) ;
+- le zoom est un échantillonnage par indices (np.take) dans des tampons préalloués ;
+- seul le rectangle du panneau est mélangé, le reste de l'image est une simple copie.
+
+Le résultat est équivalent au pipeline moviepy à quelques niveaux de gris près
+(arrondis des fondus, interpolation au plus proche pour le zoom).
+"""
+import threading
+
+import numpy as np
+
+FADE_DUR = 0.3
+OVERLAY_FADE_DUR = 0.15
+
+_scratch = threading.local()
+
+
+def _buffer(name, shape, dtype):
+    """Tampon réutilisé par thread : les images sont produites une par une."""
+    bufs = getattr(_scratch, "bufs", None)
+    if bufs is None:
+        bufs = _scratch.bufs = {}
+    buf = bufs.get(name)
+    if buf is None or buf.size < int(np.prod(shape)) or buf.dtype != dtype:
+        buf = bufs[name] = np.empty(int(np.prod(shape)), dtype=dtype)
+    return buf[:int(np.prod(shape))].reshape(shape)
+
+
+def _fade_factor(t, duration, fade_in, fade_out):
+    """Facteur de fondu (vers le noir) au format virgule fixe 0..256."""
+    f = 1.0
+    if fade_in > 0 and t < fade_in:
+        f = min(f, t / fade_in)
+    if fade_out > 0 and t > duration - fade_out:
+        f = min(f, max(duration - t, 0.0) / fade_out)
+    return int(f * 256)
+
+
+class PanelOverlay:
+    """Un panneau RGBA plein cadre, précalculé une fois pour toute sa fenêtre d'affichage."""
+
+    def __init__(self, rgba, start, duration, zoom_strength=0.03, fade=OVERLAY_FADE_DUR):
+        rgba = np.asarray(rgba)
+        self.frame_h, self.frame_w = rgba.shape[:2]
+        self.start = float(start)
+        self.duration = float(duration)
+        self.zoom_strength = float(zoom_strength)
+        self.fade = fade
+
+        alpha = rgba[:, :, 3]
+        ys, xs = np.nonzero(alpha)
+        if len(ys) == 0:
+            self.empty = True
+            return
+        self.empty = False
+        self.y0, self.y1 = int(ys.min()), int(ys.max()) + 1
+        self.x0, self.x1 = int(xs.min()), int(xs.max()) + 1
+        h, w = self.y1 - self.y0, self.x1 - self.x0
+
+        # +1 ligne/colonne transparente : cible des indices hors du panneau pendant le zoom
+        a = np.zeros((h + 1, w + 1, 1), dtype=np.uint32)
+        a[:h, :w, 0] = (alpha[self.y0:self.y1, self.x0:self.x1].astype(np.uint32) * 256 + 127) // 255
+        prem = np.zeros((h + 1, w + 1, 3), dtype=np.uint32)
+        prem[:h, :w] = rgba[self.y0:self.y1, self.x0:self.x1, :3].astype(np.uint32) * a[:h, :w]
+        self.alpha = a
+        self.prem = prem
+
+        # Zone de destination maximale (zoom final), bornée à l'image
+        z = 1.0 + max(self.zoom_strength, 0.0)
+        ox = int((self.frame_w - int(self.frame_w * z)) / 2)
+        oy = int((self.frame_h - int(self.frame_h * z)) / 2)
+        self.dy0 = max(0, int(np.floor(self.y0 * z)) + oy - 1)
+        self.dy1 = min(self.frame_h, int(np.ceil(self.y1 * z)) + oy + 1)
+        self.dx0 = max(0, int(np.floor(self.x0 * z)) + ox - 1)
+        self.dx1 = min(self.frame_w, int(np.ceil(self.x1 * z)) + ox + 1)
+        self._dest_rows = np.arange(self.dy0, self.dy1)
+        self._dest_cols = np.arange(self.dx0, self.dx1)
+
+    def active(self, t):
+        return not self.empty and self.start <= t < self.start + self.duration
+
+    def _indices(self, dest, size, z, lo, hi):
+        """Indices source (relatifs au panneau) pour chaque pixel de destination, zoom centré."""
+        offset = int((size - int(size * z)) / 2)
+        src = np.floor((dest - offset + 0.5) / z).astype(np.intp)
+        inside = (src >= lo) & (src < hi)
+        return np.where(inside, src - lo, hi - lo)  # hors panneau → ligne/colonne transparente
+
+    def blend_into(self, out, t):
+        """Mélange le panneau (fondu + zoom au temps t) dans `out` (uint8, modifié sur place)."""
+        lt = t - self.start
+        z = 1.0 + self.zoom_strength * (lt / max(self.duration, 1e-6))
+        rows = self._indices(self._dest_rows, self.frame_h, z, self.y0, self.y1)
+        cols = self._indices(self._dest_cols, self.frame_w, z, self.x0, self.x1)
+        dh, dw = len(rows), len(cols)
+
+        tmp_p = _buffer("prem_rows", (dh, self.prem.shape[1], 3), np.uint32)
+        tmp_a = _buffer("alpha_rows", (dh, self.alpha.shape[1], 1), np.uint32)
+        prem = _buffer("prem", (dh, dw, 3), np.uint32)
+        alpha = _buffer("alpha", (dh, dw, 1), np.uint32)
+        np.take(self.prem, rows, axis=0, out=tmp_p, mode="clip")
+        np.take(tmp_p, cols, axis=1, out=prem, mode="clip")
+        np.take(self.alpha, rows, axis=0, out=tmp_a, mode="clip")
+        np.take(tmp_a, cols, axis=1, out=alpha, mode="clip")
+
+        # Le fondu du panneau assombrit ses couleurs, pas son masque (comme vfx.fadein/fadeout)
+        f = _fade_factor(lt, self.duration, self.fade, self.fade)
+        region = out[self.dy0:self.dy1, self.dx0:self.dx1]
+        acc = _buffer("acc", (dh, dw, 3), np.uint32)
+        np.subtract(256, alpha, out=alpha)
+        np.multiply(region, alpha, out=acc)
+        if f < 256:
+            np.multiply(prem, f, out=prem)
+            np.right_shift(prem, 8, out=prem)
+        np.add(acc, prem, out=acc)
+        np.right_shift(acc, 8, out=acc)
+        np.copyto(region, acc, casting="unsafe")
+
+
+class SegmentCompositor:
+    """
+    Produit les images d'un segment : slide avec fondu d'entrée/sortie, puis panneaux
+    d'explication superposés sur leurs fenêtres. `make_frame(t)` s'utilise avec mpy.VideoClip.
+    """
+
+    def __init__(self, base_rgb, duration, overlays=(), fade=FADE_DUR):
+        self.base = np.ascontiguousarray(np.asarray(base_rgb)[:, :, :3], dtype=np.uint8)
+        self.duration = float(duration)
+        self.fade = fade
+        self.overlays = [o for o in overlays if not o.empty]
+
+    @property
+    def size(self):
+        return self.base.shape[1], self.base.shape[0]
+
+    def make_frame(self, t):
+        # Tampon de sortie réutilisé : write_videofile envoie chaque image à ffmpeg avant la suivante
+        out = _buffer("frame", self.base.shape, np.uint8)
+        f = _fade_factor(t, self.duration, self.fade, self.fade)
+        if f >= 256:
+            np.copyto(out, self.base)
+        else:
+            tmp = _buffer("base_fade", self.base.shape, np.uint16)
+            np.multiply(self.base, f, out=tmp, dtype=np.uint16)
+            np.right_shift(tmp, 8, out=tmp)
+            np.copyto(out, tmp, casting="unsafe")
+        for overlay in self.overlays:
+            if overlay.active(t):
+                overlay.blend_into(out, t)
+        return out
@@ -0,0 +1,157 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    """
+    Content-addressed on-disk cache shared by every worker of the machine.
+    Entries are written atomically (temp file + os.replace) and evicted in LRU order
+    (mtime is refreshed on each hit) once the total size exceeds `max_bytes`.
+    """
+
+    def __init__(self, root, max_bytes, suffix=""):
+        self.root = os.path.abspath(root)
+        self.max_bytes = int(max_bytes)
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._size = None  # running estimate, recomputed by a scan when needed
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts):
+        """Stable hash of any JSON-serializable parts."""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.root, key[:2], key + self.suffix)
+
+    def get(self, key):
+        """Return the path of a cached entry (and mark it recently used), or None."""
+        path = self.path_for(key)
+        try:
+            os.utime(path, None)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def fetch(self, key, dest, link=False):
+        """
+        Copy a cached entry to `dest` (hard link first when `link` is set, so the
+        caller keeps its data even if the entry is evicted). Returns True on a hit.
+        """
+        path = self.get(key)
+        if path is None:
+            return False
+        try:
+            if link:
+                try:
+                    if os.path.exists(dest):
+                        os.remove(dest)
+                    os.link(path, dest)
+                    return True
+                except OSError:
+                    pass
+            shutil.copyfile(path, dest)
+        except OSError:
+            # Evicted by another worker between get() and the copy
+            with self._lock:
+                self.hits -= 1
+                self.misses += 1
+            return False
+        return True
+
+    def put(self, key, src_path):
+        """Store a copy of `src_path` under `key` atomically and return the cached path."""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp_", suffix=self.suffix)
+        try:
+            with os.fdopen(fd, "wb") as dst, open(src_path, "rb") as src:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try: os.remove(tmp_path)
+            except OSError: pass
+            raise
+        size = os.path.getsize(path)
+        with self._lock:
+            self.stores += 1
+            if self._size is not None:
+                self._size += size
+            over = self._size is None or self._size > self.max_bytes
+        if over:
+            self.evict()
+        return path
+
+    def _entries(self):
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.startswith(".tmp_"):
+                    continue
+                full = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, full))
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in `max_bytes`."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, full in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(full)
+                removed += 1
+            except OSError:
+                pass
+            total -= size
+        with self._lock:
+            self._size = total
+            self.evictions += removed
+        if removed:
+            logger.info("Cache %s: evicted %d entries", self.root, removed)
+        return removed
+
+    def clear(self):
+        for _, _, full in self._entries():
+            try: os.remove(full)
+            except OSError: pass
+        with self._lock:
+            self._size = 0
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,257 @@
+"""
+Rendu natif ffmpeg des segments "image fixe + fondus + panneaux d'explication".
+
+Chaque segment est encodé directement en MP4 par un seul appel ffmpeg (image bouclée,
+réglage x264 `-tune stillimage`, panneaux superposés sur leurs fenêtres temporelles),
+puis les segments sont joints par le concat demuxer sans ré-encodage. Aucun frame ne
+passe par Python.
+"""
+import os
+import time
+import struct
+import shutil
+import subprocess
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from metrics import span, bind_context
+from workspace import temp_file, temp_dir
+from profiles import get_profile, available_cpus, report_encode_speed
+from scheduler import reserve
+
+from video_generator import (
+    explanation_panel_box,
+    explanation_windows,
+    faststart_params,
+    render_explanation_panel,
+    should_show_explanation,
+)
+
+logger = logging.getLogger(__name__)
+
+FADE_DUR = 0.3          # fondu de la slide (identique au rendu moviepy)
+OVERLAY_FADE_DUR = 0.15  # fondu de chaque panneau d'explication
+AUDIO_RATE = 44100
+
+
+def ffmpeg_binary():
+    """Binaire ffmpeg : FFMPEG_BINARY, sinon celui qu'utilise moviepy, sinon le PATH."""
+    env = os.environ.get("FFMPEG_BINARY")
+    if env and env != "ffmpeg-imageio":
+        return env
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return shutil.which("ffmpeg") or "ffmpeg"
+
+
+def ffmpeg_available():
+    return shutil.which(ffmpeg_binary()) is not None or os.path.isfile(ffmpeg_binary())
+
+
+def _run(cmd):
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        tail = proc.stderr.decode("utf-8", "replace")[-2000:]
+        raise RuntimeError(f"ffmpeg failed ({proc.returncode}): {tail}")
+
+
+def _frames(duration, fps):
+    return max(1, int(round(duration * fps)))
+
+
+def encode_segment(img_path, s_audio, s_dur, e_audio, e_dur, out_path, overlays=(),
+                   fps=None, preset=None, threads=2, zoom_strength=0.03, profile=None):
+    """
+    Encode un segment en MP4 (H.264 + AAC).
+    `overlays` : liste de (png, début, durée) en secondes relatives au segment.
+    fps / preset / qualité viennent du profil d'encodage (actif par défaut), sauf si précisés.
+    La durée est arrondie à un nombre entier d'images pour que la concaténation ne dérive pas.
+    """
+    profile = get_profile(profile)
+    fps = fps or profile.fps
+    preset = preset or profile.preset
+    total = _frames(s_dur + e_dur, fps) / fps
+    cmd = [ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error",
+           "-loop", "1", "-framerate", str(fps), "-t", f"{total:.6f}", "-i", img_path,
+           "-i", s_audio]
+    n_inputs = 2
+    if e_audio:
+        cmd += ["-i", e_audio]
+        e_idx = n_inputs
+        n_inputs += 1
+
+    x0, y0, x1, y1 = explanation_panel_box(profile.size)
+    pw, ph = x1 - x0, y1 - y0
+    filters = [
+        f"[0:v]format=rgb24,fade=t=in:st=0:d={FADE_DUR},"
+        f"fade=t=out:st={max(total - FADE_DUR, 0):.6f}:d={FADE_DUR}[v0]"
+    ]
+    last = "v0"
+    for k, (png, start, dur) in enumerate(overlays):
+        cmd += ["-loop", "1", "-framerate", str(fps), "-t", f"{dur:.6f}", "-i", png]
+        idx = n_inputs
+        n_inputs += 1
+        # Le panneau est recadré sur son rectangle (centré dans l'image) avant le zoom,
+        # puis recentré : même géométrie que le resize plein cadre de moviepy.
+        chain = (f"[{idx}:v]format=rgba,crop={pw}:{ph}:{x0}:{y0},"
+                 f"fade=t=in:st=0:d={OVERLAY_FADE_DUR},"
+                 f"fade=t=out:st={max(dur - OVERLAY_FADE_DUR, 0):.6f}:d={OVERLAY_FADE_DUR}")
+        if zoom_strength:
+            z = f"(1+{zoom_strength}*t/{max(dur, 1e-6):.6f})"
+            chain += f",scale=w='trunc({pw}*{z})':h='trunc({ph}*{z})':eval=frame"
+        chain += f",setpts=PTS+{start:.6f}/TB[o{k}]"
+        filters.append(chain)
+        filters.append(f"[{last}][o{k}]overlay=x='(W-w)/2':y='(H-h)/2':eof_action=pass:"
+                       f"enable='between(t,{start:.6f},{start + dur:.6f})'[v{k + 1}]")
+        last = f"v{k + 1}"
+    filters.append(f"[{last}]format=yuv420p[vout]")
+
+    afmt = f"aformat=sample_rates={AUDIO_RATE}:channel_layouts=stereo"
+    if e_audio:
+        filters.append(f"[1:a]{afmt},apad,atrim=0:{s_dur:.6f}[sa]")
+        filters.append(f"[{e_idx}:a]{afmt}[ea]")
+        filters.append("[sa][ea]concat=n=2:v=0:a=1,apad[aout]")
+    else:
+        filters.append(f"[1:a]{afmt},apad[aout]")
+
+    # Les threads x264 sont ceux accordés par le budget CPU du nœud (scheduler.py)
+    with reserve("encode", threads) as threads:
+        cmd += ["-filter_complex", ";".join(filters), "-map", "[vout]", "-map", "[aout]",
+                "-c:v", "libx264", "-preset", preset, "-tune", "stillimage",
+                *profile.ffmpeg_params(), "-r", str(fps), "-threads", str(threads),
+                "-c:a", "aac", "-b:a", profile.audio_bitrate, "-ar", str(AUDIO_RATE), "-ac", "2",
+                "-t", f"{total:.6f}", out_path]
+        _run(cmd)
+    return out_path
+
+
+def concat_segments(paths, output_path, extra_args=()):
+    """
+    Joint des MP4 de mêmes paramètres avec le concat demuxer (copie des flux, sans ré-encodage).
+    La sortie est une vidéo finale : atome moov en tête (faststart_params).
+    """
+    list_path = temp_file(suffix=".txt", prefix="concat_")
+    try:
+        with open(list_path, "w", encoding="utf-8") as f:
+            for p in paths:
+                escaped = os.path.abspath(p).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        with span("concat"):
+            _run([ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error",
+                  "-f", "concat", "-safe", "0", "-i", list_path,
+                  "-c", "copy", *faststart_params(), *extra_args, output_path])
+    finally:
+        os.remove(list_path)
+    return output_path
+
+
+def remux_to_ts(src_path, out_path, offset=0.0):
+    """
+    Recopie un fragment MP4 en MPEG-TS (chunk HLS) sans ré-encodage, décalé de `offset`
+    secondes pour que les horodatages restent continus d'un chunk à l'autre.
+    """
+    _run([ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error", "-i", src_path,
+          "-c", "copy", "-bsf:v", "h264_mp4toannexb", "-muxdelay", "0", "-muxpreload", "0",
+          "-output_ts_offset", f"{offset:.6f}", "-f", "mpegts", out_path])
+    return out_path
+
+
+def mp4_duration(path):
+    """Durée d'un MP4 lue dans la boîte moov/mvhd (sans lancer ffprobe)."""
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        end = f.tell()
+        f.seek(0)
+        parents = {b"moov"}
+        limit = end
+        while f.tell() + 8 <= limit:
+            start = f.tell()
+            size, kind = struct.unpack(">I4s", f.read(8))
+            if size == 1:
+                size = struct.unpack(">Q", f.read(8))[0]
+            elif size == 0:
+                size = limit - start
+            if kind in parents:
+                limit = start + size
+                continue  # descendre dans la boîte
+            if kind == b"mvhd":
+                version = f.read(1)[0]
+                f.read(3)
+                if version == 1:
+                    _, _, timescale, duration = struct.unpack(">QQIQ", f.read(28))
+                else:
+                    _, _, timescale, duration = struct.unpack(">IIII", f.read(16))
+                return duration / float(timescale)
+            f.seek(start + size)
+    raise ValueError(f"No mvhd box in {path}")
+
+
+def segment_overlays(exp_text, exp_show, s_dur, e_dur, show_explanations_text, overlay_opacity, work_dir, prefix):
+    """Rend les panneaux d'un segment et renvoie leurs fenêtres (png, début, durée)."""
+    if not should_show_explanation(exp_text, exp_show, show_explanations_text) or e_dur <= 0:
+        return []
+    overlays = []
+    for i, (sub, start, dur) in enumerate(explanation_windows(exp_text, e_dur)):
+        png = os.path.join(work_dir, f"{prefix}_exp_{i:02d}.png")
+        render_explanation_panel(sub, png, overlay_opacity)
+        overlays.append((png, s_dur + start, dur))
+    return overlays
+
+
+def encode_segments(items, work_dir, show_explanations_text=False, style=None,
+                    fps=None, preset=None, workers=None, threads_per_segment=2):
+    """
+    Encode en parallèle une liste de (nom, tuple de segment) dans `work_dir`.
+    Renvoie les chemins des MP4 dans l'ordre de `items`.
+    """
+    style = style or {}
+    overlay_opacity = float(style.get("overlay_opacity", 0.35))
+    zoom_strength = float(style.get("zoom_strength", 0.03))
+    if not items:
+        return []
+    if workers is None:
+        workers = max(1, min(len(items), available_cpus() // threads_per_segment))
+
+    def _encode(item):
+        name, (img_path, s_audio, s_dur, e_audio, e_dur, exp_text, exp_show) = item
+        if not isinstance(img_path, str):
+            # Slide rendue en mémoire : ffmpeg a besoin d'un fichier
+            png = os.path.join(work_dir, f"{name}.png")
+            Image.fromarray(img_path).save(png)
+            img_path = png
+        overlays = segment_overlays(exp_text, exp_show, s_dur, e_dur, show_explanations_text,
+                                    overlay_opacity, work_dir, name)
+        out = os.path.join(work_dir, f"{name}.mp4")
+        with span("ffmpeg_segment"):
+            return encode_segment(img_path, s_audio, s_dur, e_audio, e_dur, out, overlays,
+                                  fps=fps, preset=preset, threads=threads_per_segment,
+                                  zoom_strength=zoom_strength)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ffmpeg-seg") as pool:
+        return list(pool.map(bind_context(_encode), items))
+
+
+def render_segments_ffmpeg(segments, output_path, show_explanations_text=False, style=None,
+                           fps=None, preset=None, workers=None, threads_per_segment=2):
+    """
+    Équivalent ffmpeg de assemble_synced_video : un fichier encodé par segment
+    (en parallèle), puis concaténation sans ré-encodage.
+    """
+    if not segments:
+        raise ValueError("Aucune diapositive trouvée.")
+    work_dir = temp_dir(prefix="ffmpeg_segments_")
+    try:
+        items = [(f"seg_{idx:04d}", seg) for idx, seg in enumerate(segments)]
+        t0 = time.perf_counter()
+        parts = encode_segments(items, work_dir, show_explanations_text, style,
+                                fps=fps, preset=preset, workers=workers,
+                                threads_per_segment=threads_per_segment)
+        concat_segments(parts, output_path)
+        report_encode_speed(None, "ffmpeg", sum(seg[2] + seg[4] for seg in segments), time.perf_counter() - t0)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return output_path
@@ -0,0 +1,184 @@
+"""
+Diffusion progressive : chaque phrase est publiée en chunk HLS (MPEG-TS) dès qu'elle est
+encodée, et la playlist `index.m3u8` est réécrite à chaque chunk. Un lecteur peut donc
+démarrer après la première phrase pendant que le reste du rendu continue.
+
+Les phrases sont produites (TTS + slide) et encodées par le moteur ffmpeg, en avance sur
+la publication (pool de `workers`), mais publiées strictement dans l'ordre du script.
+Les fragments MP4 passent par le cache de segments quand il est actif : un script déjà
+rendu est republié presque instantanément. La vidéo MP4 complète est recousue à la fin.
+"""
+import os
+import math
+import time
+import shutil
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import ffmpeg_renderer
+from profiles import use_profile
+from segment_cache import get_segment_cache, segment_key
+from workspace import temp_dir, OUTPUT_RETENTION_SECONDS
+from video_generator import (
+    explanation_for,
+    should_show_explanation,
+    split_to_units,
+    _plan_segments,
+    _discard_audio,
+    produce_segments,
+)
+
+logger = logging.getLogger(__name__)
+
+STREAM_DIR = os.environ.get("STREAM_DIR", os.path.join(os.getcwd(), "streams"))
+HLS_TARGET_DURATION = int(os.environ.get("HLS_TARGET_DURATION", "10"))
+PLAYLIST_NAME = "index.m3u8"
+# Horodatage du premier chunk : laisse la place aux DTS négatifs (B-frames, amorce AAC)
+# pour que le multiplexeur ne décale pas le premier chunk différemment des suivants
+TS_START = 1.0
+
+TIME_TO_FIRST_SEGMENT = metrics.histogram(
+    "generate_video_time_to_first_segment_seconds",
+    "Delay between the start of a streamed render and the publication of its first chunk.")
+
+
+class HlsPlaylist:
+    """Playlist HLS de type EVENT, réécrite atomiquement à chaque chunk publié."""
+
+    def __init__(self, path, target_duration=HLS_TARGET_DURATION):
+        self.path = path
+        self.target_duration = int(target_duration)
+        self.entries = []
+        self.ended = False
+        self._lock = threading.Lock()
+        self._write()
+
+    def append(self, uri, duration):
+        with self._lock:
+            if duration > self.target_duration:
+                # La spec veut une durée cible fixe ; les lecteurs relisent la playlist à chaque mise à jour
+                logger.warning("HLS chunk %s lasts %.1fs (> target %ds)", uri, duration, self.target_duration)
+                self.target_duration = int(math.ceil(duration))
+            self.entries.append((uri, duration))
+            self._write()
+
+    def end(self):
+        with self._lock:
+            self.ended = True
+            self._write()
+
+    def _write(self):
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{self.target_duration}",
+                 "#EXT-X-MEDIA-SEQUENCE:0", "#EXT-X-PLAYLIST-TYPE:EVENT"]
+        for uri, duration in self.entries:
+            lines.append(f"#EXTINF:{duration:.3f},")
+            lines.append(uri)
+        if self.ended:
+            lines.append("#EXT-X-ENDLIST")
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, self.path)
+
+
+def sweep_streams(max_age=None):
+    """Supprime les flux (playlist + chunks) plus anciens que la rétention des vidéos."""
+    max_age = OUTPUT_RETENTION_SECONDS if max_age is None else max_age
+    if not max_age or not os.path.isdir(STREAM_DIR):
+        return 0
+    removed = 0
+    now = time.time()
+    for name in os.listdir(STREAM_DIR):
+        path = os.path.join(STREAM_DIR, name)
+        try:
+            if os.path.isdir(path) and now - os.stat(path).st_mtime > max_age:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def render_hls(script_text, stream_dir, title=None, explanations=None, explanations_display=None,
+               show_explanations_text=False, style=None, profile=None, workers=2,
+               progress=None, output_path=None, granularity=None):
+    """
+    Rendu en flux dans `stream_dir` (playlist + chunks). Renvoie le chemin de la playlist ;
+    avec `output_path`, la vidéo MP4 complète y est aussi écrite à la fin.
+    `progress("stream", publiés, total)` est appelé à chaque chunk.
+    """
+    with use_profile(profile):
+        return _render_hls(script_text, stream_dir, title, explanations, explanations_display,
+                           show_explanations_text, style, workers, progress, output_path, granularity)
+
+
+def _render_hls(script_text, stream_dir, title, explanations, explanations_display,
+                show_explanations_text, style, workers, progress, output_path, granularity=None):
+    t0 = time.perf_counter()
+    sentences = split_to_units(script_text, granularity)
+    if not sentences:
+        raise ValueError("Aucune diapositive trouvée.")
+    style = style or {}
+    explanations = explanations or []
+    explanations_display = explanations_display or []
+    os.makedirs(stream_dir, exist_ok=True)
+    playlist = HlsPlaylist(os.path.join(stream_dir, PLAYLIST_NAME))
+    cache = get_segment_cache()
+    work_dir = temp_dir(prefix="hls_")
+
+    def _fragment(idx):
+        """MP4 de la phrase `idx` : repris du cache ou produit puis encodé."""
+        exp_text, exp_show = explanation_for(idx, explanations, explanations_display)
+        show = should_show_explanation(exp_text, exp_show, show_explanations_text)
+        key = segment_key(sentences[idx], title if idx == 0 else None, exp_text, show, style)
+        part = os.path.join(work_dir, f"part_{idx:05d}.mp4")
+        if cache is not None and cache.fetch(key, part, link=True):
+            return part
+        plan = _plan_segments(sentences, work_dir, explanations, explanations_display, only={idx})
+        try:
+            segments = produce_segments(plan, title=title, workers=1)
+            encoded = ffmpeg_renderer.encode_segments([(f"new_{idx:05d}", segments[0])], work_dir,
+                                                      show_explanations_text, style, workers=1)[0]
+        finally:
+            _discard_audio(plan)
+        if cache is not None:
+            cache.put(key, encoded)
+        os.replace(encoded, part)
+        return part
+
+    pool = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="hls")
+    futures = []
+    try:
+        futures = [pool.submit(metrics.bind_context(_fragment), idx) for idx in range(len(sentences))]
+        parts, offset = [], TS_START
+        if progress: progress("stream", 0, len(sentences))
+        for idx, future in enumerate(futures):
+            part = future.result()
+            parts.append(part)
+            duration = ffmpeg_renderer.mp4_duration(part)
+            chunk = f"chunk_{idx:05d}.ts"
+            ffmpeg_renderer.remux_to_ts(part, os.path.join(stream_dir, chunk), offset)
+            playlist.append(chunk, duration)
+            offset += duration
+            if idx == 0:
+                TIME_TO_FIRST_SEGMENT.observe(time.perf_counter() - t0)
+                metrics.record("first_segment", time.perf_counter() - t0)
+            if progress: progress("stream", idx + 1, len(sentences))
+        playlist.end()
+
+        if output_path:
+            if progress: progress("encode", 0, 1)
+            ffmpeg_renderer.concat_segments(parts, output_path)
+            if progress: progress("encode", 1, 1)
+    except BaseException:
+        for f in futures:
+            f.cancel()
+        # Playlist fermée : le lecteur s'arrête proprement sur ce qui a été publié
+        playlist.end()
+        raise
+    finally:
+        pool.shutdown(wait=True)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return playlist.path
@@ -0,0 +1,212 @@
+"""
+Ingestion en flux : le script (et ses explications) arrive par morceaux, par exemple
+depuis un LLM qui génère phrase par phrase, et le rendu commence sans attendre la fin.
+
+- chaque phrase terminée (SentenceSplitter) part immédiatement en TTS et en rendu de slide ;
+- une explication part en TTS dès qu'elle arrive ;
+- avec le moteur ffmpeg, le segment d'une phrase est encodé dès que la phrase suivante
+  commence (son explication est alors connue) ; il est ré-encodé à la fin si une
+  explication tardive le vise ;
+- à la fermeture du flux, il ne reste que le dernier segment et la concaténation
+  (ffmpeg), ou l'assemblage complet (moviepy).
+
+Le temps de bout en bout est donc celui du LLM plus une « queue » courte, au lieu de la
+somme des deux.
+"""
+import os
+import time
+import uuid
+import shutil
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from metrics import span
+from workspace import temp_dir, output_dir as default_output_dir
+from video_generator import (
+    VIDEO_RENDERER,
+    SentenceSplitter,
+    render_slide,
+    render_video,
+    should_show_explanation,
+    _new_wav_path,
+    _synthesize_timed,
+    _discard_audio,
+)
+
+logger = logging.getLogger(__name__)
+
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "4"))
+
+
+class StreamingRender:
+    """
+    Rendu d'un script reçu en flux. À utiliser dans un job_workspace (et use_profile) ouvert
+    pour toute la durée du flux :
+
+        session = StreamingRender(title="Cours")
+        for chunk in llm_stream: session.feed(chunk)
+        session.add_explanation("...")      # explication de la dernière phrase (ou index=)
+        path = session.finish()
+    """
+
+    def __init__(self, title=None, show_explanations_text=None, style=None, renderer=None,
+                 workers=None, output_dir=None, progress=None):
+        self.title = title
+        self.show_explanations_text = show_explanations_text
+        self.style = style or {}
+        self.renderer = (renderer or VIDEO_RENDERER).lower()
+        if self.renderer not in ("moviepy", "ffmpeg"):
+            raise ValueError(f"Moteur de rendu inconnu : {self.renderer}")
+        if self.renderer == "ffmpeg":
+            from ffmpeg_renderer import ffmpeg_available
+            if not ffmpeg_available():
+                logger.warning("ffmpeg introuvable, rendu en flux avec moviepy")
+                self.renderer = "moviepy"
+        self.output_dir = output_dir or default_output_dir()
+        self.progress = progress
+        self.splitter = SentenceSplitter()
+        self.plan = []  # une entrée par phrase, dans l'ordre du script
+        self.closed_at = None
+        self._work_dir = temp_dir(prefix="ingest_")
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(workers or INGEST_WORKERS)),
+                                        thread_name_prefix="ingest")
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self._first_sentence_at = None
+
+    # --- Entrées -------------------------------------------------------------
+    def feed(self, text):
+        """Ajoute un morceau de script ; renvoie les phrases terminées qu'il a complétées."""
+        sentences = self.splitter.feed(text)
+        for s in sentences:
+            self._add_sentence(s)
+        return sentences
+
+    def add_explanation(self, text, index=None, display=None):
+        """Explication de la phrase `index` (par défaut la dernière phrase terminée)."""
+        with self._lock:
+            if index is None:
+                index = len(self.plan) - 1
+            if not 0 <= index < len(self.plan):
+                raise ValueError(f"No sentence {index} to explain ({len(self.plan)} received so far)")
+            p = self.plan[index]
+            text = (text or "").strip() or None
+            if p["e_audio"]:
+                p["stale_audio"].append(p["e_audio"])
+            p["exp_text"] = text
+            p["exp_show"] = None if display is None else bool(display)
+            p["e_audio"] = _new_wav_path() if text else None
+            p["f_e"] = self._submit(_synthesize_timed, text, p["e_audio"]) if text else None
+            p["version"] += 1
+
+    def _submit(self, fn, *args):
+        return self._pool.submit(metrics.bind_context(fn), *args)
+
+    def _add_sentence(self, text):
+        with self._lock:
+            idx = len(self.plan)
+            if idx == 0:
+                self._first_sentence_at = time.perf_counter()
+            p = {
+                "idx": idx, "text": text, "s_audio": _new_wav_path(),
+                "exp_text": None, "exp_show": None, "e_audio": None, "stale_audio": [],
+                "f_e": None, "encoded": None, "version": 0,
+            }
+            p["f_img"] = self._submit(render_slide, text, None, self.title if idx == 0 else None)
+            p["f_s"] = self._submit(_synthesize_timed, text, p["s_audio"])
+            self.plan.append(p)
+            # La phrase précédente est close : son segment peut être encodé
+            if idx > 0 and self.renderer == "ffmpeg":
+                self._seal(self.plan[idx - 1])
+        if self.progress: self.progress("sentences", idx + 1, None)
+
+    # --- Segments ------------------------------------------------------------
+    def _snapshot(self, p):
+        """État de l'entrée à encoder (lu sous self._lock, les futures restent à attendre)."""
+        # Réglage global absent : même règle que /generate, une explication fournie est affichée
+        show_global = True if self.show_explanations_text is None else self.show_explanations_text
+        show = should_show_explanation(p["exp_text"], p["exp_show"], show_global)
+        return p["version"], p["e_audio"], p["f_e"], p["exp_text"], show
+
+    def _segment(self, p, snapshot):
+        _, e_audio, f_e, exp_text, show = snapshot
+        # Le flag d'affichage est résolu ici : il devient le flag par segment
+        return (p["f_img"].result(), p["s_audio"], p["f_s"].result(), e_audio,
+                f_e.result() if f_e else 0.0, exp_text, show)
+
+    def _encode(self, p, snapshot):
+        import ffmpeg_renderer
+        name = f"seg_{p['idx']:05d}_{snapshot[0]}"
+        return ffmpeg_renderer.encode_segments([(name, self._segment(p, snapshot))], self._work_dir,
+                                               False, self.style, workers=1)[0]
+
+    def _seal(self, p):
+        # Appelé sous self._lock, après la soumission des futures de la phrase (file FIFO) :
+        # la tâche d'encodage ne peut pas bloquer le pool en attendant celles-ci
+        snapshot = self._snapshot(p)
+        p["encoded"] = (snapshot[0], self._submit(self._encode, p, snapshot))
+
+    # --- Fin du flux ---------------------------------------------------------
+    def finish(self):
+        """Fin du flux : termine les segments, assemble la vidéo et renvoie son chemin."""
+        for s in self.splitter.close():
+            self._add_sentence(s)
+        self.closed_at = time.perf_counter()
+        if not self.plan:
+            self.abort()
+            raise ValueError("Aucune diapositive trouvée.")
+        output_path = os.path.join(self.output_dir, f"video_{uuid.uuid4().hex}.mp4")
+        try:
+            with span("ingest_tail"):
+                if self.renderer == "ffmpeg":
+                    self._finish_ffmpeg(output_path)
+                else:
+                    with self._lock:
+                        snapshots = [self._snapshot(p) for p in self.plan]
+                    segments = [self._segment(p, snap) for p, snap in zip(self.plan, snapshots)]
+                    render_video(segments, output_path, style=self.style, renderer="moviepy")
+        except BaseException:
+            try: os.remove(output_path)
+            except OSError: pass
+            raise
+        finally:
+            self._close()
+        if self.progress: self.progress("encode", 1, 1)
+        return os.path.abspath(output_path)
+
+    def _finish_ffmpeg(self, output_path):
+        import ffmpeg_renderer
+        futures = []
+        with self._lock:
+            for p in self.plan:
+                # Dernière phrase, ou explication arrivée après l'encodage : (ré)encodage maintenant
+                if p["encoded"] is None or p["encoded"][0] != p["version"]:
+                    futures.append(self._submit(self._encode, p, self._snapshot(p)))
+                else:
+                    futures.append(p["encoded"][1])
+        if self.progress: self.progress("encode", 0, 1)
+        parts = [f.result() for f in futures]
+        ffmpeg_renderer.concat_segments(parts, output_path)
+
+    def timings(self):
+        """Durée du flux (première phrase → fermeture) et de la queue (fermeture → vidéo)."""
+        out = {}
+        if self._first_sentence_at is not None and self.closed_at is not None:
+            out["streamSeconds"] = round(self.closed_at - self._t0, 3)
+            out["firstSentenceSeconds"] = round(self._first_sentence_at - self._t0, 3)
+        if self.closed_at is not None:
+            out["tailSeconds"] = round(time.perf_counter() - self.closed_at, 3)
+        return out
+
+    def abort(self):
+        """Abandon (flux interrompu) : annule le travail en attente et supprime les intermédiaires."""
+        self._close()
+
+    def _close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        for p in self.plan:
+            _discard_audio([{"s_audio": a, "e_audio": None} for a in p["stale_audio"]])
+        _discard_audio(self.plan)
+        shutil.rmtree(self._work_dir, ignore_errors=True)
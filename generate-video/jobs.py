@@ -0,0 +1,167 @@
+import time
+import uuid
+import queue
+import itertools
+import threading
+import traceback
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when the pending queue is at capacity; `retry_after` is a hint in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__("Job queue is full")
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    """
+    Bounded queue of render jobs drained by a fixed pool of worker threads.
+    Each job records its state (queued → running → done/failed) and per-stage progress,
+    reported by the job function through the `progress(stage, done, total)` callback.
+
+    Jobs submitted with an estimated `cost` (seconds, see planner.py) run shortest first:
+    the queue is ordered by submission time + `sjf_weight` * cost, so a short job overtakes
+    the long ones already waiting, while a long job is only overtaken by jobs submitted less
+    than its own cost after it (no starvation). sjf_weight=0 keeps FIFO order.
+    """
+
+    def __init__(self, workers=2, max_pending=8, retention=3600, sjf_weight=1.0):
+        self.workers = max(1, int(workers))
+        self.retention = retention
+        self.sjf_weight = float(sjf_weight)
+        self._queue = queue.PriorityQueue(maxsize=max(1, int(max_pending)))
+        self._seq = itertools.count()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._durations = []  # durées des derniers jobs, pour estimer Retry-After
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, fn, cost=None, **kwargs):
+        """Queue `fn(progress=..., **kwargs)` and return the job id immediately."""
+        self._prune()
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "stages": {},
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "estimated_seconds": cost,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+        try:
+            self._queue.put_nowait((self._priority(now, cost), next(self._seq), job_id, fn, kwargs))
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job_id]
+            raise JobQueueFull(self.retry_after())
+        self._ensure_workers()
+        return job_id
+
+    def _priority(self, submitted_at, cost):
+        return submitted_at + self.sjf_weight * (cost or 0.0)
+
+    def wait_estimate(self, cost=None):
+        """Estimated seconds of queued work that would run before a job of this cost, per worker."""
+        key = self._priority(time.time(), cost)
+        with self._queue.mutex:
+            ahead = [item[2] for item in self._queue.queue if item[0] <= key]
+        with self._lock:
+            seconds = sum(self._jobs[j]["estimated_seconds"] or 0.0 for j in ahead if j in self._jobs)
+        return {"jobsAhead": len(ahead), "seconds": round(seconds / self.workers, 2)}
+
+    def get(self, job_id):
+        """Snapshot of a job, or None if unknown (or expired)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = dict(job)
+            snapshot["stages"] = {k: dict(v) for k, v in job["stages"].items()}
+        if snapshot["status"] == "queued":
+            snapshot["queue_position"] = self._position(job_id)
+        return snapshot
+
+    def retry_after(self):
+        """Seconds until a queue slot is likely to free up."""
+        with self._lock:
+            recent = self._durations[-20:]
+        avg = (sum(recent) / len(recent)) if recent else 30.0
+        return max(1, int(avg * max(1, self._queue.qsize()) / self.workers))
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"workers": self.workers, "pending": self._queue.qsize(),
+                "max_pending": self._queue.maxsize, "jobs": counts}
+
+    def _position(self, job_id):
+        with self._queue.mutex:
+            for pos, item in enumerate(sorted(self._queue.queue, key=lambda item: item[:2])):
+                if item[2] == job_id:
+                    return pos
+        return 0
+
+    def _progress_cb(self, job_id):
+        def progress(stage, done=None, total=None):
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return
+                job["stage"] = stage
+                entry = job["stages"].setdefault(stage, {"started_at": time.time()})
+                entry["done"] = done
+                entry["total"] = total
+                if total is not None and done is not None and done >= total:
+                    entry["finished_at"] = time.time()
+        return progress
+
+    def _worker(self):
+        while True:
+            _, _, job_id, fn, kwargs = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job["status"] = "running"
+                    job["started_at"] = time.time()
+            try:
+                result = fn(progress=self._progress_cb(job_id), **kwargs)
+                status, error = "done", None
+            except Exception as e:
+                logger.error("Job %s failed:\n%s", job_id, traceback.format_exc())
+                result, status, error = None, "failed", str(e)
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job.update(status=status, result=result, error=error, finished_at=time.time())
+                    self._durations.append(job["finished_at"] - job["started_at"])
+                    del self._durations[:-100]
+            self._queue.task_done()
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [jid for jid, job in self._jobs.items()
+                       if job["finished_at"] is not None and job["finished_at"] < cutoff]
+            for jid in expired:
+                del self._jobs[jid]
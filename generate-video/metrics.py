@@ -0,0 +1,281 @@
+"""
+In-process instrumentation: histograms/counters rendered in the Prometheus text format,
+and `span()` context managers that time a pipeline stage.
+
+Every span feeds the `generate_video_stage_seconds{stage=...}` histogram and, when a
+request trace is active (`collect()`), the per-request timing breakdown. With
+METRICS_TRACE_MEMORY=1 each span also records the tracemalloc peak reached while it
+was open (process-wide, so concurrent renders blur each other: debug use only).
+"""
+import os
+import time
+import bisect
+import threading
+import contextvars
+import tracemalloc
+from contextlib import contextmanager
+
+TRACE_MEMORY = os.environ.get("METRICS_TRACE_MEMORY", "0") == "1"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+BYTES_BUCKETS = tuple(2 ** p * 1024 * 1024 for p in range(0, 13))  # 1 Mo .. 4 Go
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {sorted(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                    for k, v in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if idx < len(self.buckets):
+                series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                yield self.name + "_bucket", _format_labels(self.labelnames, key, [("le", repr(float(bound)))]), cumulative
+            yield self.name + "_bucket", _format_labels(self.labelnames, key, [("le", "+Inf")]), series[-1]
+            yield self.name + "_sum", _format_labels(self.labelnames, key), series[-2]
+            yield self.name + "_count", _format_labels(self.labelnames, key), series[-1]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif type(metric) is not cls:
+                raise ValueError(f"Metric {name} already registered as {metric.type}")
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for m in metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.type}")
+            for name, labels, value in m.samples():
+                lines.append(f"{name}{labels} {value:g}" if isinstance(value, float) else f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+render_prometheus = REGISTRY.render
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = histogram("generate_video_stage_seconds", "Wall time of each pipeline stage.", ("stage",))
+STAGE_PEAK_BYTES = histogram("generate_video_stage_peak_bytes",
+                             "tracemalloc peak while a stage was running (METRICS_TRACE_MEMORY=1).",
+                             ("stage",), BYTES_BUCKETS)
+
+
+# --------------------------------------------------------------
+# Traces par requête
+# --------------------------------------------------------------
+class Trace:
+    """Per-request collection of spans, summarized as {stage: {seconds, count[, peak_mb]}}."""
+
+    def __init__(self):
+        self.spans = []
+        self.info = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, peak_bytes=None):
+        with self._lock:
+            self.spans.append((stage, seconds, peak_bytes))
+
+    def summary(self):
+        out = {}
+        with self._lock:
+            spans = list(self.spans)
+        for stage, seconds, peak in spans:
+            entry = out.setdefault(stage, {"seconds": 0.0, "count": 0})
+            entry["seconds"] += seconds
+            entry["count"] += 1
+            if peak is not None:
+                entry["peak_mb"] = max(entry.get("peak_mb", 0.0), peak / (1024 * 1024))
+        for entry in out.values():
+            entry["seconds"] = round(entry["seconds"], 4)
+            if "peak_mb" in entry:
+                entry["peak_mb"] = round(entry["peak_mb"], 1)
+        return out
+
+
+_current_trace = contextvars.ContextVar("generate_video_trace", default=None)
+
+
+@contextmanager
+def collect(trace=None):
+    """Attach spans opened in this context (and in contexts copied from it) to `trace`."""
+    trace = trace if trace is not None else Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def annotate(key, value):
+    """Attach a non-timing fact (e.g. measured encode speed) to the active request trace."""
+    trace = _current_trace.get()
+    if trace is not None:
+        with trace._lock:
+            trace.info[key] = value
+
+
+def bind_context(fn):
+    """Wrap `fn` so that it runs in a copy of the caller's context (thread pools don't copy it)."""
+    ctx = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # Un contexte ne peut être actif que dans un thread à la fois : une copie par appel
+        return ctx.copy().run(fn, *args, **kwargs)
+    return run
+
+
+# --------------------------------------------------------------
+# Mémoire (optionnelle)
+# --------------------------------------------------------------
+_mem_local = threading.local()
+_mem_lock = threading.Lock()
+
+
+def _mem_enter():
+    with _mem_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+    stack = getattr(_mem_local, "stack", None)
+    if stack is None:
+        stack = _mem_local.stack = []
+    # reset_peak efface le pic des spans englobants : on le leur reporte avant
+    for frame in stack:
+        frame[0] = max(frame[0], peak)
+    stack.append([0])
+
+
+def _mem_exit():
+    peak = tracemalloc.get_traced_memory()[1]
+    stack = _mem_local.stack
+    own = max(stack.pop()[0], peak)
+    for frame in stack:
+        frame[0] = max(frame[0], own)
+    return own
+
+
+@contextmanager
+def span(stage, histogram=None, **labels):
+    """
+    Time a block as `stage`. The duration goes to the stage histogram (or to `histogram`
+    with `labels` when given) and to the active request trace.
+    """
+    if TRACE_MEMORY:
+        _mem_enter()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - t0
+        record(stage, seconds, histogram, _mem_exit() if TRACE_MEMORY else None, **labels)
+
+
+def record(stage, seconds, histogram=None, peak_bytes=None, **labels):
+    """Report an already measured duration, like a span would."""
+    if histogram is None:
+        STAGE_SECONDS.observe(seconds, stage=stage)
+    else:
+        histogram.observe(seconds, **labels)
+    if peak_bytes is not None:
+        STAGE_PEAK_BYTES.observe(peak_bytes, stage=stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds, peak_bytes)
@@ -0,0 +1,228 @@
+"""
+Render cost estimator: predicts, from a /generate payload alone (no TTS), the number of
+segments, the audio duration and the render time of a job.
+
+- audio seconds = a * texts + b * spoken characters (sentences and explanations, after
+  math_to_words), per TTS backend;
+- render seconds = w0 + w1 * segments + w2 * audio seconds + w3 * overlays, per
+  (renderer, profile), since both change the cost of a segment and of a second of video.
+
+Both models start from rough priors and are refitted from measured runs (`observe`): a
+ridge regression pulls the weights toward the prior when there are few observations
+(PLANNER_PRIOR_WEIGHT = how many runs the prior is worth). Observations are appended to
+PLANNER_HISTORY (JSON lines, last PLANNER_HISTORY_SIZE kept; empty = memory only) so that
+calibration survives restarts. The job queue uses the estimate for shortest-job-first
+ordering and the app for admission control (see jobs.py and /plan).
+"""
+import os
+import json
+import struct
+import threading
+import logging
+from collections import deque
+
+import numpy as np
+
+from tts_engine import math_to_words, tts_identity
+from profiles import get_profile
+
+logger = logging.getLogger(__name__)
+
+PLANNER_HISTORY = os.environ.get("PLANNER_HISTORY", os.path.join(os.path.expanduser("~"), ".cache", "generate-video", "planner.jsonl"))
+PLANNER_HISTORY_SIZE = int(os.environ.get("PLANNER_HISTORY_SIZE", "500"))
+PLANNER_PRIOR_WEIGHT = float(os.environ.get("PLANNER_PRIOR_WEIGHT", "3"))
+
+# Priors: ~15 spoken characters per second; render cost per segment and per second of video
+AUDIO_PRIOR = (0.4, 0.065)  # (seconds per text, seconds per character)
+RENDER_PRIORS = {
+    "moviepy": (1.0, 0.3, 0.6, 0.2),
+    "ffmpeg": (1.0, 0.5, 0.15, 0.1),
+}
+
+
+def features(script_text="", explanations=None, explanations_display=None, show_explanations_text=False,
+             granularity=None, **_):
+    """Sizes of a render request (generate_video keyword arguments), without running anything."""
+    from video_generator import split_to_units, explanation_for, should_show_explanation
+    sentences = split_to_units(script_text or "", granularity)
+    explanations = explanations or []
+    explanations_display = explanations_display or []
+    texts = chars = overlays = n_explanations = 0
+    for idx, s in enumerate(sentences):
+        texts += 1
+        chars += len(math_to_words(s))
+        exp_text, exp_show = explanation_for(idx, explanations, explanations_display)
+        if exp_text:
+            texts += 1
+            n_explanations += 1
+            chars += len(math_to_words(exp_text))
+            overlays += should_show_explanation(exp_text, exp_show, show_explanations_text)
+    return {"segments": len(sentences), "explanations": n_explanations, "overlays": int(overlays),
+            "texts": texts, "chars": chars}
+
+
+def mp4_duration(path):
+    """Duration in seconds of an MP4 file (None if unreadable)."""
+    from ffmpeg_renderer import mp4_duration as read_duration
+    try:
+        return read_duration(path)
+    except (OSError, ValueError, struct.error, IndexError, ZeroDivisionError):
+        return None
+
+
+def _valid_run(run):
+    """True for a history line the models can use (the file may be old, truncated or hand-edited)."""
+    if not isinstance(run, dict):
+        return False
+    number = lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)
+    return (all(isinstance(run.get(k), str) for k in ("backend", "renderer", "profile"))
+            and all(number(run.get(k)) for k in ("texts", "chars", "segments", "overlays", "renderSeconds"))
+            and (run.get("audioSeconds") is None or number(run["audioSeconds"])))
+
+
+def _ridge(X, y, prior, weight):
+    """Least squares pulled toward `prior` (`weight` = number of runs the prior is worth)."""
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    prior = np.asarray(prior, dtype=float)
+    # Each column is scaled by the mean of its values, so the weight of the prior does not
+    # depend on the units (segments, seconds, characters)
+    scale = np.abs(X).mean(axis=0) if len(X) else np.ones(len(prior))
+    scale[scale == 0] = 1.0
+    lam = weight * np.diag(scale ** 2)
+    # Solved as a correction to the prior with lstsq: with PLANNER_PRIOR_WEIGHT=0 or a feature that
+    # is always 0 (no overlay shown) the system is singular, and those weights then keep their prior
+    delta = np.linalg.lstsq(X.T @ X + lam, X.T @ (y - X @ prior), rcond=None)[0]
+    return np.maximum(prior + delta, 0.0)
+
+
+class Planner:
+    """Cost models calibrated from past runs (see the module docstring)."""
+
+    def __init__(self, history_path=PLANNER_HISTORY, history_size=PLANNER_HISTORY_SIZE,
+                 prior_weight=PLANNER_PRIOR_WEIGHT):
+        self.history_path = history_path
+        self.prior_weight = prior_weight
+        self._runs = deque(maxlen=max(1, int(history_size)))
+        self._history_lines = 0
+        self._models = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.history_path or not os.path.isfile(self.history_path):
+            return
+        try:
+            with open(self.history_path, encoding="utf-8") as f:
+                for line in f:
+                    self._history_lines += 1
+                    try:
+                        run = json.loads(line)
+                    except ValueError:
+                        continue
+                    if _valid_run(run):
+                        self._runs.append(run)
+        except OSError as e:
+            logger.warning("Planner history unreadable: %s", e)
+
+    def _append(self, run):
+        if not self.history_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.history_path) or ".", exist_ok=True)
+            if self._history_lines >= 2 * self._runs.maxlen:
+                # The file is rewritten with the window alone once it grows to twice its size
+                tmp = self.history_path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.writelines(json.dumps(r) + "\n" for r in self._runs)
+                os.replace(tmp, self.history_path)
+                self._history_lines = len(self._runs)
+            else:
+                with open(self.history_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(run) + "\n")
+                self._history_lines += 1
+        except OSError as e:
+            logger.warning("Planner history not written: %s", e)
+
+    def _model(self, kind, key):
+        """Fitted weights for ("audio", backend) or ("render", renderer/profile); memoized until the next run."""
+        cached = self._models.get((kind, key))
+        if cached is not None:
+            return cached
+        if kind == "audio":
+            runs = [r for r in self._runs if r["backend"] == key and r.get("audioSeconds")]
+            X = [(r["texts"], r["chars"]) for r in runs]
+            y = [r["audioSeconds"] for r in runs]
+            prior = AUDIO_PRIOR
+        else:
+            renderer, profile = key
+            runs = [r for r in self._runs if r["renderer"] == renderer and r["profile"] == profile]
+            X = [(1.0, r["segments"], r["audioSeconds"] or 0.0, r["overlays"]) for r in runs]
+            y = [r["renderSeconds"] for r in runs]
+            prior = RENDER_PRIORS.get(renderer, RENDER_PRIORS["moviepy"])
+        weights = _ridge(np.reshape(X, (-1, len(prior))), y, prior, self.prior_weight)
+        self._models[(kind, key)] = (weights, len(runs))
+        return weights, len(runs)
+
+    def estimate(self, renderer=None, profile=None, **kwargs):
+        """Predicted sizes and costs of a render request (generate_video keyword arguments)."""
+        from video_generator import VIDEO_RENDERER
+        renderer = (renderer or VIDEO_RENDERER).lower()
+        profile = get_profile(profile).name
+        backend = tts_identity()[0] or "none"
+        f = features(**kwargs)
+        with self._lock:
+            try:
+                audio_w, audio_n = self._model("audio", backend)
+                render_w, render_n = self._model("render", (renderer, profile))
+            except Exception as e:
+                # A calibration failure must not fail the request: estimate from the priors
+                logger.warning("Planner fit failed, using the priors: %s", e)
+                audio_w, audio_n = np.asarray(AUDIO_PRIOR), 0
+                render_w, render_n = np.asarray(RENDER_PRIORS.get(renderer, RENDER_PRIORS["moviepy"])), 0
+        audio_seconds = float(audio_w @ (f["texts"], f["chars"]))
+        render_seconds = float(render_w @ (1.0, f["segments"], audio_seconds, f["overlays"])) if f["segments"] else 0.0
+        return {
+            **f,
+            "audioSeconds": round(audio_seconds, 2),
+            "renderSeconds": round(render_seconds, 2),
+            "renderer": renderer,
+            "profile": profile,
+            "calibration": {"audioRuns": audio_n, "renderRuns": render_n},
+        }
+
+    def observe(self, kwargs, render_seconds, output_path=None, renderer=None, profile=None):
+        """Record a measured run: sizes of the request, wall time and duration of the output video."""
+        from video_generator import VIDEO_RENDERER
+        run = features(**kwargs)
+        if not run["segments"]:
+            return None
+        run.update(
+            renderer=(renderer or kwargs.get("renderer") or VIDEO_RENDERER).lower(),
+            profile=get_profile(profile or kwargs.get("profile")).name,
+            backend=tts_identity()[0] or "none",
+            audioSeconds=mp4_duration(output_path) if output_path else None,
+            renderSeconds=round(float(render_seconds), 3),
+        )
+        with self._lock:
+            self._runs.append(run)
+            self._models.clear()
+            self._append(run)
+        return run
+
+    def stats(self):
+        with self._lock:
+            return {"runs": len(self._runs), "historyPath": self.history_path or None}
+
+
+_planner = None
+_planner_lock = threading.Lock()
+
+
+def get_planner():
+    """Process-wide planner (history loaded on first use)."""
+    global _planner
+    with _planner_lock:
+        if _planner is None:
+            _planner = Planner()
+    return _planner
@@ -0,0 +1,140 @@
+"""
+Profils d'encodage nommés : résolution, fps, preset x264 et threads.
+
+- "draft"    : aperçu basse résolution, peu d'images par seconde, preset ultrafast ;
+- "standard" : l'ancien rendu (1280x720, 24 fps, preset medium, 4 threads) ;
+- "final"    : 1080p, preset plus lent, threads dimensionnés sur les cœurs réellement
+  disponibles (affinité CPU et quota cgroup du conteneur).
+
+Le profil actif est porté par le contexte (`use_profile`) et propagé aux pools comme le
+workspace ; la mise en page (polices, marges, panneaux) suit l'échelle de sa hauteur.
+"""
+import os
+import contextvars
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+
+import metrics
+
+BASE_HEIGHT = 720  # hauteur de référence de la mise en page
+
+
+def available_cpus() -> int:
+    """Cœurs utilisables par ce processus : affinité CPU, bornée par le quota cgroup s'il existe."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpus = os.cpu_count() or 1
+    quota = None
+    try:
+        # cgroup v2 : "max 100000" ou "200000 100000"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            q, period = f.read().split()[:2]
+            if q != "max":
+                quota = int(q) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                q = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if q > 0:
+                quota = q / period
+        except (OSError, ValueError):
+            pass
+    if quota:
+        cpus = min(cpus, max(1, int(quota)))
+    return max(1, cpus)
+
+
+class EncodingProfile(NamedTuple):
+    name: str
+    width: int
+    height: int
+    fps: int
+    preset: str
+    threads: int              # 0 = tous les cœurs disponibles
+    crf: Optional[int] = None  # None = défaut x264
+    audio_bitrate: str = "128k"
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @property
+    def scale(self) -> float:
+        return self.height / BASE_HEIGHT
+
+    def scaled(self, value: int) -> int:
+        return max(1, int(round(value * self.scale)))
+
+    def encoder_threads(self) -> int:
+        return self.threads or available_cpus()
+
+    def ffmpeg_params(self):
+        """Options x264 supplémentaires (moviepy `ffmpeg_params` / ligne de commande ffmpeg)."""
+        return ["-crf", str(self.crf)] if self.crf is not None else []
+
+
+PROFILES = {
+    "draft": EncodingProfile("draft", 640, 360, 12, "ultrafast", 0, crf=30, audio_bitrate="64k"),
+    "standard": EncodingProfile("standard", 1280, 720, 24, "medium", 4),
+    "final": EncodingProfile("final", 1920, 1080, 24, "slow", 0, crf=20, audio_bitrate="192k"),
+}
+DEFAULT_PROFILE = os.environ.get("VIDEO_PROFILE", "standard")
+
+
+def get_profile(profile=None) -> EncodingProfile:
+    """Profil par nom (ou instance) ; None = profil du contexte, sinon VIDEO_PROFILE."""
+    if isinstance(profile, EncodingProfile):
+        return profile
+    if profile is None:
+        current = _current.get()
+        if current is not None:
+            return current
+        profile = DEFAULT_PROFILE
+    try:
+        return PROFILES[str(profile).lower()]
+    except KeyError:
+        raise ValueError(f"Unknown encoding profile: {profile} (expected one of {', '.join(PROFILES)})")
+
+
+_current = contextvars.ContextVar("generate_video_profile", default=None)
+
+ENCODE_SPEED = metrics.histogram(
+    "generate_video_encode_speed_ratio",
+    "Seconds of video encoded per second of wall time, by profile and renderer.",
+    ("profile", "renderer"), buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128))
+
+
+def report_encode_speed(profile, renderer, media_seconds, elapsed):
+    """Mesure de vitesse d'un encodage : histogramme par profil + détail de la requête en cours."""
+    profile = get_profile(profile)
+    elapsed = max(elapsed, 1e-6)
+    speed = {
+        "profile": profile.name,
+        "renderer": renderer,
+        "resolution": f"{profile.width}x{profile.height}",
+        "fps": profile.fps,
+        "preset": profile.preset,
+        "threads": profile.encoder_threads(),
+        "mediaSeconds": round(media_seconds, 3),
+        "encodeSeconds": round(elapsed, 3),
+        "realtimeFactor": round(media_seconds / elapsed, 2),
+        "framesPerSecond": round(media_seconds * profile.fps / elapsed, 1),
+    }
+    ENCODE_SPEED.observe(media_seconds / elapsed, profile=profile.name, renderer=renderer)
+    metrics.annotate("encode", speed)
+    return speed
+
+
+@contextmanager
+def use_profile(profile=None):
+    """Rend `profile` actif pour le bloc (None : garde le profil courant)."""
+    resolved = get_profile(profile)
+    token = _current.set(resolved)
+    try:
+        yield resolved
+    finally:
+        _current.reset(token)
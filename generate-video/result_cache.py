@@ -0,0 +1,161 @@
+"""
+Request-level result cache: identical render requests share one video.
+
+The key is a canonical hash of everything that changes the output (script, title,
+explanations and their display flags, style, renderer, encoding profile). A finished
+video is served again while its file exists and is younger than RESULT_CACHE_TTL_HOURS;
+a request identical to a render still in progress waits for that render instead of
+starting its own. Entries are evicted by age and by the total size of their files
+(RESULT_CACHE_MAX_MB); an evicted video file is deleted, like the retention sweeper does.
+
+The index lives in memory: it is per process and starts empty after a restart.
+"""
+import os
+import time
+import threading
+import logging
+from concurrent.futures import Future
+
+from disk_cache import DiskCache
+from profiles import get_profile
+from workspace import OUTPUT_RETENTION_SECONDS, OUTPUT_MAX_BYTES
+import metrics
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_ENABLED = os.environ.get("RESULT_CACHE", "1") == "1"
+RESULT_CACHE_TTL_SECONDS = float(os.environ.get("RESULT_CACHE_TTL_HOURS", OUTPUT_RETENTION_SECONDS / 3600)) * 3600
+RESULT_CACHE_MAX_BYTES = int(float(os.environ.get("RESULT_CACHE_MAX_MB", OUTPUT_MAX_BYTES / (1024 * 1024))) * 1024 * 1024)
+
+RESULT_CACHE_LOOKUPS = metrics.counter("generate_video_result_cache_lookups_total",
+                                       "Render requests served from a finished video (hit), attached to an "
+                                       "identical render in progress (joined) or rendered (miss).", ("result",))
+
+
+def request_key(script_text="", title=None, explanations=None, show_explanations_text=False,
+                explanations_display=None, style=None, renderer=None, profile=None, granularity=None, **_):
+    """Canonical hash of the parameters of a render (generate_video keyword arguments)."""
+    from video_generator import VIDEO_RENDERER, resolve_granularity, split_to_units
+    granularity = resolve_granularity(granularity)
+    # Le découpage en segments est la forme canonique du script (espaces, retours à la ligne)
+    script = [" ".join(s.split()) for s in split_to_units(script_text or "", granularity)]
+    explanations = [e or "" for e in (explanations or [])]
+    while explanations and not explanations[-1]:
+        explanations.pop()  # explications vides en fin de liste : même rendu
+    display = [None if d is None else bool(d) for d in (explanations_display or [])]
+    return DiskCache.make_key(
+        "render", script, title, explanations, bool(show_explanations_text), display,
+        style or {}, (renderer or VIDEO_RENDERER).lower(), get_profile(profile).name, granularity,
+    )
+
+
+class ResultCache:
+    """Finished videos and renders in progress, by request key (see request_key)."""
+
+    def __init__(self, ttl=RESULT_CACHE_TTL_SECONDS, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = {}   # key -> (path, created_at, size)
+        self._inflight = {}  # key -> Future of the render in progress
+        self._lock = threading.Lock()
+
+    def _valid(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        path, created, _ = entry
+        if (self.ttl and time.time() - created > self.ttl) or not os.path.isfile(path):
+            del self._entries[key]
+            return None
+        return path
+
+    def get(self, key):
+        with self._lock:
+            return self._valid(key)
+
+    def get_or_render(self, key, render):
+        """
+        Return (path, how) where how is "hit", "joined" or "miss". `render()` runs only on a
+        miss and must return the path of the finished video; its exception is raised to every
+        request attached to it, and nothing is cached.
+        """
+        with self._lock:
+            path = self._valid(key)
+            if path is not None:
+                RESULT_CACHE_LOOKUPS.inc(result="hit")
+                return path, "hit"
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            RESULT_CACHE_LOOKUPS.inc(result="joined")
+            return future.result(), "joined"
+
+        RESULT_CACHE_LOOKUPS.inc(result="miss")
+        try:
+            path = render()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        self._store(key, path)
+        with self._lock:
+            del self._inflight[key]
+        future.set_result(path)
+        return path, "miss"
+
+    def _store(self, key, path):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        if self.max_bytes and size > self.max_bytes:
+            # Plus grande que tout le cache : la vidéo est servie mais pas gardée pour les doublons
+            logger.info("Result cache: %s (%d bytes) exceeds the cache size, not cached", path, size)
+            return
+        with self._lock:
+            self._entries[key] = (path, time.time(), size)
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """
+        Drop expired entries, then the oldest ones (deleting their files) beyond max_bytes.
+        The entry `keep` (the video just stored) is never evicted.
+        """
+        removed = []
+        with self._lock:
+            for key in list(self._entries):
+                self._valid(key)
+            total = sum(size for _, _, size in self._entries.values())
+            if self.max_bytes and total > self.max_bytes:
+                for key, (path, _, size) in sorted(self._entries.items(), key=lambda kv: kv[1][1]):
+                    if total <= self.max_bytes:
+                        break
+                    if key == keep:
+                        continue
+                    del self._entries[key]
+                    removed.append(path)
+                    total -= size
+        for path in removed:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if removed:
+            logger.info("Result cache: evicted %d videos", len(removed))
+        return len(removed)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "inflight": len(self._inflight),
+                    "bytes": sum(size for _, _, size in self._entries.values())}
+
+
+_result_cache = ResultCache() if RESULT_CACHE_ENABLED else None
+
+
+def get_result_cache():
+    """Process-wide result cache, or None when disabled (RESULT_CACHE=0)."""
+    return _result_cache
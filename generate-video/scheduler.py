@@ -0,0 +1,136 @@
+"""
+Node-level CPU budget shared by every job of the process.
+
+Each CPU-heavy stage (TTS inference, slide rendering, x264 encoding) reserves a number of
+cores before it runs and uses exactly that many threads (torch intra-op threads, ffmpeg
+`-threads`, moviepy `threads=`). When the budget is exhausted, stages wait in FIFO order
+instead of all running at once: with more concurrent jobs, each one gets slower but the
+node keeps encoding at full speed instead of thrashing.
+
+- CPU_BUDGET: cores owned by the scheduler (0 = available_cpus(), affinity and cgroup quota);
+- TTS_THREADS: cores per TTS inference (torch is configured with the same count);
+- CPU_SCHEDULER=0 disables the accounting (every stage gets the threads it asks for).
+
+A grant can be smaller than the request (down to `minimum`) when other stages are waiting,
+so that a large encode does not keep the whole node to itself. Reservations are not
+nested: a stage running inside another reservation of the same thread uses its cores.
+Utilization is exposed by `snapshot()` (GET /scheduler) and by the Prometheus gauges.
+"""
+import os
+import time
+import threading
+import collections
+from contextlib import contextmanager
+
+import metrics
+from profiles import available_cpus
+
+CPU_SCHEDULER_ENABLED = os.environ.get("CPU_SCHEDULER", "1") == "1"
+CPU_BUDGET = int(os.environ.get("CPU_BUDGET", "0")) or available_cpus()
+TTS_THREADS = int(os.environ.get("TTS_THREADS", "0")) or max(1, CPU_BUDGET // 4)
+
+STAGES = ("tts", "slides", "encode")
+
+CORES_IN_USE = metrics.gauge("generate_video_cpu_cores_in_use", "Cores currently granted, by stage.", ("stage",))
+STAGES_WAITING = metrics.gauge("generate_video_cpu_stages_waiting",
+                               "Stages waiting for cores of the CPU budget, by stage.", ("stage",))
+BUDGET_CORES = metrics.gauge("generate_video_cpu_budget_cores", "Cores owned by the CPU scheduler.")
+WAIT_SECONDS = metrics.histogram("generate_video_cpu_wait_seconds",
+                                 "Time a stage waited for its cores, by stage.", ("stage",))
+
+_held = threading.local()  # cores granted to the reservation open in this thread
+
+
+class CpuScheduler:
+    """Counting budget of cores with FIFO waiters (see the module docstring)."""
+
+    def __init__(self, budget=CPU_BUDGET, enabled=CPU_SCHEDULER_ENABLED):
+        self.budget = max(1, int(budget))
+        self.enabled = enabled
+        self._in_use = dict.fromkeys(STAGES, 0)
+        self._waiting = collections.deque()  # (ticket, stage)
+        self._granted = collections.Counter()
+        self._waited = collections.Counter()
+        self._cond = threading.Condition()
+        BUDGET_CORES.set(self.budget)
+
+    def _free(self):
+        return self.budget - sum(self._in_use.values())
+
+    def _publish(self, stage):
+        CORES_IN_USE.set(self._in_use.get(stage, 0), stage=stage)
+        STAGES_WAITING.set(sum(1 for _, s in self._waiting if s == stage), stage=stage)
+
+    @contextmanager
+    def reserve(self, stage, threads, minimum=1):
+        """Block until cores are available; yields the number of threads the stage may use."""
+        threads = max(1, int(threads))
+        if not self.enabled:
+            yield threads
+            return
+        if getattr(_held, "cores", 0):
+            yield _held.cores  # already inside a reservation of this thread: use its cores
+            return
+        want = min(threads, self.budget)
+        minimum = max(1, min(int(minimum), want))
+        ticket = object()
+        t0 = time.perf_counter()
+        with self._cond:
+            self._waiting.append((ticket, stage))
+            self._publish(stage)
+            while self._waiting[0][0] is not ticket or self._free() < minimum:
+                self._cond.wait()
+            self._waiting.popleft()
+            granted = min(want, self._free())
+            if self._waiting:
+                # Other stages are waiting: only take a fair share of what is left
+                granted = max(minimum, min(granted, self._free() // (len(self._waiting) + 1)))
+            self._in_use[stage] = self._in_use.get(stage, 0) + granted
+            self._granted[stage] += 1
+            self._publish(stage)
+            self._cond.notify_all()  # the next waiter may fit in what is left
+        waited = time.perf_counter() - t0
+        WAIT_SECONDS.observe(waited, stage=stage)
+        if waited >= 0.001:
+            self._waited[stage] += 1
+            metrics.record(f"cpu_wait:{stage}", waited)  # shows up in the request timings
+        _held.cores = granted
+        try:
+            yield granted
+        finally:
+            _held.cores = 0
+            with self._cond:
+                self._in_use[stage] -= granted
+                self._publish(stage)
+                self._cond.notify_all()
+
+    def snapshot(self):
+        """Utilization: cores in use and waiting stages per stage, grants and waits so far."""
+        with self._cond:
+            in_use = dict(self._in_use)
+            waiting = collections.Counter(stage for _, stage in self._waiting)
+            busy = sum(in_use.values())
+            return {
+                "enabled": self.enabled,
+                "budget": self.budget,
+                "inUse": in_use,
+                "busy": busy,
+                "utilization": round(busy / self.budget, 3),
+                "waiting": {stage: waiting.get(stage, 0) for stage in in_use},
+                "granted": dict(self._granted),
+                "waited": dict(self._waited),
+                "threads": {"tts": TTS_THREADS, "slides": 1},
+            }
+
+
+_scheduler = CpuScheduler()
+
+
+def get_scheduler():
+    """Process-wide CPU scheduler."""
+    return _scheduler
+
+
+def reserve(stage, threads, minimum=1):
+    """Shortcut for get_scheduler().reserve(...)."""
+    return _scheduler.reserve(stage, threads, minimum)
@@ -0,0 +1,157 @@
+"""
+Cache de segments encodés pour le re-rendu incrémental.
+
+Chaque segment (slide + audio + panneaux) est encodé en fragment MP4 par le moteur
+ffmpeg et rangé sous une clé calculée à partir de TOUTES ses entrées : texte, explication,
+titre (première slide), style, résolution, réglages d'encodage et voix TTS. Quand un prof
+corrige une seule phrase, seuls les segments modifiés passent par le TTS et l'encodeur ;
+les autres sont repris du cache et la vidéo est recousue sans ré-encodage.
+"""
+import os
+import time
+import shutil
+import threading
+import logging
+
+import metrics
+import ffmpeg_renderer
+from disk_cache import DiskCache
+from workspace import temp_dir
+from tts_engine import tts_identity
+from profiles import get_profile, use_profile, report_encode_speed
+from video_generator import (
+    FONT_SIZE,
+    explanation_for,
+    should_show_explanation,
+    split_to_units,
+    _plan_segments,
+    _discard_audio,
+    produce_segments,
+)
+
+logger = logging.getLogger(__name__)
+
+# À incrémenter quand le rendu d'un segment change (invalide tout le cache)
+SEGMENT_FORMAT_VERSION = 2
+
+SEGMENT_CACHE_ENABLED = os.environ.get("SEGMENT_CACHE", "1") == "1"
+SEGMENT_CACHE_DIR = os.environ.get("SEGMENT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "generate-video", "segments"))
+SEGMENT_CACHE_MAX_BYTES = int(float(os.environ.get("SEGMENT_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+
+_cache = None
+_cache_lock = threading.Lock()
+_counters = {"renders": 0, "segments_reused": 0, "segments_encoded": 0}
+
+SEGMENTS = metrics.counter("generate_video_segments_total",
+                           "Segments of incremental renders, reused from the cache or encoded.", ("result",))
+
+
+def get_segment_cache():
+    """Cache de fragments du processus, ou None s'il est désactivé (SEGMENT_CACHE=0)."""
+    global _cache
+    if not SEGMENT_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache(SEGMENT_CACHE_DIR, SEGMENT_CACHE_MAX_BYTES, suffix=".mp4")
+    return _cache
+
+
+def segment_key(text, title, exp_text, show_overlay, style, profile=None):
+    """Clé d'un segment : toutes les entrées qui changent ses pixels, son audio ou son encodage."""
+    backend, model = tts_identity()
+    profile = get_profile(profile)
+    return DiskCache.make_key(
+        "segment", SEGMENT_FORMAT_VERSION,
+        text, title, exp_text or None, bool(show_overlay),
+        {k: style[k] for k in sorted(style)},
+        list(profile.size), profile.scaled(FONT_SIZE),
+        {"fps": profile.fps, "preset": profile.preset, "crf": profile.crf,
+         "audio_bitrate": profile.audio_bitrate, "audio_rate": ffmpeg_renderer.AUDIO_RATE,
+         "fade": ffmpeg_renderer.FADE_DUR, "overlay_fade": ffmpeg_renderer.OVERLAY_FADE_DUR},
+        backend, model,
+    )
+
+
+def render_incremental(script_text, output_path, title=None, explanations=None, explanations_display=None,
+                       show_explanations_text=False, style=None, profile=None,
+                       workers=None, executor=None, progress=None, granularity=None):
+    """
+    Rendu complet en réutilisant les fragments déjà encodés (segments par phrase ou par
+    paragraphe selon `granularity`).
+    Renvoie (output_path, {"reused": n, "encoded": m}).
+    """
+    cache = get_segment_cache()
+    if cache is None:
+        raise RuntimeError("Le cache de segments est désactivé (SEGMENT_CACHE=0).")
+    sentences = split_to_units(script_text, granularity)
+    if not sentences:
+        raise ValueError("Aucune diapositive trouvée.")
+    style = style or {}
+    explanations = explanations or []
+    explanations_display = explanations_display or []
+
+    keys = []
+    for idx, s in enumerate(sentences):
+        exp_text, exp_show = explanation_for(idx, explanations, explanations_display)
+        show = should_show_explanation(exp_text, exp_show, show_explanations_text)
+        keys.append(segment_key(s, title if idx == 0 else None, exp_text, show, style, profile))
+
+    # Sur disque (pas en RAM) : les fragments sont liés en dur avec le cache
+    work_dir = temp_dir(prefix="segcache_")
+    plan = []
+    try:
+        parts = [os.path.join(work_dir, f"seg_{idx:04d}.mp4") for idx in range(len(sentences))]
+        missing = {idx for idx, key in enumerate(keys) if not cache.fetch(key, parts[idx], link=True)}
+        # Un segment répété dans le script n'est produit qu'une fois
+        first_of = {}
+        for idx in sorted(missing):
+            first_of.setdefault(keys[idx], idx)
+
+        if missing:
+            plan = _plan_segments(sentences, work_dir, explanations, explanations_display, only=set(first_of.values()))
+            segments = produce_segments(plan, title=title, workers=workers, executor=executor, progress=progress)
+            if progress: progress("encode", 0, 1)
+            items = [(f"new_{p['idx']:04d}", seg) for p, seg in zip(plan, segments)]
+            t0 = time.perf_counter()
+            with use_profile(profile):
+                encoded = ffmpeg_renderer.encode_segments(items, work_dir, show_explanations_text, style)
+            report_encode_speed(profile, "ffmpeg", sum(seg[2] + seg[4] for seg in segments),
+                                time.perf_counter() - t0)
+            for p, path in zip(plan, encoded):
+                cache.put(keys[p["idx"]], path)
+                os.replace(path, parts[p["idx"]])
+            for idx in missing:
+                src_idx = first_of[keys[idx]]
+                if src_idx != idx:
+                    shutil.copyfile(parts[src_idx], parts[idx])
+        else:
+            if progress: progress("encode", 0, 1)
+
+        ffmpeg_renderer.concat_segments(parts, output_path)
+        if progress: progress("encode", 1, 1)
+    finally:
+        _discard_audio(plan)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    stats = {"reused": len(sentences) - len(first_of), "encoded": len(first_of)}
+    with _cache_lock:
+        _counters["renders"] += 1
+        _counters["segments_reused"] += stats["reused"]
+        _counters["segments_encoded"] += stats["encoded"]
+    SEGMENTS.inc(stats["reused"], result="reused")
+    SEGMENTS.inc(stats["encoded"], result="encoded")
+    metrics.annotate("segments", stats)
+    logger.info("Segment cache: %d reused, %d encoded", stats["reused"], stats["encoded"])
+    return output_path, stats
+
+
+def segment_cache_stats():
+    cache = get_segment_cache()
+    if cache is None:
+        return {"enabled": False}
+    with _cache_lock:
+        counters = dict(_counters)
+    total = counters["segments_reused"] + counters["segments_encoded"]
+    counters["reuse_ratio"] = (counters["segments_reused"] / total) if total else 0.0
+    return {**cache.stats(), **counters}
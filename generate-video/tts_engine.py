@@ -1,174 +1,601 @@
 import os
-import tempfile
+import re
+import importlib.util
+import time
+import shutil
 import logging
+import threading
+
+import metrics
+import workspace
+from scheduler import reserve, TTS_THREADS
+from disk_cache import DiskCache
+from wav_audio import wav_duration
 
 logger = logging.getLogger(__name__)
 
-# Try to import Coqui TTS
-try:
-    from TTS.api import TTS
-    TTS_AVAILABLE = True
-except Exception as e:
-    TTS_AVAILABLE = False
-    logger.warning("Coqui TTS not available: %s", e)
+# Coqui TTS (torch) and pyttsx3 are only imported when their model is loaded (see get_model):
+# checking that they are installed is enough at import time and keeps startup fast.
+def _installed(module):
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+TTS_AVAILABLE = _installed("TTS")
+if not TTS_AVAILABLE:
+    logger.warning("Coqui TTS not available: module 'TTS' is not installed")
 
 # Fallback pyttsx3
-try:
-    import pyttsx3
-    PYTTSX3_AVAILABLE = True
-except Exception:
-    PYTTSX3_AVAILABLE = False
-
-def math_to_words(text):
-    replacements = {
-        '=': ' equals ',
-        '+': ' plus ',
-        '-': ' minus ',
-        '−': ' minus ',
-        '*': ' times ',
-        '×': ' times ',
-        '·': ' times ',
-        '/': ' divided by ',
-        '÷': ' divided by ',
-        '^': ' to the power of ',
-        '±': ' plus or minus ',
-        '(': ' open parenthesis ',
-        ')': ' close parenthesis ',
-        '[': ' open bracket ',
-        ']': ' close bracket ',
-        '{': ' open brace ',
-        '}': ' close brace ',
-        '<': ' less than ',
-        '>': ' greater than ',
-        '≤': ' less than or equal to ',
-        '≥': ' greater than or equal to ',
-        '<=': ' less than or equal to ',
-        '>=': ' greater than or equal to ',
-        '≠': ' not equal to ',
-        '≈': ' approximately equal to ',
-        '≡': ' congruent to ',
-        '∝': ' proportional to ',
-        '√': ' square root of ',
-        '∑': ' sum of ',
-        '∏': ' product of ',
-        '∫': ' integral of ',
-        '∞': ' infinity ',
-        '∂': ' partial ',
-        '∇': ' nabla ',
-        'π': ' pi ',
-        'θ': ' theta ',
-        'λ': ' lambda ',
-        'μ': ' mu ',
-        'α': ' alpha ',
-        'β': ' beta ',
-        'γ': ' gamma ',
-        'δ': ' delta ',
-        'φ': ' phi ',
-        'ϕ': ' phi ',
-        'σ': ' sigma ',
-        'ω': ' omega ',
-        'ε': ' epsilon ',
-        'η': ' eta ',
-        'κ': ' kappa ',
-        'ν': ' nu ',
-        'ρ': ' rho ',
-        'τ': ' tau ',
-        'ξ': ' xi ',
-        'ζ': ' zeta ',
-        'ψ': ' psi ',
-        'χ': ' chi ',
-        'Ω': ' omega ',
-        'Σ': ' sigma ',
-        'Γ': ' gamma ',
-        'Δ': ' delta ',
-        'Φ': ' phi ',
-        'Λ': ' lambda ',
-        'Θ': ' theta ',
-        'Ψ': ' psi ',
-        'Π': ' pi ',
-        '∈': ' element of ',
-        '∉': ' not an element of ',
-        '⊂': ' subset of ',
-        '⊆': ' subset or equal to ',
-        '⊄': ' not a subset of ',
-        '⊇': ' superset or equal to ',
-        '∪': ' union ',
-        '∩': ' intersection ',
-        '∧': ' and ',
-        '∨': ' or ',
-        '⇒': ' implies ',
-        '→': ' implies ',
-        '↔': ' if and only if ',
-        '⇔': ' if and only if ',
-        '|': ' divides ',
-        '∣': ' divides ',
-        '∤': ' does not divide ',
-        '…': ' and so on ',
-        'ℕ': ' natural numbers ',
-        'ℤ': ' integers ',
-        'ℚ': ' rational numbers ',
-        'ℝ': ' real numbers ',
-        'ℂ': ' complex numbers ',
-        'gcd': ' greatest common divisor ',
-        '_': ' sub ',
-        'deg': ' degrees ',
-        'mod': ' modulo ',
-        # ajoute d'autres symboles si nécessaire
-    }
+PYTTSX3_AVAILABLE = _installed("pyttsx3")
+
+
+# --------------------------------------------------------------
+# Math-to-speech normalization
+# --------------------------------------------------------------
+EN_SYMBOLS = {
+    '=': ' equals ',
+    '+': ' plus ',
+    '-': ' minus ',
+    '−': ' minus ',
+    '*': ' times ',
+    '×': ' times ',
+    '·': ' times ',
+    '/': ' divided by ',
+    '÷': ' divided by ',
+    '^': ' to the power of ',
+    '±': ' plus or minus ',
+    '(': ' open parenthesis ',
+    ')': ' close parenthesis ',
+    '[': ' open bracket ',
+    ']': ' close bracket ',
+    '{': ' open brace ',
+    '}': ' close brace ',
+    '<': ' less than ',
+    '>': ' greater than ',
+    '≤': ' less than or equal to ',
+    '≥': ' greater than or equal to ',
+    '<=': ' less than or equal to ',
+    '>=': ' greater than or equal to ',
+    '≠': ' not equal to ',
+    '≈': ' approximately equal to ',
+    '≡': ' congruent to ',
+    '∝': ' proportional to ',
+    '√': ' square root of ',
+    '∑': ' sum of ',
+    '∏': ' product of ',
+    '∫': ' integral of ',
+    '∞': ' infinity ',
+    '∂': ' partial ',
+    '∇': ' nabla ',
+    'π': ' pi ',
+    'θ': ' theta ',
+    'λ': ' lambda ',
+    'μ': ' mu ',
+    'α': ' alpha ',
+    'β': ' beta ',
+    'γ': ' gamma ',
+    'δ': ' delta ',
+    'φ': ' phi ',
+    'ϕ': ' phi ',
+    'σ': ' sigma ',
+    'ω': ' omega ',
+    'ε': ' epsilon ',
+    'η': ' eta ',
+    'κ': ' kappa ',
+    'ν': ' nu ',
+    'ρ': ' rho ',
+    'τ': ' tau ',
+    'ξ': ' xi ',
+    'ζ': ' zeta ',
+    'ψ': ' psi ',
+    'χ': ' chi ',
+    'Ω': ' omega ',
+    'Σ': ' sigma ',
+    'Γ': ' gamma ',
+    'Δ': ' delta ',
+    'Φ': ' phi ',
+    'Λ': ' lambda ',
+    'Θ': ' theta ',
+    'Ψ': ' psi ',
+    'Π': ' pi ',
+    '∈': ' element of ',
+    '∉': ' not an element of ',
+    '⊂': ' subset of ',
+    '⊆': ' subset or equal to ',
+    '⊄': ' not a subset of ',
+    '⊇': ' superset or equal to ',
+    '∪': ' union ',
+    '∩': ' intersection ',
+    '∧': ' and ',
+    '∨': ' or ',
+    '⇒': ' implies ',
+    '→': ' implies ',
+    '↔': ' if and only if ',
+    '⇔': ' if and only if ',
+    '|': ' divides ',
+    '∣': ' divides ',
+    '∤': ' does not divide ',
+    '…': ' and so on ',
+    'ℕ': ' natural numbers ',
+    'ℤ': ' integers ',
+    'ℚ': ' rational numbers ',
+    'ℝ': ' real numbers ',
+    'ℂ': ' complex numbers ',
+    'gcd': ' greatest common divisor ',
+    '_': ' sub ',
+    'deg': ' degrees ',
+    'mod': ' modulo ',
+    # ajoute d'autres symboles si nécessaire
+}
 
-    for symbol, word in sorted(replacements.items(), key=lambda kv: -len(kv[0])):
-        text = text.replace(symbol, word)
+# Per-language symbol tables; register_symbol_table adds more
+SYMBOL_TABLES = {"en": EN_SYMBOLS}
 
-    text = ' '.join(text.split())
-    return text
 
-def synthesize_audio_coqui(text, output_path):
+def _trie_pattern(node):
+    """Regex of a symbol trie: shared prefixes are factored so each position is tested once."""
+    alternatives, singles = [], []
+    for ch in sorted(k for k in node if k):
+        child = node[ch]
+        if list(child) == [""]:
+            singles.append(re.escape(ch))
+        else:
+            alternatives.append(re.escape(ch) + _trie_pattern(child))
+    if singles:
+        alternatives.append(singles[0] if len(singles) == 1 else "[" + "".join(singles) + "]")
+    pattern = "(?:" + "|".join(alternatives) + ")"
+    return pattern + "?" if "" in node else pattern
+
+
+class MathNormalizer:
     """
-    Synthesize using Coqui TTS (if available).
-    This will download the model on first run if not present.
+    Precompiled symbol-to-words normalizer.
+    All symbols are matched in a single scan by one regex built from a trie of the keys
+    (longest match wins); alphabetic keys such as 'mod', 'deg' or 'gcd' only match as whole words.
     """
-    # Select a lightweight model if available; adjust model name if you want another
-    model_name = "tts_models/en/ljspeech/tacotron2-DDC"
-    tts = TTS(model_name, progress_bar=False, gpu=False)  # gpu=True if tu as GPU
-    tts.tts_to_file(text=text, file_path=output_path)
-    return output_path
 
-def synthesize_audio_pyttsx3(text, output_path):
+    def __init__(self, table):
+        self.table = dict(table)
+        # multi-letter keys are words; single letters (Greek, ℝ, ...) stay plain symbols
+        words = [s for s in self.table if len(s) > 1 and s.isalpha()]
+        symbols = [s for s in self.table if s not in words]
+        parts = []
+        if words:
+            alternation = "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+            # not preceded/followed by a letter (digits are fine: '30deg')
+            parts.append(rf"(?<![^\W\d_])(?:{alternation})(?![^\W\d_])")
+        if symbols:
+            trie = {}
+            for symbol in symbols:
+                node = trie
+                for ch in symbol:
+                    node = node.setdefault(ch, {})
+                node[""] = {}
+            parts.append(_trie_pattern(trie))
+        self.pattern = re.compile("|".join(parts))
+
+    _SEP = "\x00"
+
+    def _replace(self, match):
+        return self.table[match.group(0)]
+
+    def normalize(self, text):
+        return ' '.join(self.pattern.sub(self._replace, text).split())
+
+    def normalize_many(self, texts):
+        """One regex pass over the whole batch, split back per text."""
+        texts = list(texts)
+        if any(self._SEP in t for t in texts):
+            return [self.normalize(text) for text in texts]
+        joined = self.pattern.sub(self._replace, self._SEP.join(texts))
+        return [' '.join(part.split()) for part in joined.split(self._SEP)]
+
+
+_NORMALIZERS = {}
+
+
+def register_symbol_table(lang, table, base="en"):
+    """Register (or extend) the symbol table of a language; entries of `base` are inherited."""
+    merged = dict(SYMBOL_TABLES.get(base, {})) if base else {}
+    merged.update(table)
+    SYMBOL_TABLES[lang] = merged
+    _NORMALIZERS.pop(lang, None)
+
+
+def get_normalizer(lang="en"):
+    normalizer = _NORMALIZERS.get(lang)
+    if normalizer is None:
+        if lang not in SYMBOL_TABLES:
+            raise ValueError(f"No symbol table for language: {lang}")
+        normalizer = _NORMALIZERS[lang] = MathNormalizer(SYMBOL_TABLES[lang])
+    return normalizer
+
+
+def math_to_words(text, lang="en"):
+    return get_normalizer(lang).normalize(text)
+
+
+def normalize_many(texts, lang="en"):
+    """Batch entry point: normalize many sentences with the same compiled normalizer."""
+    return get_normalizer(lang).normalize_many(texts)
+
+# --------------------------------------------------------------
+# Model registry: each backend/model is loaded once per worker process
+# --------------------------------------------------------------
+DEFAULT_COQUI_MODEL = os.environ.get("TTS_MODEL", "tts_models/en/ljspeech/tacotron2-DDC")
+TTS_USE_GPU = os.environ.get("TTS_GPU", "0") == "1"
+
+_BACKENDS = {}          # name -> backend spec (loader, synthesizer, availability)
+_BACKEND_ORDER = []     # fallback order used when no backend is requested
+_MODELS = {}            # (backend, model_name) -> loaded model/engine
+_MODEL_LOCKS = {}       # (backend, model_name) -> lock serializing inference
+_FAILED = {}            # (backend, model_name) -> error message of the failed load
+_REGISTRY_LOCK = threading.Lock()
+
+
+def register_backend(name, synthesize, load=None, available=True, default_model=None, synthesize_many=None):
     """
-    Offline fallback using pyttsx3 (less natural but reliable).
-    pyttsx3 can output only to speakers by default; to write to file we use temporary wave via save_to_file.
+    Register a TTS backend.
+    `load(model_name)` returns the model/engine kept warm in the registry,
+    `synthesize(model, text, output_path, **voice)` writes a WAV file.
+    `synthesize_many(model, texts, output_paths, **voice)`, when the backend can group
+    several texts in one call, writes one WAV per text (see synthesize_many below).
     """
+    _BACKENDS[name] = {
+        "load": load or (lambda model_name: None),
+        "synthesize": synthesize,
+        "synthesize_many": synthesize_many,
+        "available": available,
+        "default_model": default_model,
+    }
+    if name not in _BACKEND_ORDER:
+        _BACKEND_ORDER.append(name)
+
+
+def _model_key(backend, model_name=None):
+    spec = _BACKENDS.get(backend)
+    if spec is None:
+        raise ValueError(f"Unknown TTS backend: {backend}")
+    return backend, model_name or spec["default_model"]
+
+
+def get_model(backend, model_name=None):
+    """Return the warm model for a backend, loading it on first use only."""
+    key = _model_key(backend, model_name)
+    model = _MODELS.get(key)
+    if model is not None or key in _MODELS:
+        return model
+    if key in _FAILED:
+        raise RuntimeError(f"TTS backend {backend} previously failed to load: {_FAILED[key]}")
+    with _REGISTRY_LOCK:
+        lock = _MODEL_LOCKS.setdefault(key, threading.Lock())
+    with lock:
+        if key in _MODELS:
+            return _MODELS[key]
+        if key in _FAILED:
+            raise RuntimeError(f"TTS backend {backend} previously failed to load: {_FAILED[key]}")
+        logger.info("Loading TTS model %s/%s", backend, key[1])
+        try:
+            model = _BACKENDS[backend]["load"](key[1])
+        except Exception as e:
+            _FAILED[key] = str(e)
+            raise
+        _MODELS[key] = model
+        return model
+
+
+def preload_models(backends=None, model_name=None):
+    """Warm the registry at startup. Returns the backends that loaded successfully."""
+    loaded = []
+    for backend in backends or available_backends():
+        try:
+            get_model(backend, model_name if backend == "coqui" else None)
+            loaded.append(backend)
+        except Exception as e:
+            logger.warning("Preloading TTS backend %s failed: %s", backend, e)
+    return loaded
+
+
+def available_backends():
+    """Backends installed in this environment, in fallback order, minus the ones that failed."""
+    failed = {backend for (backend, _) in _FAILED}
+    return [b for b in _BACKEND_ORDER if _BACKENDS[b]["available"] and b not in failed]
+
+
+def failed_backends():
+    return {f"{backend}:{model}": err for (backend, model), err in _FAILED.items()}
+
+
+def reset_failed_backends():
+    """Forget remembered failures so the next call retries every backend."""
+    _FAILED.clear()
+
+
+def _load_coqui(model_name):
+    import torch
+    from TTS.api import TTS
+    # torch intra-op threads = cores reserved per inference (CPU budget, see scheduler.py)
+    torch.set_num_threads(TTS_THREADS)
+    return TTS(model_name, progress_bar=False, gpu=TTS_USE_GPU)
+
+
+def _synthesize_coqui(tts, text, output_path, **voice):
+    tts.tts_to_file(text=text, file_path=output_path, **voice)
+    return output_path
+
+
+def _load_pyttsx3(model_name):
+    import pyttsx3
     engine = pyttsx3.init()
-    # Optionally set voice/rate properties:
     rate = engine.getProperty('rate')
     engine.setProperty('rate', int(rate * 0.95))
+    return engine
+
+
+def _synthesize_pyttsx3(engine, text, output_path, **voice):
+    for prop, value in voice.items():
+        engine.setProperty(prop, value)
     engine.save_to_file(text, output_path)
     engine.runAndWait()
     return output_path
 
-def synthesize_audio(text, output_path=None):
+
+def _synthesize_many_pyttsx3(engine, texts, output_paths, **voice):
+    # Every utterance is queued, then played by a single runAndWait loop
+    for prop, value in voice.items():
+        engine.setProperty(prop, value)
+    for text, path in zip(texts, output_paths):
+        engine.save_to_file(text, path)
+    engine.runAndWait()
+    return output_paths
+
+
+# Coqui has no grouped call: Tacotron2 infers one text at a time, and tts_to_file applies the
+# peak normalization of save_wav, so its texts go through the per-item path of synthesize_many
+register_backend("coqui", _synthesize_coqui, load=_load_coqui,
+                 available=TTS_AVAILABLE, default_model=DEFAULT_COQUI_MODEL)
+register_backend("pyttsx3", _synthesize_pyttsx3, load=_load_pyttsx3,
+                 available=PYTTSX3_AVAILABLE, synthesize_many=_synthesize_many_pyttsx3)
+
+
+def synthesize_with(backend, text, output_path, model_name=None, **voice):
+    """Run one backend using its warm model; inference is serialized per model."""
+    key = _model_key(backend, model_name)
+    model = get_model(backend, model_name)
+    with _MODEL_LOCKS[key], reserve("tts", TTS_THREADS):
+        return _BACKENDS[backend]["synthesize"](model, text, output_path, **voice)
+
+
+def synthesize_audio_coqui(text, output_path, model_name=None):
+    """
+    Synthesize using Coqui TTS (if available).
+    This will download the model on first run if not present; the model then stays warm.
+    """
+    return synthesize_with("coqui", text, output_path, model_name=model_name)
+
+
+def synthesize_audio_pyttsx3(text, output_path):
+    """
+    Offline fallback using pyttsx3 (less natural but reliable).
+    pyttsx3 can output only to speakers by default; to write to file we use temporary wave via save_to_file.
+    """
+    return synthesize_with("pyttsx3", text, output_path)
+
+
+def _candidates(backend=None, fallback=True):
+    backend = backend or os.environ.get("TTS_BACKEND") or None
+    candidates = available_backends()
+    if backend:
+        if backend not in _BACKENDS:
+            raise ValueError(f"Unknown TTS backend: {backend}")
+        candidates = [backend] + ([b for b in candidates if b != backend] if fallback else [])
+    return candidates
+
+
+TTS_SECONDS = metrics.histogram("generate_video_tts_seconds",
+                                "Latency of one TTS synthesis (one sentence), by backend and outcome.",
+                                ("backend", "status"))
+TTS_CACHE_LOOKUPS = metrics.counter("generate_video_tts_cache_lookups_total",
+                                    "Audio cache lookups, by result.", ("result",))
+
+
+def _synthesize(processed, output_path, backend=None, model_name=None, fallback=True, **voice):
+    """Try the candidate backends in order; returns (path, backend used, model used)."""
+    for i, name in enumerate(_candidates(backend, fallback)):
+        # model/voice parameters only make sense for the backend they were chosen for
+        primary = i == 0
+        used_model = _model_key(name, model_name if primary else None)[1]
+        t0 = time.perf_counter()
+        try:
+            path = synthesize_with(name, processed, output_path,
+                                   model_name=used_model, **(voice if primary else {}))
+            metrics.record(f"tts:{name}", time.perf_counter() - t0, TTS_SECONDS, backend=name, status="ok")
+            return path, name, used_model
+        except Exception as e:
+            metrics.record(f"tts:{name}", time.perf_counter() - t0, TTS_SECONDS, backend=name, status="error")
+            logger.warning("%s TTS failed: %s", name, e)
+
+    raise RuntimeError("No TTS backend available. Install 'TTS' (Coqui) or 'pyttsx3'.")
+
+
+def tts_identity(backend=None, model_name=None):
+    """(backend, model) that would be tried first for these parameters; used in cache keys."""
+    candidates = _candidates(backend)
+    if not candidates:
+        return None, None
+    return _model_key(candidates[0], model_name)
+
+
+def _tmp_wav():
+    return workspace.temp_file(suffix=".wav", prefix="tts_")
+
+
+def synthesize_audio(text, output_path=None, backend=None, model_name=None, fallback=True, **voice):
     """
     Unified interface. Returns path to WAV file.
+    `backend` picks the first backend to try (default: TTS_BACKEND env, then the fallback order);
+    `model_name` selects the model for that backend. Backends whose model failed to load are skipped.
     """
     if output_path is None:
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        output_path = tmp.name
-        tmp.close()
+        output_path = _tmp_wav()
 
     processed = math_to_words(text)
+    return _synthesize(processed, output_path, backend, model_name, fallback, **voice)[0]
+
+
+# --------------------------------------------------------------
+# Persistent audio cache (content-addressed, shared between workers)
+# --------------------------------------------------------------
+TTS_CACHE_ENABLED = os.environ.get("TTS_CACHE", "1") == "1"
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "generate-video", "tts"))
+TTS_CACHE_MAX_BYTES = int(float(os.environ.get("TTS_CACHE_MAX_MB", "512")) * 1024 * 1024)
+
+_audio_cache = None
+
+
+def get_audio_cache():
+    """Process-wide audio cache, or None when disabled (TTS_CACHE=0)."""
+    global _audio_cache
+    if not TTS_CACHE_ENABLED:
+        return None
+    if _audio_cache is None:
+        with _REGISTRY_LOCK:
+            if _audio_cache is None:
+                _audio_cache = DiskCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES, suffix=".wav")
+    return _audio_cache
+
+
+def audio_cache_key(processed, backend, model_name=None, **voice):
+    """Key of an already normalized text (see math_to_words) for a given backend/model/voice."""
+    return DiskCache.make_key("tts", processed, backend, model_name, voice)
+
+
+def synthesize_audio_cached(text, output_path=None, backend=None, model_name=None, fallback=True, **voice):
+    """
+    Same as synthesize_audio, but serves repeated sentences from the audio cache.
+    The key uses the backend that would be tried first; the result is stored under
+    the backend that actually produced it.
+    """
+    cache = get_audio_cache()
+    if cache is None:
+        return synthesize_audio(text, output_path, backend, model_name, fallback, **voice)
+    if output_path is None:
+        output_path = _tmp_wav()
+
+    processed = math_to_words(text)
+    candidates = _candidates(backend, fallback)
+    if candidates:
+        primary_model = _model_key(candidates[0], model_name)[1]
+        if cache.fetch(audio_cache_key(processed, candidates[0], primary_model, **voice), output_path):
+            TTS_CACHE_LOOKUPS.inc(result="hit")
+            return output_path
+        TTS_CACHE_LOOKUPS.inc(result="miss")
+
+    path, used, used_model = _synthesize(processed, output_path, backend, model_name, fallback, **voice)
+    try:
+        cache.put(audio_cache_key(processed, used, used_model, **(voice if used == candidates[0] else {})), path)
+    except OSError as e:
+        logger.warning("Could not store audio in cache: %s", e)
+    return path
 
-    # Try Coqui first
-    if TTS_AVAILABLE:
-        try:
-            return synthesize_audio_coqui(processed, output_path)
-        except Exception as e:
-            logger.warning("Coqui TTS failed: %s", e)
 
-    # Fallback to pyttsx3
-    if PYTTSX3_AVAILABLE:
+# --------------------------------------------------------------
+# Batched synthesis (several texts per backend call)
+# --------------------------------------------------------------
+TTS_BATCH_SIZE = int(os.environ.get("TTS_BATCH_SIZE", "8"))
+
+
+def _synthesize_group(processed, output_paths, backend=None, model_name=None, fallback=True, **voice):
+    """
+    One grouped call on the first candidate backend when it can batch, else the usual
+    per-item path (with its fallbacks). Returns (backend used, model used) per item.
+    """
+    candidates = _candidates(backend, fallback)
+    if candidates and len(processed) > 1 and _BACKENDS[candidates[0]]["synthesize_many"] is not None:
+        name = candidates[0]
+        used_model = _model_key(name, model_name)[1]
+        t0 = time.perf_counter()
         try:
-            return synthesize_audio_pyttsx3(processed, output_path)
+            model = get_model(name, used_model)
+            with _MODEL_LOCKS[(name, used_model)], reserve("tts", TTS_THREADS):
+                _BACKENDS[name]["synthesize_many"](model, processed, output_paths, **voice)
+            missing = [p for p in output_paths if not os.path.isfile(p) or os.path.getsize(p) == 0]
+            if missing:
+                raise RuntimeError(f"{len(missing)} of {len(output_paths)} files not written")
+            # One observation per text: the histogram stays a per-sentence latency
+            per_item = (time.perf_counter() - t0) / len(processed)
+            for _ in processed:
+                metrics.record(f"tts:{name}", per_item, TTS_SECONDS, backend=name, status="ok")
+            return [(name, used_model)] * len(processed)
         except Exception as e:
-            logger.warning("pyttsx3 failed: %s", e)
+            metrics.record(f"tts:{name}", time.perf_counter() - t0, TTS_SECONDS, backend=name, status="error")
+            logger.warning("%s batched TTS failed, retrying item by item: %s", name, e)
+    return [_synthesize(text, path, backend, model_name, fallback, **voice)[1:]
+            for text, path in zip(processed, output_paths)]
 
-    raise RuntimeError("No TTS backend available. Install 'TTS' (Coqui) or 'pyttsx3'.")
+
+def _wav_seconds(path):
+    try:
+        return wav_duration(path)
+    except Exception:
+        return None
+
+
+def synthesize_many(texts, output_paths=None, backend=None, model_name=None, fallback=True,
+                    batch_size=None, **voice):
+    """
+    Batched synthesize_audio_cached: one WAV per text, in input order.
+    Cache hits are served first and repeated texts are synthesized once; the rest goes to
+    the backend in groups of `batch_size` (TTS_BATCH_SIZE) through its `synthesize_many`,
+    or one text per call for backends that can't batch.
+    Returns [(path, duration in seconds)]; the duration is None if the file isn't a readable WAV.
+    """
+    texts = list(texts)
+    if output_paths is None:
+        output_paths = [_tmp_wav() for _ in texts]
+    if len(output_paths) != len(texts):
+        raise ValueError("texts and output_paths must have the same length")
+    batch_size = max(1, int(batch_size or TTS_BATCH_SIZE))
+
+    processed = normalize_many(texts)
+    cache = get_audio_cache()
+    candidates = _candidates(backend, fallback)
+    primary_model = _model_key(candidates[0], model_name)[1] if candidates else None
+
+    todo = []
+    for i, (text, path) in enumerate(zip(processed, output_paths)):
+        if cache is not None and candidates:
+            if cache.fetch(audio_cache_key(text, candidates[0], primary_model, **voice), path):
+                TTS_CACHE_LOOKUPS.inc(result="hit")
+                continue
+            TTS_CACHE_LOOKUPS.inc(result="miss")
+        todo.append(i)
+
+    first = {}
+    for i in todo:
+        first.setdefault(processed[i], i)
+    unique = sorted(first.values())
+    for start in range(0, len(unique), batch_size):
+        group = unique[start:start + batch_size]
+        used = _synthesize_group([processed[i] for i in group], [output_paths[i] for i in group],
+                                 backend, model_name, fallback, **voice)
+        if cache is None:
+            continue
+        for i, (name, name_model) in zip(group, used):
+            try:
+                cache.put(audio_cache_key(processed[i], name, name_model,
+                                          **(voice if name == candidates[0] else {})), output_paths[i])
+            except OSError as e:
+                logger.warning("Could not store audio in cache: %s", e)
+    for i in todo:
+        if first[processed[i]] != i:
+            shutil.copyfile(output_paths[first[processed[i]]], output_paths[i])
+
+    return [(path, _wav_seconds(path)) for path in output_paths]
+
+
+def audio_cache_stats():
+    cache = get_audio_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
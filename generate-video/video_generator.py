@@ -1,39 +1,82 @@
 import os
 import math
+import shutil
+import time
 import tempfile
+import subprocess
 import textwrap
 from pathlib import Path
 import uuid
+from functools import lru_cache
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_EXCEPTION
+from concurrent.futures.process import BrokenProcessPool
 from typing import List
-import moviepy.editor as mpy
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
-from tts_engine import synthesize_audio
-
-# --- Configuration globale ---
+from compositor import PanelOverlay, SegmentCompositor
+from wav_audio import build_soundtrack, wav_duration
+from metrics import span, bind_context
+from workspace import job_workspace, temp_file, temp_dir, check_quota, output_dir as default_output_dir
+from profiles import get_profile, use_profile, report_encode_speed
+from scheduler import reserve, CPU_BUDGET
+from tts_engine import synthesize_audio_cached, synthesize_many, TTS_BATCH_SIZE
+
+# --- Configuration globale (profil "standard" ; les autres profils mettent à l'échelle, voir profiles.py) ---
 VIDEO_SIZE = (1280, 720)
 FONT_SIZE = 36
 BG_COLOR = (0, 0, 0)
 TEXT_COLOR = "white"
 LINE_SPACING = 10
 
-# --- Chargement des polices ---
-try:
-    FONT_PATH = "arial.ttf"
-    MAIN_FONT = ImageFont.truetype(FONT_PATH, FONT_SIZE)
-    TITLE_FONT = ImageFont.truetype(FONT_PATH, FONT_SIZE + 6)
-    EXP_FONT = ImageFont.truetype(FONT_PATH, int(FONT_SIZE * 0.8))
-except IOError:
-    print(f"Attention : Police '{FONT_PATH}' non trouvée. Utilisation de la police par défaut.")
-    MAIN_FONT = ImageFont.load_default()
-    TITLE_FONT = ImageFont.load_default()
-    EXP_FONT = ImageFont.load_default()
+FONT_PATH = "arial.ttf"
+
+
+def _mpy():
+    """moviepy.editor (long à importer : imageio, IPython...) n'est chargé qu'au premier assemblage."""
+    import moviepy.editor as mpy
+    return mpy
+
+
+# --- Chargement des polices (une fois par taille/police, à la demande) ---
+@lru_cache(maxsize=None)
+def get_font(size: int, path: str = FONT_PATH):
+    try:
+        return ImageFont.truetype(path, size)
+    except IOError:
+        _warn_missing_font(path)
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=None)
+def _warn_missing_font(path: str):
+    print(f"Attention : Police '{path}' non trouvée. Utilisation de la police par défaut.")
+
+
+def main_font(profile=None):
+    return get_font(get_profile(profile).scaled(FONT_SIZE))
+
+
+def title_font(profile=None):
+    return get_font(get_profile(profile).scaled(FONT_SIZE + 6))
+
+
+def exp_font(profile=None):
+    return get_font(get_profile(profile).scaled(int(FONT_SIZE * 0.8)))
+
+
+@lru_cache(maxsize=4096)
+def wrap_text(text: str, width: int) -> str:
+    """textwrap.fill mémoïsé : les mêmes phrases reviennent d'une vidéo à l'autre."""
+    return textwrap.fill(text, width=width)
 
 
 # --------------------------------------------------------------
 # 1️⃣  Splitter le texte du prof en plusieurs "slides" (INCHANGÉ)
 # --------------------------------------------------------------
-def split_script_to_slides(script: str, max_chars_per_slide: int = 700) -> List[str]:
-    """Divise un script en plusieurs diapositives selon la longueur."""
+def split_script_to_slides(script: str, max_chars_per_slide: int = 700, max_slides: int = 40) -> List[str]:
+    """Divise un script en plusieurs diapositives selon la longueur (au plus `max_slides`, 0 = sans limite)."""
     script = script.replace("\r\n", "\n").strip()
     if not script:
         return []
@@ -52,14 +95,15 @@ def split_script_to_slides(script: str, max_chars_per_slide: int = 700) -> List[
                 if len(cur) + len(s) + 1 <= max_chars_per_slide:
                     cur += (" " + s + ".")
                 else:
-                    slides.append(cur.strip())
+                    if cur:
+                        slides.append(cur.strip())
                     cur = s + "."
             if cur:
                 slides.append(cur.strip())
 
     # Si trop de slides, les regrouper
-    if len(slides) > 40:
-        ratio = math.ceil(len(slides) / 40)
+    if max_slides and len(slides) > max_slides:
+        ratio = math.ceil(len(slides) / max_slides)
         new = []
         for i in range(0, len(slides), ratio):
             new.append(" ".join(slides[i:i + ratio]))
@@ -69,29 +113,72 @@ def split_script_to_slides(script: str, max_chars_per_slide: int = 700) -> List[
 
 
 # --------------------------------------------------------------
-# 2️⃣  Rendre le texte d’une slide sous forme d’image (INCHANGÉ)
+# 2️⃣  Rendre le texte d’une slide sous forme d’image (en mémoire)
 # --------------------------------------------------------------
-def render_text_slide(text: str, out_path: str, title: str = None):
-    """Crée une image à partir du texte, avec Pillow (PIL)."""
-    img = Image.new('RGB', VIDEO_SIZE, color=BG_COLOR)
+@lru_cache(maxsize=64)
+def _title_strip(title: str, profile):
+    """Bandeau de titre rendu une fois : (image pleine largeur, marge haute, décalage du texte qui suit)."""
+    font = title_font(profile)
+    font_size = profile.scaled(FONT_SIZE)
+    title_box = font.getbbox(title)
+    pad = font_size // 2  # marge pour les accents et jambages qui dépassent
+    strip = Image.new('RGB', (profile.width, title_box[3] + 2 * pad), color=BG_COLOR)
+    # Ancre 'ma' = milieu horizontal ('m'), haut vertical ('a' pour ascender)
+    ImageDraw.Draw(strip).text((profile.width / 2, pad), title, font=font, fill=TEXT_COLOR, anchor="ma")
+    # Estimer la hauteur du titre pour descendre
+    return strip, pad, (title_box[3] - title_box[1]) + int(font_size * 0.75)
+
+
+@lru_cache(maxsize=16)
+def _render_slide_array(text: str, title: str, profile) -> np.ndarray:
+    # Un cœur du budget CPU, seulement quand la slide n'est pas déjà en mémoire
+    with reserve("slides", 1):
+        return _draw_slide(text, title, profile)
+
+
+def _draw_slide(text: str, title: str, profile) -> np.ndarray:
+    img = Image.new('RGB', profile.size, color=BG_COLOR)
     draw = ImageDraw.Draw(img)
 
-    margin_x = int(VIDEO_SIZE[0] * 0.05) # 5% de marge
-    current_y = int(VIDEO_SIZE[1] * 0.1) # 10% du haut
+    margin_x = int(profile.width * 0.05) # 5% de marge
+    current_y = int(profile.height * 0.1) # 10% du haut
 
     if title:
-        # Ancre 'ma' = milieu horizontal ('m'), haut vertical ('a' pour ascender)
-        draw.text((VIDEO_SIZE[0] / 2, current_y), title, font=TITLE_FONT, fill=TEXT_COLOR, anchor="ma")
-        # Estimer la hauteur du titre pour descendre
-        title_box = TITLE_FONT.getbbox(title)
-        current_y += (title_box[3] - title_box[1]) + int(FONT_SIZE * 0.75)
+        strip, pad, advance = _title_strip(title, profile)
+        img.paste(strip, (0, current_y - pad))
+        current_y += advance
 
-    wrapped = textwrap.fill(text, width=60)
+    wrapped = wrap_text(text, 60)
 
     # Ancre 'la' = gauche horizontal ('l'), haut vertical ('a')
-    draw.text((margin_x, current_y), wrapped, font=MAIN_FONT, fill=TEXT_COLOR, spacing=LINE_SPACING, anchor="la")
+    draw.text((margin_x, current_y), wrapped, font=main_font(profile), fill=TEXT_COLOR,
+              spacing=profile.scaled(LINE_SPACING), anchor="la")
+
+    frame = np.asarray(img)
+    frame.flags.writeable = False
+    return frame
 
-    img.save(out_path)
+
+def render_slide_array(text: str, title: str = None, profile=None) -> np.ndarray:
+    """
+    Rend une slide directement en tableau uint8 (H, W, 3), sans aller-retour PNG, à la taille du profil.
+    Le résultat est mémoïsé et en lecture seule : il est partagé entre segments identiques.
+    """
+    return _render_slide_array(text, title, get_profile(profile))
+
+
+def render_text_slide(text: str, out_path: str, title: str = None, profile=None):
+    """Crée une image PNG à partir du texte (pour les étapes qui ont besoin d'un fichier)."""
+    Image.fromarray(render_slide_array(text, title, profile)).save(out_path)
+
+
+def render_slide(text: str, out_path: str = None, title: str = None, profile=None):
+    """Slide en mémoire (tableau) si `out_path` est None, sinon PNG sur disque ; renvoie l'un ou l'autre."""
+    with span("render_slide"):
+        if out_path is None:
+            return render_slide_array(text, title, profile)
+        render_text_slide(text, out_path, title=title, profile=profile)
+        return out_path
 
 
 # --------------------------------------------------------------
@@ -103,7 +190,7 @@ def create_slides_from_script(script: str, title: str = None, tmp_dir: str = Non
         return []
 
     if tmp_dir is None:
-        tmp_dir = tempfile.mkdtemp(prefix="slides_")
+        tmp_dir = temp_dir(prefix="slides_", ram=True)
     else:
         Path(tmp_dir).mkdir(parents=True, exist_ok=True)
 
@@ -122,89 +209,436 @@ def split_to_sentences(text: str) -> List[str]:
     sentences = [s + "." for s in parts if s]
     return sentences
 
+
+class SentenceSplitter:
+    """
+    Version incrémentale de split_to_sentences pour un texte qui arrive par morceaux :
+    feed() renvoie les phrases terminées dès leur ponctuation finale, close() le reste.
+    La suite des phrases émises est celle de split_to_sentences sur le texte complet.
+    """
+
+    def __init__(self):
+        self._buf = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buf += text
+        sentences = []
+        start = 0
+        for i, ch in enumerate(self._buf):
+            if ch in ".?!":
+                part = self._buf[start:i].strip()
+                if part:
+                    sentences.append(part + ".")
+                start = i + 1
+        self._buf = self._buf[start:]
+        return sentences
+
+    def close(self) -> List[str]:
+        part, self._buf = self._buf.strip(), ""
+        return [part + "."] if part else []
+
+
+# Granularité des segments : "sentence" (une slide et un audio par phrase, synchronisation fine)
+# ou "paragraph" (une slide et un audio par paragraphe, voir split_script_to_slides) : bien
+# moins de segments, d'appels TTS et de clips pour les longs scripts narratifs
+GRANULARITIES = ("sentence", "paragraph")
+DEFAULT_GRANULARITY = os.environ.get("VIDEO_GRANULARITY", "sentence")
+# Taille maximale d'une slide de paragraphe (au-delà, découpe aux frontières de phrases)
+PARAGRAPH_MAX_CHARS = int(os.environ.get("PARAGRAPH_MAX_CHARS", "500"))
+
+
+def resolve_granularity(granularity: str = None) -> str:
+    """Nom de granularité validé ; None = VIDEO_GRANULARITY."""
+    name = str(granularity or DEFAULT_GRANULARITY).lower()
+    if name not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity} (expected one of {', '.join(GRANULARITIES)})")
+    return name
+
+
+def split_to_units(text: str, granularity: str = None) -> List[str]:
+    """Textes des segments du script : phrases ou paragraphes selon la granularité."""
+    if resolve_granularity(granularity) == "paragraph":
+        # Pas de regroupement au-delà de 40 slides : chaque slide doit rester lisible
+        return split_script_to_slides(text, PARAGRAPH_MAX_CHARS, max_slides=0)
+    return split_to_sentences(text)
+
+
 # --------------------------------------------------------------
-# 4️⃣  CRÉATION DES SEGMENTS (INCHANGÉ)
+# 4️⃣  CRÉATION DES SEGMENTS (séquentielle ou parallèle)
 # --------------------------------------------------------------
-def create_sentence_segments(script_text: str, title: str = None, tmp_dir: str = None, explanations: List[str] = None, explanations_display: List[bool] = None):
+# Nombre de workers par défaut (1 = séquentiel) et type de pool ("thread" ou "process")
+SEGMENT_WORKERS = int(os.environ.get("SEGMENT_WORKERS", "1"))
+SEGMENT_EXECUTOR = os.environ.get("SEGMENT_EXECUTOR", "thread")
+
+
+def _new_wav_path(tmp_dir: str = None) -> str:
+    if tmp_dir is None:
+        # Workspace du job en cours (RAM si disponible), sinon répertoire temporaire système
+        return temp_file(suffix=".wav", prefix="tts_")
+    atmp = tempfile.NamedTemporaryFile(delete=False, suffix=".wav", dir=tmp_dir)
+    path = atmp.name
+    atmp.close()
+    return path
+
+
+def _audio_duration(audio_path: str) -> float:
+    # Lecture de l'en-tête WAV ; moviepy (un processus ffmpeg) seulement pour les autres formats
+    try:
+        dur = wav_duration(audio_path)
+    except Exception:
+        try:
+            with _mpy().AudioFileClip(audio_path) as aclip:
+                dur = float(aclip.duration)
+        except Exception:
+            dur = 1.5 # Sécurité
+    if dur <= 0 or math.isnan(dur): dur = 1.5
+    return dur
+
+
+def _synthesize_timed(text: str, audio_path: str) -> float:
+    """TTS (via le cache audio) puis lecture de la durée. Fonction de module : utilisable par un ProcessPool."""
+    synthesize_audio_cached(text, audio_path)
+    return _audio_duration(audio_path)
+
+
+def _synthesize_plan(plan) -> list:
+    """
+    TTS groupé (tts_engine.synthesize_many) des phrases et explications d'une partie du plan ;
+    renvoie (durée phrase, durée explication) par élément. Fonction de module : utilisable par un ProcessPool.
+    """
+    texts, paths = [], []
+    for p in plan:
+        texts.append(p["text"])
+        paths.append(p["s_audio"])
+        if p["exp_text"]:
+            texts.append(p["exp_text"])
+            paths.append(p["e_audio"])
+    durations = {path: dur if dur is not None else _audio_duration(path)
+                 for path, dur in synthesize_many(texts, paths)}
+    return [(durations[p["s_audio"]], durations[p["e_audio"]] if p["exp_text"] else 0.0) for p in plan]
+
+
+def _tts_chunks(plan):
+    """Découpe le plan en groupes de TTS_BATCH_SIZE phrases (un appel TTS groupé par groupe)."""
+    size = max(1, TTS_BATCH_SIZE)
+    return [plan[i:i + size] for i in range(0, len(plan), size)]
+
+
+def explanation_for(idx: int, explanations, explanations_display):
+    """(texte, flag d'affichage) de l'explication associée à la phrase `idx`."""
+    exp_text = explanations[idx] if idx < len(explanations) else None
+    exp_show = None
+    if idx < len(explanations_display):
+        try: exp_show = bool(explanations_display[idx])
+        except Exception: exp_show = None
+    return exp_text, exp_show
+
+
+def _plan_segments(sentences, tmp_dir, explanations, explanations_display, only=None, in_memory=False):
+    """
+    Prépare, pour chaque phrase, les chemins de sortie et les métadonnées d'explication.
+    `only` restreint le plan à certains indices (les autres segments sont déjà disponibles) ;
+    avec `in_memory`, les slides restent des tableaux (pas de PNG).
+    """
+    plan = []
+    for idx, s in enumerate(sentences):
+        if only is not None and idx not in only:
+            continue
+        exp_text, exp_show = explanation_for(idx, explanations, explanations_display)
+        plan.append({
+            "idx": idx,
+            "text": s,
+            "img_path": None if in_memory else os.path.join(tmp_dir, f"sent_{idx:03d}.png"),
+            "s_audio": _new_wav_path(),
+            "exp_text": exp_text,
+            "e_audio": _new_wav_path() if exp_text else None,
+            "exp_show": exp_show,
+        })
+    return plan
+
+
+def _discard_audio(plan):
+    for p in plan:
+        for key in ("s_audio", "e_audio"):
+            try:
+                if p[key]: os.remove(p[key])
+            except OSError:
+                pass
+
+
+# Pool de processus partagé par toutes les requêtes : créé au premier rendu "process", chaque
+# worker charge le modèle TTS une seule fois (registre chaud) au lieu d'un pool neuf par vidéo
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def _init_segment_process():
+    from tts_engine import preload_models
+    preload_models([os.environ["TTS_BACKEND"]] if os.environ.get("TTS_BACKEND") else None)
+
+
+def segment_process_pool(workers: int = None) -> ProcessPoolExecutor:
+    """
+    Pool de processus des segments, créé au premier appel avec max(SEGMENT_WORKERS, workers)
+    processus bornés par le budget CPU ; les appels suivants le réutilisent tel quel.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            size = max(1, min(max(SEGMENT_WORKERS, int(workers or 0)), CPU_BUDGET))
+            _process_pool = ProcessPoolExecutor(max_workers=size, mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=_init_segment_process)
+        return _process_pool
+
+
+def _drop_process_pool(pool):
+    """Oublie un pool cassé (worker tué) : le prochain rendu en recrée un."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_segments_parallel(plan, title, workers, executor, progress=None):
+    """
+    Lance le rendu des slides et le TTS (par groupes de phrases et d'explications, voir
+    _tts_chunks) de toutes les phrases en parallèle. Renvoie (slide, durée phrase, durée explication)
+    dans l'ordre du plan ; à la première erreur, le travail restant est annulé et l'exception est propagée.
+    """
+    shared = executor == "process"
+    if shared:
+        pool = segment_process_pool(workers)
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="segment")
+
+    jobs = []
+    chunks = _tts_chunks(plan)
+    total = len(plan) + len(chunks)
+    completed = [0]
+    counter_lock = threading.Lock()
+
+    def _tick(_future):
+        with counter_lock:
+            completed[0] += 1
+            done = completed[0]
+        if progress: progress("segments", done, total)
+
+    check_quota()
+
+    # Les threads du pool n'héritent pas du contexte : on y propage la trace de la requête
+    # (avec un pool de processus, les mesures restent dans les processus fils)
+    bind = bind_context if executor != "process" else (lambda fn: fn)
+    profile = get_profile()  # passé explicitement : un processus fils ne voit pas le contexte
+
+    try:
+        # TTS d'abord : c'est le chemin critique, les slides remplissent les workers restants
+        for chunk in chunks:
+            jobs.append(pool.submit(bind(_synthesize_plan), chunk))
+        for p in plan:
+            jobs.append(pool.submit(bind(render_slide), p["text"], p["img_path"], title if p["idx"] == 0 else None, profile))
+        for f in jobs:
+            f.add_done_callback(_tick)
+
+        done, _ = wait(jobs, return_when=FIRST_EXCEPTION)
+        for f in done:
+            if f.exception() is not None:
+                raise f.exception()
+
+        durations = [d for f in jobs[:len(chunks)] for d in f.result()]
+        images = [f.result() for f in jobs[len(chunks):]]
+        results = [(img, s_dur, e_dur) for img, (s_dur, e_dur) in zip(images, durations)]
+    except BaseException as e:
+        for f in jobs:
+            f.cancel()
+        if not shared:
+            pool.shutdown(wait=True, cancel_futures=True)
+        elif isinstance(e, BrokenProcessPool):
+            _drop_process_pool(pool)
+        else:
+            wait(jobs)  # le pool partagé continue : on attend seulement les tâches déjà lancées
+        raise
+    if not shared:
+        pool.shutdown(wait=True)
+    return results
+
+
+def create_sentence_segments(script_text: str, title: str = None, tmp_dir: str = None, explanations: List[str] = None, explanations_display: List[bool] = None, workers: int = None, executor: str = None, progress=None, in_memory: bool = False, granularity: str = None):
     """
     Renvoie les chemins et les durées pour l'audio de la phrase ET l'audio de l'explication.
+    Avec granularity="paragraph", un segment par paragraphe (voir split_to_units).
+    Avec `in_memory`, le premier élément de chaque segment est la slide en tableau uint8 (pas de PNG).
+    Avec workers > 1, toutes les phrases sont produites en parallèle (pool de threads ou de
+    processus selon `executor`) ; l'ordre des segments renvoyés reste celui du script.
+    `progress(stage, done, total)` est appelé au fil de l'avancement (étape "segments").
     """
-    sentences = split_to_sentences(script_text)
+    sentences = split_to_units(script_text, granularity)
     if not sentences:
         return []
-    if tmp_dir is None:
-        tmp_dir = tempfile.mkdtemp(prefix="slides_sent_")
+    if in_memory:
+        tmp_dir = None
+    elif tmp_dir is None:
+        tmp_dir = temp_dir(prefix="slides_sent_", ram=True)
     else:
         Path(tmp_dir).mkdir(parents=True, exist_ok=True)
 
-    explanations = explanations or []
-    explanations_display = explanations_display or []
-    segments = []
+    plan = _plan_segments(sentences, tmp_dir, explanations or [], explanations_display or [], in_memory=in_memory)
+    return produce_segments(plan, title=title, workers=workers, executor=executor, progress=progress)
 
-    for idx, s in enumerate(sentences):
-        # 1. Générer l'image (rapide)
-        img_path = os.path.join(tmp_dir, f"sent_{idx:03d}.png")
-        render_text_slide(s, img_path, title=title if idx == 0 else None)
 
-        # 2. Générer l'audio de la phrase (lent)
-        atmp = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        s_audio_path = atmp.name
-        atmp.close()
-        synthesize_audio(s, s_audio_path)
+def produce_segments(plan, title: str = None, workers: int = None, executor: str = None, progress=None):
+    """Rend les slides et synthétise les audios d'un plan (voir _plan_segments) ; renvoie les tuples de segment."""
+    workers = SEGMENT_WORKERS if workers is None else int(workers)
+    executor = executor or SEGMENT_EXECUTOR
+    try:
+        with span("segments"):
+            if workers > 1:
+                results = _run_segments_parallel(plan, title, workers, executor, progress)
+            else:
+                results = []
+                if progress: progress("segments", 0, len(plan))
+                for chunk in _tts_chunks(plan):
+                    # 1. Audio des phrases et des explications du groupe (cache audio consulté d'abord,
+                    #    puis un seul appel TTS groupé pour les manquants) et leurs durées
+                    durations = _synthesize_plan(chunk)
+                    for p, (s_dur, e_dur) in zip(chunk, durations):
+                        # 2. Générer l'image (rapide, en mémoire si le plan n'a pas de chemin)
+                        img = render_slide(p["text"], p["img_path"], title=title if p["idx"] == 0 else None)
+                        results.append((img, s_dur, e_dur))
+                    check_quota()
+                    if progress: progress("segments", len(results), len(plan))
+    except BaseException:
+        _discard_audio(plan)
+        raise
+
+    # Stocker TOUTES les informations, dans l'ordre des phrases
+    return [
+        (img, p["s_audio"], s_dur, p["e_audio"], e_dur, p["exp_text"], p["exp_show"])
+        for p, (img, s_dur, e_dur) in zip(plan, results)
+    ]
 
-        # 3. Obtenir la durée de l'audio de la phrase
-        try:
-            with mpy.AudioFileClip(s_audio_path) as aclip:
-                s_dur = float(aclip.duration)
-        except Exception:
-            s_dur = 1.5 # Sécurité
-        if s_dur <= 0 or math.isnan(s_dur): s_dur = 1.5
-
-        # 4. Gérer l'explication (si elle existe)
-        e_audio_path = None
-        e_dur = 0.0
-        exp_text = explanations[idx] if idx < len(explanations) else None
-
-        if exp_text:
-            # 4a. Générer l'audio de l'explication (lent)
-            etmp = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-            e_audio_path = etmp.name
-            etmp.close()
-            synthesize_audio(exp_text, e_audio_path)
-
-            # 4b. Obtenir la durée de l'audio de l'explication
-            try:
-                with mpy.AudioFileClip(e_audio_path) as eclip:
-                    e_dur = float(eclip.duration)
-            except Exception:
-                e_dur = 1.5 # Sécurité
-            if e_dur <= 0 or math.isnan(e_dur): e_dur = 1.5
 
-        # 5. Gérer le flag d'affichage
-        exp_show = None
-        if idx < len(explanations_display):
-            try: exp_show = bool(explanations_display[idx])
-            except Exception: exp_show = None
+# --------------------------------------------------------------
+# Panneaux d'explication (partagés par les moteurs de rendu)
+# --------------------------------------------------------------
+def should_show_explanation(exp_text, exp_show, show_explanations_text: bool) -> bool:
+    """Le flag par segment l'emporte sur le réglage global."""
+    if not exp_text:
+        return False
+    if exp_show is None:
+        return bool(show_explanations_text)
+    return bool(exp_show)
+
+
+def split_explanation(exp_text: str) -> List[str]:
+    parts = [p.strip() for p in exp_text.replace("?", ".").replace("!", ".").split(".")]
+    return [p for p in parts if p] or [exp_text]
+
+
+def explanation_windows(exp_text: str, e_dur: float):
+    """(sous-phrase, début, durée) de chaque panneau, relatif au début de l'explication."""
+    subs = split_explanation(exp_text)
+    per_dur = e_dur / len(subs)
+    return [(sub, i * per_dur, per_dur) for i, sub in enumerate(subs)]
+
+
+def explanation_panel_box(size=None):
+    """Rectangle (x0, y0, x1, y1) du panneau : 80% de large, 40% de haut, centré (taille du profil par défaut)."""
+    size = size or get_profile().size
+    panel_height_ratio = 0.4
+    panel_y_ratio = 0.3
+    panel_width_ratio = 0.8
+    panel_x_ratio = (1 - panel_width_ratio) / 2
+    x0 = int(size[0] * panel_x_ratio)
+    y0 = int(size[1] * panel_y_ratio)
+    x1 = x0 + int(size[0] * panel_width_ratio)
+    y1 = y0 + int(size[1] * panel_height_ratio)
+    return x0, y0, x1, y1
+
+
+@lru_cache(maxsize=8)
+def _panel_background(overlay_opacity: float, size) -> Image.Image:
+    img = Image.new('RGBA', size, (255, 255, 255, 0))
+    x0, y0, x1, y1 = explanation_panel_box(size)
+    alpha = int(overlay_opacity * 255)
+    ImageDraw.Draw(img).rectangle([x0, y0, x1, y1], fill=(0, 0, 0, alpha))
+    return img
+
+
+def explanation_panel_image(sub: str, overlay_opacity: float = 0.35, profile=None) -> Image.Image:
+    """Dessine le panneau semi-transparent (RGBA, plein cadre) d'une sous-phrase d'explication."""
+    profile = get_profile(profile)
+    img = _panel_background(overlay_opacity, profile.size).copy()
+    draw = ImageDraw.Draw(img)
+    x0, y0, x1, y1 = explanation_panel_box(profile.size)
+    sub_wrapped = wrap_text(sub, 55)
+    center_x = x0 + (x1 - x0) / 2
+    center_y = y0 + (y1 - y0) / 2
+    draw.text((center_x, center_y), sub_wrapped, font=exp_font(profile),
+              fill=TEXT_COLOR, spacing=profile.scaled(LINE_SPACING),
+              anchor="mm", align="center")
+    return img
+
+
+def render_explanation_panel(sub: str, out_path: str, overlay_opacity: float = 0.35, profile=None):
+    """Enregistre le panneau d'explication en PNG (moteur ffmpeg)."""
+    explanation_panel_image(sub, overlay_opacity, profile).save(out_path)
+
+
+def segment_compositor(img_path, s_dur: float, e_dur: float, exp_text, exp_show, show_explanations_text: bool = False, style: dict = None) -> SegmentCompositor:
+    """Prépare le compositeur uint8 d'un segment : slide + fondus + panneaux d'explication zoomés."""
+    style = style or {}
+    overlay_opacity = float(style.get("overlay_opacity", 0.35))
+    zoom_strength = float(style.get("zoom_strength", 0.03))
+
+    if isinstance(img_path, np.ndarray):
+        base = img_path
+    else:
+        with Image.open(img_path) as im:
+            base = np.asarray(im.convert("RGB"))
+
+    overlays = []
+    if should_show_explanation(exp_text, exp_show, show_explanations_text):
+        for sub, start, per_dur in explanation_windows(exp_text, e_dur):
+            panel = np.asarray(explanation_panel_image(sub, overlay_opacity))
+            overlays.append(PanelOverlay(panel, s_dur + start, per_dur, zoom_strength=zoom_strength))
 
-        # 6. Stocker TOUTES les informations
-        segments.append((img_path, s_audio_path, s_dur, e_audio_path, e_dur, exp_text, exp_show))
+    return SegmentCompositor(base, s_dur + e_dur, overlays)
 
-    return segments
 
 #
 # --------------------------------------------------------------
 # 5️⃣  ASSEMBLAGE VIDÉO (MODIFIÉ : method="chain")
 # --------------------------------------------------------------
 #
-def assemble_synced_video(segments, output_path: str, show_explanations_text: bool = False, style: dict = None):
+def _encode_soundtrack(wav_path: str, out_path: str, bitrate: str = "128k") -> str:
+    """Encode la bande son en AAC : moviepy la multiplexe ensuite telle quelle (-acodec copy)."""
+    from moviepy.config import get_setting
+    cmd = [get_setting("FFMPEG_BINARY"), "-y", "-hide_banner", "-loglevel", "error",
+           "-i", wav_path, "-c:a", "aac", "-b:a", bitrate, "-ar", "44100", "-ac", "2", out_path]
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({proc.returncode}): {proc.stderr.decode('utf-8', 'replace')[-2000:]}")
+    return out_path
+
+
+def assemble_synced_video(segments, output_path: str, show_explanations_text: bool = False, style: dict = None, chunk_size: int = None):
     """
-    MODIFIÉ : Le correctif 'astype('uint8')' est déplacé à la TOUTE FIN
-    de la création du segment, APRES les fondus et les superpositions.
+    Avec `chunk_size` (défaut ASSEMBLY_CHUNK_SIZE), un script plus long est assemblé par
+    morceaux (voir assemble_in_chunks) : clips et fichiers ouverts restent bornés.
+    Les images de chaque segment sont produites directement en uint8 par le compositeur
+    (fondus, zoom et panneaux d'explication), sans passer par des frames float64.
+    L'audio n'est plus un CompositeAudioClip par segment : toute la bande son est assemblée
+    en un seul buffer PCM (wav_audio.build_soundtrack) et multiplexée à l'encodage.
+    Résolution, fps, preset et threads viennent du profil d'encodage actif (profiles.py).
     """
     style = style or {}
-    overlay_opacity = float(style.get("overlay_opacity", 0.35))
-    zoom_strength = float(style.get("zoom_strength", 0.03))
-
+    chunk_size = ASSEMBLY_CHUNK_SIZE if chunk_size is None else int(chunk_size)
+    if chunk_size and len(segments) > chunk_size and _can_concat():
+        chunks = (segments[i:i + chunk_size] for i in range(0, len(segments), chunk_size))
+        return assemble_in_chunks(chunks, output_path, show_explanations_text, style, renderer="moviepy")
+    profile = get_profile()
+    mpy = _mpy()
     clips = []
 
     # Unpack les données de segment
@@ -212,92 +646,9 @@ def assemble_synced_video(segments, output_path: str, show_explanations_text: bo
 
         total_dur = s_dur + e_dur # Durée totale de ce segment
 
-        # 1. Créer le clip vidéo de base (sans la correction ici)
-        base_clip = mpy.ImageClip(img_path).set_duration(total_dur)
-
-        # 2. Appliquer les fondus (ceci convertit en float64)
-        animated = base_clip.fx(mpy.vfx.fadein, 0.3).fx(mpy.vfx.fadeout, 0.3)
-
-        # 3. Préparer les clips audio (inchangé)
-        audioclips = []
-        s_aclip = mpy.AudioFileClip(s_audio)
-        audioclips.append(s_aclip)
-
-        if e_audio:
-            e_aclip = mpy.AudioFileClip(e_audio).set_start(s_dur)
-            audioclips.append(e_aclip)
-
-        final_audio = mpy.CompositeAudioClip(audioclips)
-        clip = animated.set_audio(final_audio) # 'clip' est maintenant en float64
-
-        # 4. Gérer l'overlay (si nécessaire) (inchangé)
-        show_this_exp = False
-        if exp_text:
-            if exp_show is None:
-                show_this_exp = bool(show_explanations_text)
-            else:
-                show_this_exp = bool(exp_show)
-
-        if show_this_exp:
-            parts = [p.strip() for p in exp_text.replace("?", ".").replace("!", ".").split(".")]
-            exp_sentences = [p for p in parts if p]
-            if not exp_sentences:
-                exp_sentences = [exp_text]
-
-            n = len(exp_sentences)
-            per_dur = (e_dur / n) if n > 0 else e_dur
-            exp_subclips = []
-
-            for i, sub in enumerate(exp_sentences):
-                exp_img_tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-                exp_img_path = exp_img_tmp.name
-                exp_img_tmp.close()
-
-                # ... (Logique de dessin Pillow inchangée) ...
-                img = Image.new('RGBA', VIDEO_SIZE, (255, 255, 255, 0))
-                draw = ImageDraw.Draw(img)
-                panel_height_ratio = 0.4
-                panel_y_ratio = 0.3
-                panel_width_ratio = 0.8
-                panel_x_ratio = (1 - panel_width_ratio) / 2
-                x0 = int(VIDEO_SIZE[0] * panel_x_ratio)
-                y0 = int(VIDEO_SIZE[1] * panel_y_ratio)
-                x1 = x0 + int(VIDEO_SIZE[0] * panel_width_ratio)
-                y1 = y0 + int(VIDEO_SIZE[1] * panel_height_ratio)
-                alpha = int(overlay_opacity * 255)
-                draw.rectangle([x0, y0, x1, y1], fill=(0, 0, 0, alpha))
-                sub_wrapped = textwrap.fill(sub, width=55)
-                center_x = x0 + (x1 - x0) / 2
-                center_y = y0 + (y1 - y0) / 2
-                draw.text((center_x, center_y), sub_wrapped, font=EXP_FONT,
-                          fill=TEXT_COLOR, spacing=LINE_SPACING,
-                          anchor="mm", align="center")
-                img.save(exp_img_path)
-
-                sub_clip = mpy.ImageClip(exp_img_path).set_duration(per_dur)
-                sub_clip = sub_clip.set_position(("center", "center"))
-
-                def sub_zoom(t, _pd=per_dur):
-                    return 1.0 + zoom_strength * (t / max(_pd, 1e-6))
-                sub_clip = sub_clip.resize(lambda t: sub_zoom(t))
-                sub_clip = sub_clip.fx(mpy.vfx.fadein, 0.15).fx(mpy.vfx.fadeout, 0.15)
-                exp_subclips.append(sub_clip)
-
-            if exp_subclips:
-                exp_seq = mpy.concatenate_videoclips(exp_subclips, method="compose") # 'compose' est OK ici
-                exp_seq = exp_seq.set_start(s_dur).set_duration(e_dur)
-                exp_seq = exp_seq.fl_image(lambda pic: pic.astype('uint8'))
-
-                # 'clip' est le composite, il est définitivement en float64
-                clip = mpy.CompositeVideoClip([clip, exp_seq], size=VIDEO_SIZE).set_duration(total_dur).set_audio(final_audio)
-
-        # --------------------------------------------------------------
-        # MODIFICATION FINALE : LE NOUVEAU CORRECTIF
-        # --------------------------------------------------------------
-        clip = clip.fl_image(lambda pic: pic.astype('uint8'))
-        # --------------------------------------------------------------
-
-        clips.append(clip)
+        # Slide, fondus et overlays (si nécessaire) : un seul clip uint8, sans audio
+        comp = segment_compositor(img_path, s_dur, e_dur, exp_text, exp_show, show_explanations_text, style)
+        clips.append(mpy.VideoClip(comp.make_frame, duration=total_dur))
 
     if not clips:
         raise ValueError("Aucune diapositive trouvée.")
@@ -308,27 +659,107 @@ def assemble_synced_video(segments, output_path: str, show_explanations_text: bo
     video = mpy.concatenate_videoclips(clips, method="chain")
     # --------------------------------------------------------------
 
-    video.write_videofile(
-        output_path,
-        fps=24,
-        codec="libx264",
-        audio_codec="aac",
-        threads=4,
-        preset="medium",
-        verbose=False,
-        logger=None,
-    )
-    # Fermeture de TOUS les clips audio
-    for c in clips:
-        try:
-            if c.audio: c.audio.close()
-        except Exception: pass
-        try: c.close()
-        except Exception: pass
+    # Bande son unique : WAV contigu (silences + rééchantillonnage) puis AAC
+    soundtrack_wav = _new_wav_path()
+    soundtrack_aac = os.path.splitext(soundtrack_wav)[0] + ".m4a"
+    try:
+        with span("soundtrack"):
+            build_soundtrack(segments, soundtrack_wav)
+            _encode_soundtrack(soundtrack_wav, soundtrack_aac, profile.audio_bitrate)
+        # Composition des images et encodage x264 sont entrelacés : une seule étape mesurée
+        t0 = time.perf_counter()
+        with span("composite_encode"), reserve("encode", profile.encoder_threads()) as threads:
+            video.write_videofile(
+                output_path,
+                fps=profile.fps,
+                codec="libx264",
+                audio=soundtrack_aac,
+                threads=threads,
+                preset=profile.preset,
+                ffmpeg_params=profile.ffmpeg_params() + faststart_params(),
+                verbose=False,
+                logger=None,
+            )
+        report_encode_speed(profile, "moviepy", video.duration, time.perf_counter() - t0)
+    finally:
+        for c in clips:
+            try: c.close()
+            except Exception: pass
+        for p in (soundtrack_wav, soundtrack_aac):
+            try: os.remove(p)
+            except OSError: pass
+
+    return output_path
 
+
+# --------------------------------------------------------------
+# Conteneur MP4 des vidéos produites
+# --------------------------------------------------------------
+# MP4_FASTSTART=1 : atome moov en tête de fichier, la lecture commence avant la fin du téléchargement
+MP4_FASTSTART = os.environ.get("MP4_FASTSTART", "1") == "1"
+
+
+def faststart_params() -> list:
+    """Options ffmpeg du conteneur de sortie (moviepy `ffmpeg_params` / concat_segments)."""
+    return ["-movflags", "+faststart"] if MP4_FASTSTART else []
+
+
+# --------------------------------------------------------------
+# Assemblage par morceaux (scripts très longs)
+# --------------------------------------------------------------
+# Nombre de segments encodés par fichier intermédiaire (0 = tout le script d'un coup, défaut).
+# Compromis : la mémoire reste bornée quelle que soit la longueur du script, mais chaque jointure
+# arrondit la piste audio à sa trame AAC et le décalage audio/vidéo s'accumule (~0,17 s sur
+# 150 phrases). À activer seulement pour les scripts qui ne tiennent pas en mémoire.
+ASSEMBLY_CHUNK_SIZE = int(os.environ.get("ASSEMBLY_CHUNK_SIZE", "0"))
+
+
+def _can_concat() -> bool:
+    from ffmpeg_renderer import ffmpeg_available
+    return ffmpeg_available()
+
+
+def assemble_in_chunks(segment_chunks, output_path: str, show_explanations_text: bool = False, style: dict = None, renderer: str = None, progress=None, total_chunks: int = None):
+    """
+    Encode chaque morceau de segments (itérable de listes, éventuellement produites à la demande)
+    dans un MP4 intermédiaire, en fermant ses clips avant de passer au suivant, puis joint les
+    intermédiaires sans ré-encodage (concat demuxer). Mémoire et descripteurs ouverts ne
+    dépendent que de la taille d'un morceau, pas de la longueur du script.
+    """
+    from ffmpeg_renderer import concat_segments
+    work_dir = temp_dir(prefix="chunks_")
+    parts = []
+    try:
+        for k, chunk in enumerate(segment_chunks):
+            part = os.path.join(work_dir, f"chunk_{k:04d}.mp4")
+            with span("encode_chunk"):
+                render_video(chunk, part, show_explanations_text=show_explanations_text, style=style,
+                             renderer=renderer, chunk_size=0)
+            parts.append(part)
+            check_quota()
+            if progress: progress("encode", k + 1, total_chunks)
+        if not parts:
+            raise ValueError("Aucune diapositive trouvée.")
+        concat_segments(parts, output_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
     return output_path
 
 
+def _segment_chunks(sentences, chunk_size, title, explanations, explanations_display, workers=None, executor=None, progress=None):
+    """Produit les segments `chunk_size` phrases à la fois ; les WAV d'un morceau sont supprimés une fois consommé."""
+    for start in range(0, len(sentences), chunk_size):
+        plan = _plan_segments(sentences, None, explanations, explanations_display,
+                              only=set(range(start, start + chunk_size)), in_memory=True)
+        segments = produce_segments(plan, title=title, workers=workers, executor=executor)
+        if progress: progress("segments", start + len(plan), len(sentences))
+        try:
+            yield segments
+        finally:
+            del segments
+            _discard_audio(plan)
+
+
 # --------------------------------------------------------------
 # 4️⃣  Assembler (Fonction dépréciée, MODIFIÉE)
 # --------------------------------------------------------------
@@ -336,6 +767,7 @@ def assemble_video_from_slides_and_audio(image_paths: List[str], audio_path: str
     """Crée la vidéo à partir des slides et de l’audio généré."""
     if not image_paths:
         raise ValueError("Aucune diapositive trouvée.")
+    mpy = _mpy()
     audio_clip = mpy.AudioFileClip(audio_path)
     audio_duration = float(audio_clip.duration)
     num_slides = len(image_paths)
@@ -344,13 +776,14 @@ def assemble_video_from_slides_and_audio(image_paths: List[str], audio_path: str
     if math.isnan(per_slide_dur) or per_slide_dur <= 0:
         per_slide_dur = 2.0  # durée minimale par slide
 
+    profile = get_profile()
     clips = []
     for img in image_paths:
         clip_img = mpy.ImageClip(img).set_duration(per_slide_dur)
-        clip_img = clip_img.resize(height=VIDEO_SIZE[1])
-        bg = mpy.ColorClip(size=VIDEO_SIZE, color=BG_COLOR).set_duration(per_slide_dur)
+        clip_img = clip_img.resize(height=profile.height)
+        bg = mpy.ColorClip(size=profile.size, color=BG_COLOR).set_duration(per_slide_dur)
         clip_img = clip_img.set_position(('center', 'center'))
-        clip = mpy.CompositeVideoClip([bg, clip_img], size=VIDEO_SIZE).set_duration(per_slide_dur)
+        clip = mpy.CompositeVideoClip([bg, clip_img], size=profile.size).set_duration(per_slide_dur)
         clips.append(clip)
 
     # --------------------------------------------------------------
@@ -359,57 +792,153 @@ def assemble_video_from_slides_and_audio(image_paths: List[str], audio_path: str
     video = mpy.concatenate_videoclips(clips, method="chain").set_audio(audio_clip)
     # --------------------------------------------------------------
 
-    video.write_videofile(
-        output_path,
-        fps=24,
-        codec="libx264",        # Faute de frappe corrigée
-        audio_codec="aac",
-        threads=4,
-        preset="medium",
-        verbose=False,
-        logger=None
-    )
+    with reserve("encode", profile.encoder_threads()) as threads:
+        video.write_videofile(
+            output_path,
+            fps=profile.fps,
+            codec="libx264",        # Faute de frappe corrigée
+            audio_codec="aac",
+            threads=threads,
+            preset=profile.preset,
+            ffmpeg_params=profile.ffmpeg_params() + faststart_params(),
+            verbose=False,
+            logger=None
+        )
 
     audio_clip.close()
     video.close()
     return output_path
 
 
+# --------------------------------------------------------------
+# Choix du moteur de rendu
+# --------------------------------------------------------------
+VIDEO_RENDERER = os.environ.get("VIDEO_RENDERER", "moviepy")
+
+
+def render_video(segments, output_path: str, show_explanations_text: bool = False, style: dict = None, renderer: str = None, chunk_size: int = None):
+    """Assemble les segments avec le moteur demandé ; moviepy reste le repli si ffmpeg échoue.
+    `chunk_size` : assemblage moviepy par morceaux (voir assemble_synced_video)."""
+    renderer = (renderer or VIDEO_RENDERER).lower()
+    if renderer == "ffmpeg":
+        from ffmpeg_renderer import ffmpeg_available, render_segments_ffmpeg
+        if ffmpeg_available():
+            try:
+                return render_segments_ffmpeg(segments, output_path, show_explanations_text=show_explanations_text, style=style)
+            except Exception as e:
+                print(f"[WARN] Rendu ffmpeg échoué, repli sur moviepy : {e}", flush=True)
+        else:
+            print("[WARN] ffmpeg introuvable, repli sur moviepy", flush=True)
+    elif renderer != "moviepy":
+        raise ValueError(f"Moteur de rendu inconnu : {renderer}")
+    return assemble_synced_video(segments, output_path, show_explanations_text=show_explanations_text, style=style, chunk_size=chunk_size)
+
+
 #
 # --------------------------------------------------------------
 # 6️⃣  Fonction principale : générer la vidéo (CORRIGÉE)
 # --------------------------------------------------------------
 #
-def generate_video(script_text: str, title: str = "Explication", output_dir: str = None, explanations: List[str] = None, show_explanations_text: bool = False, style: dict = None, explanations_display: List[bool] = None) -> str:
-    """Pipeline complet : TTS → images → vidéo, synchronisée phrase par phrase, avec explications et style facultatifs."""
-    if output_dir is None:
-        output_dir = os.getcwd()
-
-    segments = create_sentence_segments(
-        script_text,
-        title=title,
-        explanations=explanations or [],
-        # --------------------------------------------------------------
-        # CORRECTION DE LA SYNTAXE ( : -> = )
-        # --------------------------------------------------------------
-        explanations_display=explanations_display or [] 
-    )
-    if not segments:
-        raise ValueError("Aucune diapositive trouvée.")
-
-    output_path = os.path.join(output_dir, f"video_{uuid.uuid4().hex}.mp4")
-    assemble_synced_video(segments, output_path, show_explanations_text=show_explanations_text, style=style or {})
-
-    # Nettoie les DEUX fichiers audio
-    for (_, s_audio, _, e_audio, _, _, _) in segments:
-        try:
-            if s_audio: os.remove(s_audio)
-        except Exception:
-            pass
+def generate_video(script_text: str, title: str = "Explication", output_dir: str = None, explanations: List[str] = None, show_explanations_text: bool = False, style: dict = None, explanations_display: List[bool] = None, workers: int = None, executor: str = None, progress=None, renderer: str = None, profile: str = None, chunk_size: int = None, granularity: str = None) -> str:
+    """Pipeline complet : TTS → images → vidéo, synchronisée phrase par phrase, avec explications et style facultatifs.
+    `workers` / `executor` règlent la production parallèle des segments (voir create_sentence_segments).
+    `progress(stage, done, total)` reçoit l'avancement par étape : "segments", "encode", "cleanup".
+    `renderer` : "moviepy" (défaut, VIDEO_RENDERER) ou "ffmpeg" (encodage natif par segment, repli sur moviepy).
+    Avec "ffmpeg", les segments déjà encodés sont repris du cache de segments (re-rendu incrémental).
+    `profile` : profil d'encodage "draft", "standard" (défaut, VIDEO_PROFILE) ou "final" (voir profiles.py).
+    `chunk_size` : au-delà de ce nombre de phrases (défaut ASSEMBLY_CHUNK_SIZE, 0 = jamais), les segments
+    sont produits et encodés par morceaux puis joints sans ré-encodage : mémoire bornée pour les longs scripts.
+    `granularity` : "sentence" (défaut, VIDEO_GRANULARITY) ou "paragraph" (une slide et un audio par
+    paragraphe, durée de chaque slide = durée de son audio) ; les explications suivent alors les paragraphes."""
+    # Tous les intermédiaires du rendu vivent dans le workspace du job, supprimé même en cas d'erreur
+    with job_workspace(), use_profile(profile):
+        if output_dir is None:
+            output_dir = default_output_dir()
+
+        if (renderer or VIDEO_RENDERER).lower() == "ffmpeg":
+            from ffmpeg_renderer import ffmpeg_available
+            from segment_cache import get_segment_cache, render_incremental
+            if ffmpeg_available() and get_segment_cache() is not None:
+                output_path = os.path.join(output_dir, f"video_{uuid.uuid4().hex}.mp4")
+                try:
+                    with span("render_incremental"):
+                        render_incremental(
+                            script_text, output_path, title=title, explanations=explanations,
+                            explanations_display=explanations_display, show_explanations_text=show_explanations_text,
+                            style=style or {}, workers=workers, executor=executor, progress=progress,
+                            granularity=granularity,
+                        )
+                    if progress: progress("cleanup", 1, 1)
+                    return os.path.abspath(output_path)
+                except Exception as e:
+                    # Pas de fichier partiel (concaténation interrompue) laissé dans le répertoire de sortie
+                    try: os.remove(output_path)
+                    except OSError: pass
+                    if isinstance(e, ValueError):
+                        raise
+                    print(f"[WARN] Rendu incrémental échoué, rendu complet : {e}", flush=True)
+
+        chunk_size = ASSEMBLY_CHUNK_SIZE if chunk_size is None else int(chunk_size)
+        sentences = split_to_units(script_text, granularity)
+        if chunk_size and len(sentences) > chunk_size and _can_concat():
+            output_path = os.path.join(output_dir, f"video_{uuid.uuid4().hex}.mp4")
+            chunks = _segment_chunks(sentences, chunk_size, title, explanations or [], explanations_display or [],
+                                     workers=workers, executor=executor, progress=progress)
+            try:
+                with span("encode"):
+                    assemble_in_chunks(chunks, output_path, show_explanations_text, style or {}, renderer,
+                                       progress=progress, total_chunks=math.ceil(len(sentences) / chunk_size))
+            except BaseException:
+                try: os.remove(output_path)
+                except OSError: pass
+                raise
+            finally:
+                chunks.close()
+            if progress: progress("cleanup", 1, 1)
+            return os.path.abspath(output_path)
+
+        segments = create_sentence_segments(
+            script_text,
+            title=title,
+            explanations=explanations or [],
+            # --------------------------------------------------------------
+            # CORRECTION DE LA SYNTAXE ( : -> = )
+            # --------------------------------------------------------------
+            explanations_display=explanations_display or [],
+            workers=workers,
+            executor=executor,
+            progress=progress,
+            in_memory=True,
+            granularity=granularity,
+        )
+        if not segments:
+            raise ValueError("Aucune diapositive trouvée.")
+
+        output_path = os.path.join(output_dir, f"video_{uuid.uuid4().hex}.mp4")
+        if progress: progress("encode", 0, 1)
         try:
-            if e_audio: os.remove(e_audio)
-        except Exception:
-            pass
-
-    # Il y avait une petite faute de frappe ici, corrigée
-    return os.path.abspath(output_path)
\ No newline at end of file
+            with span("encode"):
+                render_video(segments, output_path, show_explanations_text=show_explanations_text, style=style or {}, renderer=renderer)
+        except BaseException:
+            # Pas de vidéo tronquée laissée dans le répertoire de sortie
+            try: os.remove(output_path)
+            except OSError: pass
+            raise
+        if progress: progress("encode", 1, 1)
+
+        # Nettoie les DEUX fichiers audio
+        with span("cleanup"):
+            for (_, s_audio, _, e_audio, _, _, _) in segments:
+                try:
+                    if s_audio: os.remove(s_audio)
+                except Exception:
+                    pass
+                try:
+                    if e_audio: os.remove(e_audio)
+                except Exception:
+                    pass
+
+        if progress: progress("cleanup", 1, 1)
+
+        # Il y avait une petite faute de frappe ici, corrigée
+        return os.path.abspath(output_path)
@@ -0,0 +1,166 @@
+"""
+Service warm-up and readiness.
+
+Heavy dependencies (moviepy, Coqui TTS/torch, pyttsx3) are imported lazily by the stage
+that needs them, so importing the app is fast. `warm_up()` then pays those costs once,
+before traffic: it loads the configured TTS model and runs one short synthesis, loads the
+fonts of the active profile and encodes a tiny test video with the configured renderer.
+The service reports ready (`/ready`) only once every step has succeeded.
+
+Startup is measured from process start: `import`, `warmup` and `first_render` (first
+successful render, warm-up included) go to `generate_video_startup_seconds{phase}`.
+"""
+import os
+import time
+import threading
+import logging
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _process_start():
+    """Process start time (time.time() clock), from /proc when available."""
+    try:
+        with open("/proc/self/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        start_ticks = int(fields[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+PROCESS_START = _process_start()
+
+STARTUP_SECONDS = metrics.histogram(
+    "generate_video_startup_seconds",
+    "Seconds from process start to the end of each startup phase (import, warmup, first_render).",
+    ("phase",), buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300))
+
+_state = {
+    "status": "pending",  # pending → running → ready / failed
+    "steps": {},
+    "error": None,
+    "import_seconds": None,
+    "warmup_seconds": None,
+    "ready_seconds": None,
+    "first_render_seconds": None,
+}
+_lock = threading.Lock()
+
+
+def mark_imported():
+    """Record the end of the application import (call at the bottom of the app module)."""
+    elapsed = time.time() - PROCESS_START
+    with _lock:
+        _state["import_seconds"] = round(elapsed, 3)
+    STARTUP_SECONDS.observe(elapsed, phase="import")
+
+
+def mark_render_ok():
+    """Record the first successful render of the process (later calls are ignored)."""
+    with _lock:
+        if _state["first_render_seconds"] is not None:
+            return
+        elapsed = time.time() - PROCESS_START
+        _state["first_render_seconds"] = round(elapsed, 3)
+    STARTUP_SECONDS.observe(elapsed, phase="first_render")
+
+
+def _step(name, fn):
+    t0 = time.perf_counter()
+    with metrics.span(f"warmup:{name}"):
+        fn()
+    with _lock:
+        _state["steps"][name] = round(time.perf_counter() - t0, 3)
+
+
+def _warm_tts():
+    import tts_engine
+    backend = os.environ.get("TTS_BACKEND") or next(iter(tts_engine.available_backends()), None)
+    if backend is None:
+        raise RuntimeError("No TTS backend available. Install 'TTS' (Coqui) or 'pyttsx3'.")
+    if os.environ.get("TTS_PRELOAD", "1") == "1":
+        tts_engine.preload_models([backend])
+    # Première inférence hors requête (allocations, caches internes du modèle)
+    path = tts_engine.synthesize_audio("Ready.", backend=backend)
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _warm_fonts():
+    from profiles import get_profile
+    from video_generator import main_font, title_font, exp_font, render_slide_array
+    profile = get_profile()
+    for font in (main_font, title_font, exp_font):
+        font(profile)
+    render_slide_array("Warm-up.", "Warm-up", profile)
+
+
+def _warm_encode():
+    import numpy as np
+    from workspace import job_workspace, temp_file
+    from wav_audio import write_wav
+    from profiles import use_profile
+    from video_generator import VIDEO_RENDERER, render_slide_array, render_video
+
+    renderer = os.environ.get("WARMUP_RENDERER") or VIDEO_RENDERER
+    with job_workspace(), use_profile(os.environ.get("WARMUP_PROFILE", "draft")):
+        wav = temp_file(suffix=".wav", prefix="warmup_")
+        write_wav(wav, np.zeros(11025, dtype=np.float32), 22050)
+        segment = (render_slide_array("Warm-up.", None), wav, 0.5, None, 0.0, None, None)
+        render_video([segment], temp_file(suffix=".mp4", prefix="warmup_"), renderer=renderer)
+
+
+STEPS = (("tts", _warm_tts), ("fonts", _warm_fonts), ("encode", _warm_encode))
+
+
+def warm_up(steps=None):
+    """Run the warm-up steps (all by default); returns True when the service is ready."""
+    with _lock:
+        if _state["status"] == "running":
+            return False
+        _state.update(status="running", error=None, steps={})
+    t0 = time.perf_counter()
+    try:
+        for name, fn in STEPS:
+            if steps is None or name in steps:
+                _step(name, fn)
+    except Exception as e:
+        logger.exception("Warm-up failed")
+        with _lock:
+            _state.update(status="failed", error=f"{type(e).__name__}: {e}")
+        return False
+    since_start = time.time() - PROCESS_START
+    with _lock:
+        _state.update(status="ready", warmup_seconds=round(time.perf_counter() - t0, 3),
+                      ready_seconds=round(since_start, 3))
+    STARTUP_SECONDS.observe(since_start, phase="warmup")
+    mark_render_ok()  # l'encodage de test est un rendu complet
+    logger.info("Warm-up done in %.1fs", time.perf_counter() - t0)
+    return True
+
+
+def start_warm_up(steps=None):
+    """Run warm_up in a daemon thread so that the server can bind its port meanwhile."""
+    t = threading.Thread(target=warm_up, args=(steps,), name="warm-up", daemon=True)
+    t.start()
+    return t
+
+
+def is_ready():
+    with _lock:
+        return _state["status"] == "ready"
+
+
+def readiness():
+    with _lock:
+        state = dict(_state)
+        state["steps"] = dict(_state["steps"])
+    state["uptime_seconds"] = round(time.time() - PROCESS_START, 3)
+    return state
@@ -0,0 +1,160 @@
+"""
+Lecture native des WAV produits par les moteurs TTS et assemblage de la bande son.
+
+- `wav_duration` lit la durée dans l'en-tête RIFF (aucun processus ffmpeg) ;
+- `build_soundtrack` place tous les audios de phrase/explication sur une seule piste PCM
+  (silence de complément, rééchantillonnage si les fréquences diffèrent) écrite en un
+  seul WAV, que l'encodeur multiplexe directement.
+"""
+import struct
+import wave
+
+import numpy as np
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class WavFormatError(ValueError):
+    pass
+
+
+def read_wav_header(path):
+    """
+    Parcourt les chunks RIFF et renvoie
+    {"format", "channels", "rate", "bits", "data_offset", "data_size"}.
+    Gère PCM entier, float IEEE et WAVE_FORMAT_EXTENSIBLE.
+    """
+    with open(path, "rb") as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            raise WavFormatError(f"Not a RIFF/WAVE file: {path}")
+        fmt = None
+        while True:
+            head = f.read(8)
+            if len(head) < 8:
+                break
+            chunk_id, size = head[:4], struct.unpack("<I", head[4:])[0]
+            if chunk_id == b"fmt ":
+                body = f.read(size)
+                tag, channels, rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+                if tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    tag = struct.unpack("<H", body[24:26])[0]
+                fmt = {"format": tag, "channels": channels, "rate": rate, "bits": bits}
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise WavFormatError(f"data chunk before fmt chunk: {path}")
+                offset = f.tell()
+                # Certains moteurs écrivent une taille 0/0xFFFFFFFF pendant le streaming
+                f.seek(0, 2)
+                available = f.tell() - offset
+                if size == 0 or size > available:
+                    size = available
+                fmt.update(data_offset=offset, data_size=size)
+                return fmt
+            else:
+                f.seek(size, 1)
+            if size % 2:
+                f.seek(1, 1)  # les chunks sont alignés sur 2 octets
+    raise WavFormatError(f"No data chunk in {path}")
+
+
+def wav_duration(path):
+    """Durée en secondes, lue dans l'en-tête."""
+    h = read_wav_header(path)
+    frame_bytes = h["channels"] * (h["bits"] // 8)
+    if not frame_bytes or not h["rate"]:
+        raise WavFormatError(f"Invalid WAV header: {path}")
+    return (h["data_size"] // frame_bytes) / float(h["rate"])
+
+
+def read_wav(path):
+    """Échantillons mono float32 dans [-1, 1] et fréquence d'échantillonnage."""
+    h = read_wav_header(path)
+    width = h["bits"] // 8
+    with open(path, "rb") as f:
+        f.seek(h["data_offset"])
+        raw = f.read(h["data_size"] - h["data_size"] % (width * h["channels"]))
+
+    if h["format"] == WAVE_FORMAT_IEEE_FLOAT:
+        data = np.frombuffer(raw, dtype="<f4" if width == 4 else "<f8").astype(np.float32)
+    elif h["format"] == WAVE_FORMAT_PCM:
+        if width == 1:
+            data = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+        elif width == 2:
+            data = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+        elif width == 3:
+            b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+            ints = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+            ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+            data = ints.astype(np.float32) / 8388608.0
+        elif width == 4:
+            data = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+        else:
+            raise WavFormatError(f"Unsupported sample width {width}: {path}")
+    else:
+        raise WavFormatError(f"Unsupported WAV format {h['format']}: {path}")
+
+    if h["channels"] > 1:
+        data = data.reshape(-1, h["channels"]).mean(axis=1)
+    return data, h["rate"]
+
+
+def resample(samples, src_rate, dst_rate):
+    """Rééchantillonnage linéaire (suffisant pour de la voix)."""
+    if src_rate == dst_rate or len(samples) == 0:
+        return samples
+    n_out = int(round(len(samples) * dst_rate / float(src_rate)))
+    x_out = np.arange(n_out, dtype=np.float64) * (src_rate / float(dst_rate))
+    return np.interp(x_out, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def write_wav(path, samples, rate):
+    """Écrit un WAV PCM 16 bits mono."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(int(rate))
+        w.writeframes(pcm.tobytes())
+    return path
+
+
+def build_soundtrack(segments, out_path, rate=None):
+    """
+    Assemble la bande son complète d'une liste de segments
+    (img, s_audio, s_dur, e_audio, e_dur, ...) : chaque audio occupe exactement sa
+    fenêtre (complété par du silence ou tronqué), dans un seul buffer PCM contigu.
+    """
+    sources = []
+    for seg in segments:
+        s_audio, s_dur, e_audio, e_dur = seg[1], seg[2], seg[3], seg[4]
+        sources.append((s_audio, s_dur))
+        if e_dur > 0:
+            sources.append((e_audio, e_dur))
+
+    decoded = {}
+    for path, _ in sources:
+        if path and path not in decoded:
+            decoded[path] = read_wav(path)
+    if rate is None:
+        rate = max((r for _, r in decoded.values()), default=22050)
+
+    # Les fenêtres sont placées sur la base des temps cumulés pour ne pas accumuler d'arrondis
+    starts, t = [], 0.0
+    for _, dur in sources:
+        starts.append(int(round(t * rate)))
+        t += dur
+    track = np.zeros(int(round(t * rate)), dtype=np.float32)
+
+    for (path, dur), start in zip(sources, starts):
+        if not path:
+            continue
+        samples, src_rate = decoded[path]
+        samples = resample(samples, src_rate, rate)
+        n = min(len(samples), int(round(dur * rate)), len(track) - start)
+        if n > 0:
+            track[start:start + n] = samples[:n]
+
+    return write_wav(out_path, track, rate)
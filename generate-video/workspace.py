@@ -0,0 +1,291 @@
+"""
+Per-job workspaces: every intermediate file of a render (WAVs, slide PNGs, MP4 fragments,
+concat lists, soundtrack) is created inside the workspace of the current job, which is
+removed when the job ends, whether it succeeded or failed.
+
+- small intermediates (audio, images) can live on a RAM-backed directory (WORKSPACE_TMPFS,
+  e.g. /dev/shm); video fragments stay on disk so they can be hard-linked to the caches;
+- per-job and global quotas stop a runaway render before it fills the disk;
+- `sweep_outputs` deletes finished videos by age and total size, and removes workspaces
+  left behind by a crashed process.
+
+Library code asks for files through `temp_file()` / `temp_dir()`: inside a job they land
+in its workspace, otherwise they fall back to the system temp directory as before.
+"""
+import os
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+import contextvars
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+WORKSPACE_ROOT = os.environ.get("WORKSPACE_ROOT", os.path.join(tempfile.gettempdir(), "generate-video-jobs"))
+# Répertoire en RAM pour les petits intermédiaires ("auto" : /dev/shm s'il existe)
+WORKSPACE_TMPFS = os.environ.get("WORKSPACE_TMPFS", "")
+WORKSPACE_JOB_QUOTA_BYTES = int(float(os.environ.get("WORKSPACE_JOB_QUOTA_MB", "2048")) * 1024 * 1024)
+WORKSPACE_TOTAL_QUOTA_BYTES = int(float(os.environ.get("WORKSPACE_TOTAL_QUOTA_MB", "8192")) * 1024 * 1024)
+OUTPUT_DIR = os.environ.get("OUTPUT_DIR") or None
+OUTPUT_RETENTION_SECONDS = float(os.environ.get("OUTPUT_RETENTION_HOURS", "24")) * 3600
+OUTPUT_MAX_BYTES = int(float(os.environ.get("OUTPUT_MAX_MB", "4096")) * 1024 * 1024)
+
+_QUOTA_CHECK_INTERVAL = 1.0  # secondes entre deux parcours du workspace
+
+
+class WorkspaceQuotaExceeded(RuntimeError):
+    pass
+
+
+def _tmpfs_root():
+    if not WORKSPACE_TMPFS:
+        return None
+    path = "/dev/shm" if WORKSPACE_TMPFS == "auto" else WORKSPACE_TMPFS
+    if not os.path.isdir(path):
+        logger.warning("WORKSPACE_TMPFS %s is not a directory, using disk only", path)
+        return None
+    return os.path.join(path, "generate-video-jobs")
+
+
+def _dir_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+_active = {}
+_active_lock = threading.Lock()
+
+
+class Workspace:
+    """Directory tree owned by one job; use as a context manager to guarantee cleanup."""
+
+    def __init__(self, job_id=None, quota_bytes=None, use_ram=True):
+        self.job_id = job_id or uuid.uuid4().hex
+        self.quota_bytes = WORKSPACE_JOB_QUOTA_BYTES if quota_bytes is None else int(quota_bytes)
+        self.dir = os.path.join(WORKSPACE_ROOT, self.job_id)
+        os.makedirs(self.dir, exist_ok=True)
+        ram_root = _tmpfs_root() if use_ram else None
+        self.ram_dir = None
+        if ram_root:
+            self.ram_dir = os.path.join(ram_root, self.job_id)
+            os.makedirs(self.ram_dir, exist_ok=True)
+        self._usage = 0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.closed = False
+        with _active_lock:
+            _active[self.job_id] = self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+        return False
+
+    def _root(self, ram):
+        return self.ram_dir if (ram and self.ram_dir) else self.dir
+
+    def temp_file(self, suffix="", prefix="tmp_", ram=True):
+        """Path of a new empty file in the workspace (RAM-backed when available and `ram`)."""
+        self.check_quota()
+        fd, path = tempfile.mkstemp(suffix=suffix, prefix=prefix, dir=self._root(ram))
+        os.close(fd)
+        return path
+
+    def temp_dir(self, prefix="tmp_", ram=False):
+        self.check_quota()
+        return tempfile.mkdtemp(prefix=prefix, dir=self._root(ram))
+
+    def usage(self):
+        total = _dir_size(self.dir)
+        if self.ram_dir:
+            total += _dir_size(self.ram_dir)
+        with self._lock:
+            self._usage = total
+            self._checked_at = time.monotonic()
+        return total
+
+    def check_quota(self, force=False):
+        """Raise WorkspaceQuotaExceeded when this job or all jobs together use too much space."""
+        with self._lock:
+            fresh = time.monotonic() - self._checked_at < _QUOTA_CHECK_INTERVAL
+        if fresh and not force:
+            return
+        used = self.usage()
+        if self.quota_bytes and used > self.quota_bytes:
+            raise WorkspaceQuotaExceeded(
+                f"Job {self.job_id} uses {used / 1048576:.1f} MB (quota {self.quota_bytes / 1048576:.1f} MB)")
+        if WORKSPACE_TOTAL_QUOTA_BYTES:
+            with _active_lock:
+                others = [ws for ws in _active.values() if ws is not self]
+            total = used + sum(ws._usage for ws in others)
+            if total > WORKSPACE_TOTAL_QUOTA_BYTES:
+                raise WorkspaceQuotaExceeded(
+                    f"All jobs use {total / 1048576:.1f} MB (quota {WORKSPACE_TOTAL_QUOTA_BYTES / 1048576:.1f} MB)")
+
+    def cleanup(self):
+        if self.closed:
+            return
+        self.closed = True
+        with _active_lock:
+            _active.pop(self.job_id, None)
+        for path in (self.dir, self.ram_dir):
+            if path:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+# --------------------------------------------------------------
+# Workspace courant (propagé aux pools via metrics.bind_context)
+# --------------------------------------------------------------
+_current = contextvars.ContextVar("generate_video_workspace", default=None)
+
+
+def current_workspace():
+    return _current.get()
+
+
+@contextmanager
+def job_workspace(job_id=None, quota_bytes=None):
+    """
+    Make a workspace current for the enclosed block and remove it afterwards.
+    Nested calls reuse the enclosing workspace (it is cleaned up by its owner).
+    """
+    existing = _current.get()
+    if existing is not None and not existing.closed:
+        yield existing
+        return
+    ws = Workspace(job_id, quota_bytes)
+    token = _current.set(ws)
+    try:
+        yield ws
+    finally:
+        _current.reset(token)
+        ws.cleanup()
+
+
+def temp_file(suffix="", prefix="tmp_", ram=True):
+    ws = _current.get()
+    if ws is None or ws.closed:
+        fd, path = tempfile.mkstemp(suffix=suffix, prefix=prefix)
+        os.close(fd)
+        return path
+    return ws.temp_file(suffix, prefix, ram)
+
+
+def temp_dir(prefix="tmp_", ram=False):
+    ws = _current.get()
+    if ws is None or ws.closed:
+        return tempfile.mkdtemp(prefix=prefix)
+    return ws.temp_dir(prefix, ram)
+
+
+def check_quota():
+    ws = _current.get()
+    if ws is not None and not ws.closed:
+        ws.check_quota()
+
+
+def workspace_stats():
+    with _active_lock:
+        workspaces = list(_active.values())
+    return {
+        "active": len(workspaces),
+        "bytes": sum(ws._usage for ws in workspaces),
+        "job_quota_bytes": WORKSPACE_JOB_QUOTA_BYTES,
+        "total_quota_bytes": WORKSPACE_TOTAL_QUOTA_BYTES,
+        "ram_backed": _tmpfs_root() is not None,
+    }
+
+
+# --------------------------------------------------------------
+# Rétention des vidéos produites
+# --------------------------------------------------------------
+def output_dir():
+    return OUTPUT_DIR or os.getcwd()
+
+
+def sweep_outputs(directory=None, max_age=None, max_bytes=None, prefix="video_", suffix=".mp4", keep=()):
+    """
+    Delete output videos older than `max_age` seconds, then the oldest ones until the
+    rest fits in `max_bytes`. Also removes orphaned job workspaces older than `max_age`.
+    Returns the number of deleted videos.
+    """
+    directory = directory or output_dir()
+    max_age = OUTPUT_RETENTION_SECONDS if max_age is None else max_age
+    max_bytes = OUTPUT_MAX_BYTES if max_bytes is None else max_bytes
+    keep = {os.path.abspath(p) for p in keep}
+    now = time.time()
+
+    entries = []
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        names = []
+    for name in names:
+        if not (name.startswith(prefix) and name.endswith(suffix)):
+            continue
+        full = os.path.abspath(os.path.join(directory, name))
+        if full in keep:
+            continue
+        try:
+            st = os.stat(full)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, full))
+
+    removed = 0
+    total = sum(size for _, size, _ in entries)
+    for mtime, size, full in sorted(entries):
+        if (max_age and now - mtime > max_age) or (max_bytes and total > max_bytes):
+            try:
+                os.remove(full)
+                removed += 1
+                total -= size
+            except OSError:
+                pass
+
+    # Workspaces orphelins (processus tué pendant un rendu)
+    with _active_lock:
+        active = set(_active)
+    for root in filter(None, (WORKSPACE_ROOT, _tmpfs_root())):
+        try:
+            jobs = os.listdir(root)
+        except OSError:
+            continue
+        for job_id in jobs:
+            path = os.path.join(root, job_id)
+            try:
+                stale = job_id not in active and max_age and now - os.stat(path).st_mtime > max_age
+            except OSError:
+                continue
+            if stale:
+                shutil.rmtree(path, ignore_errors=True)
+
+    if removed:
+        logger.info("Output retention: removed %d videos from %s", removed, directory)
+    return removed
+
+
+def start_sweeper(interval=600, extra=(), **kwargs):
+    """Run sweep_outputs (and the `extra` callables) every `interval` seconds in a daemon thread."""
+    def loop():
+        while True:
+            for fn in (lambda: sweep_outputs(**kwargs), *extra):
+                try:
+                    fn()
+                except Exception:
+                    logger.exception("Output sweep failed")
+            time.sleep(interval)
+    t = threading.Thread(target=loop, name="output-sweeper", daemon=True)
+    t.start()
+    return t